@@ -0,0 +1 @@
+"""Alert generation and storage for BlueAlert"""
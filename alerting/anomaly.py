@@ -0,0 +1,174 @@
+"""Streaming anomaly scores for every sensor and parameter
+
+Fixed thresholds miss a probe that slowly drifts or one that stopped
+updating. `AnomalyDetector` keeps robust running statistics in
+(sensors x parameters) NumPy matrices and turns each tick of readings into
+three scores per parameter:
+
+    spike   |value - level| / scale, how far a reading jumps from the
+            recent level in robust standard deviations
+    drift   |level - baseline| / scale, how far the recent level has moved
+            from the weekly baseline
+    stuck   minutes since the value last changed
+
+`level` is a time-weighted EWMA over FAST_TAU_MS and `baseline` a slower one
+over SLOW_TAU_MS; `scale` is an EWMA of absolute deviations (a streaming
+stand-in for the MAD) times 1.4826, floored at MIN_SCALE. Residuals are
+clipped before they update the state, so a single outlier barely moves it.
+Scores are NaN during warm-up and for missing values.
+
+The scores form a matrix with one named column per (parameter, score), so
+the regular AlertEngine evaluates them with ANOMALY_RULES, getting the same
+hysteresis, minimum durations and cooldowns as the threshold rules.
+"""
+import threading
+
+import numpy as np
+
+from alerting.rules import MINUTE_MS
+from sensors.thresholds import REGISTRY
+
+HOUR_MS = 60 * MINUTE_MS
+FAST_TAU_MS = 10 * MINUTE_MS
+SCALE_TAU_MS = HOUR_MS
+SLOW_TAU_MS = 7 * 24 * HOUR_MS
+WARMUP = 20  # readings before a parameter is scored
+CLIP = 4.0  # residuals are clipped to this many scales when updating
+MAD_TO_SD = 1.4826
+
+# Smallest meaningful change per parameter, so perfectly steady series do
+# not turn sensor noise into huge scores
+MIN_SCALE = {
+    'TDS': 5, 'Turbidity': 0.2, 'pH': 0.05, 'Temperature': 0.2,
+    'Dissolved_Oxygen': 0.1, 'Conductivity': 10, 'Chlorine': 0.02, 'Fluoride': 0.02
+}
+
+SCORES = ('spike', 'drift', 'stuck')
+
+
+def score_column(param, score):
+    return f"{param}.{score}"
+
+
+def anomaly_rules(params):
+    """One AlertEngine rule per parameter and score"""
+    rules = []
+    for param in params:
+        rules += [
+            {
+                'id': f"{param.lower()}_spike", 'param': score_column(param, 'spike'), 'op': '>',
+                'raise_at': 6, 'clear_at': 3,
+                'for_ms': 0, 'clear_for_ms': 5 * MINUTE_MS, 'cooldown_ms': 30 * MINUTE_MS,
+                'type': f"Sudden {param} Change", 'severity': 'moderate',
+                'message': f"{param} jumped {{value:.1f}} standard deviations from its recent level",
+                'recommendation': "Take a manual sample to confirm before the next use"
+            },
+            {
+                'id': f"{param.lower()}_drift", 'param': score_column(param, 'drift'), 'op': '>',
+                'raise_at': 3, 'clear_at': 1.5,
+                'for_ms': 30 * MINUTE_MS, 'clear_for_ms': 30 * MINUTE_MS, 'cooldown_ms': 6 * HOUR_MS,
+                'type': f"{param} Drift", 'severity': 'low',
+                'message': f"{param} has drifted {{value:.1f}} standard deviations from its weekly baseline",
+                'recommendation': "Recalibrate the probe, or look for a change at the source"
+            },
+            {
+                'id': f"{param.lower()}_stuck", 'param': score_column(param, 'stuck'), 'op': '>',
+                'raise_at': 60, 'clear_at': 0,
+                'for_ms': 0, 'clear_for_ms': 0, 'cooldown_ms': HOUR_MS,
+                'type': f"Stuck {param} Sensor", 'severity': 'low',
+                'message': f"{param} has not changed for {{value:.0f}} minutes",
+                'recommendation': "Inspect the probe and its wiring"
+            }
+        ]
+    return rules
+
+
+ANOMALY_RULES = anomaly_rules(REGISTRY.params)
+
+
+class AnomalyDetector:
+    """Per-sensor robust statistics for `params`, one state row per sensor
+
+    Also serves as the registry of score columns for an AlertEngine:
+    `params` lists the score columns and `columns` maps them to indexes.
+    """
+
+    def __init__(self, params=REGISTRY.params, capacity=1024):
+        self.inputs = list(params)
+        self.params = [score_column(p, s) for p in self.inputs for s in SCORES]
+        self.columns = {name: i for i, name in enumerate(self.params)}
+        self._min_scale = np.array([MIN_SCALE.get(p, 0.0) for p in self.inputs], dtype=np.float64)
+        self._capacity = capacity
+        self._slots = {}
+        self._lock = threading.Lock()
+        shape = (capacity, len(self.inputs))
+        self._state = {
+            'level': np.zeros(shape),
+            'baseline': np.zeros(shape),
+            'scale': np.zeros(shape),
+            'last_value': np.full(shape, np.nan),
+            'last_ts': np.zeros(shape, dtype=np.int64),
+            'changed_at': np.zeros(shape, dtype=np.int64),
+            'count': np.zeros(shape, dtype=np.int64)
+        }
+
+    def slots(self, sensor_ids):
+        slots = np.array([self._slots.setdefault(s, len(self._slots)) for s in sensor_ids], dtype=np.int64)
+        if len(self._slots) > self._capacity:
+            while self._capacity < len(self._slots):
+                self._capacity *= 2
+            for name, array in self._state.items():
+                grown = np.zeros((self._capacity, array.shape[1]), dtype=array.dtype)
+                if name == 'last_value':
+                    grown[:] = np.nan
+                grown[:len(array)] = array
+                self._state[name] = grown
+        return slots
+
+    def update(self, sensor_ids, ts, values):
+        """Fold one tick of readings into the state and return its scores
+
+        `values` is shaped (len(sensor_ids), len(inputs)) with NaN for
+        missing readings; `ts` is a scalar or per-row array of ms
+        timestamps. Returns a (len(sensor_ids), len(params)) score matrix
+        in `params` column order.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        ts = np.broadcast_to(np.asarray(ts, dtype=np.int64), (len(values),))[:, None]
+        with self._lock:
+            slots = self.slots(sensor_ids)
+            state = {name: array[slots] for name, array in self._state.items()}
+            known = ~np.isnan(values)
+            first = state['count'] == 0
+
+            # Time-weighted rates, but no slower than a plain running mean,
+            # so the statistics settle within the warm-up
+            dt = np.maximum(ts - state['last_ts'], 0)
+            running = 1 / (state['count'] + 1)
+            fast = np.maximum(-np.expm1(-dt / FAST_TAU_MS), running)
+            slow = np.maximum(-np.expm1(-dt / SLOW_TAU_MS), running)
+            scale_rate = np.maximum(-np.expm1(-dt / SCALE_TAU_MS), running)
+
+            scale = np.maximum(state['scale'] * MAD_TO_SD, self._min_scale)
+            residual = values - state['level']
+            clipped = np.clip(residual, -CLIP * scale, CLIP * scale)
+            level = np.where(first, values, state['level'] + fast * clipped)
+            baseline = np.where(first, values, state['baseline'] + slow * (level - state['baseline']))
+            mad = np.where(first, 0.0, state['scale'] + scale_rate * (np.abs(clipped) - state['scale']))
+            changed = first | (values != state['last_value'])
+            changed_at = np.where(changed, ts, state['changed_at'])
+
+            warm = known & (state['count'] >= WARMUP)
+            scores = np.full((len(values), len(self.inputs), len(SCORES)), np.nan)
+            scores[..., 0] = np.where(warm, np.abs(residual) / scale, np.nan)
+            scores[..., 1] = np.where(warm, np.abs(level - baseline) / scale, np.nan)
+            scores[..., 2] = np.where(warm, (ts - changed_at) / MINUTE_MS, np.nan)
+
+            updates = {
+                'level': level, 'baseline': baseline, 'scale': mad, 'last_value': values,
+                'last_ts': np.broadcast_to(ts, values.shape), 'changed_at': changed_at,
+                'count': state['count'] + 1
+            }
+            for name, new in updates.items():
+                self._state[name][slots] = np.where(known, new, state[name])
+        return scores.reshape(len(values), len(self.params))
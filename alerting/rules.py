@@ -0,0 +1,205 @@
+"""Streaming threshold rules with hysteresis, minimum durations and cooldowns
+
+The engine keeps per-sensor state for every rule in NumPy arrays and
+evaluates a whole tick of readings with a few vector operations per rule.
+Python objects are only created for state transitions, so an alert is
+emitted once when it is raised and once when it clears, no matter how often
+the page reruns.
+"""
+import threading
+
+import numpy as np
+
+from sensors.thresholds import REGISTRY
+
+MINUTE_MS = 60_000
+
+_limits = REGISTRY.thresholds
+
+# `raise_at`/`clear_at` give the hysteresis band: an alert raises when the
+# value passes `raise_at` and only clears once it is back past `clear_at`.
+# The condition must hold for `for_ms` before raising and the recovery for
+# `clear_for_ms` before clearing; `cooldown_ms` suppresses re-raising after
+# a clear.
+RULES = [
+    {
+        'id': 'high_tds', 'param': 'TDS', 'op': '>',
+        'raise_at': _limits['TDS']['moderate'][1], 'clear_at': _limits['TDS']['moderate'][1] - 50,
+        'for_ms': MINUTE_MS, 'clear_for_ms': 5 * MINUTE_MS, 'cooldown_ms': 15 * MINUTE_MS,
+        'type': 'High TDS Level', 'severity': 'high',
+        'message': "TDS level is {value:g} ppm, exceeding recommended limit of {raise_at:g} ppm",
+        'recommendation': "Use water filtration or reverse osmosis system"
+    },
+    {
+        'id': 'high_turbidity', 'param': 'Turbidity', 'op': '>',
+        'raise_at': _limits['Turbidity']['moderate'][1], 'clear_at': _limits['Turbidity']['moderate'][1] - 0.5,
+        'for_ms': MINUTE_MS, 'clear_for_ms': 5 * MINUTE_MS, 'cooldown_ms': 15 * MINUTE_MS,
+        'type': 'High Turbidity', 'severity': 'high',
+        'message': "Water clarity is poor ({value:g} NTU)",
+        'recommendation': "Boil water for 10 minutes before consumption"
+    },
+    {
+        'id': 'low_ph', 'param': 'pH', 'op': '<',
+        'raise_at': _limits['pH']['good'][0], 'clear_at': _limits['pH']['good'][0] + 0.1,
+        'for_ms': MINUTE_MS, 'clear_for_ms': 5 * MINUTE_MS, 'cooldown_ms': 15 * MINUTE_MS,
+        'type': 'pH Imbalance', 'severity': 'moderate',
+        'message': "pH level is {value:g}, below safe minimum of {raise_at:g}",
+        'recommendation': "Test water source and consider pH correction"
+    },
+    {
+        'id': 'high_ph', 'param': 'pH', 'op': '>',
+        'raise_at': _limits['pH']['good'][1], 'clear_at': _limits['pH']['good'][1] - 0.1,
+        'for_ms': MINUTE_MS, 'clear_for_ms': 5 * MINUTE_MS, 'cooldown_ms': 15 * MINUTE_MS,
+        'type': 'pH Imbalance', 'severity': 'moderate',
+        'message': "pH level is {value:g}, above safe maximum of {raise_at:g}",
+        'recommendation': "Test water source and consider pH correction"
+    },
+    {
+        'id': 'high_temperature', 'param': 'Temperature', 'op': '>',
+        'raise_at': _limits['Temperature']['good'][1], 'clear_at': _limits['Temperature']['good'][1] - 1,
+        'for_ms': 5 * MINUTE_MS, 'clear_for_ms': 5 * MINUTE_MS, 'cooldown_ms': 30 * MINUTE_MS,
+        'type': 'High Temperature', 'severity': 'low',
+        'message': "Water temperature is {value:g}°C",
+        'recommendation': "Allow water to cool before consumption"
+    }
+]
+
+NEVER = np.iinfo(np.int64).min // 2
+
+
+class _RuleState:
+    """Per-sensor state arrays for one rule"""
+
+    def __init__(self, capacity):
+        self.active = np.zeros(capacity, dtype=bool)
+        self.breach_since = np.full(capacity, -1, dtype=np.int64)
+        self.recover_since = np.full(capacity, -1, dtype=np.int64)
+        self.last_clear = np.full(capacity, NEVER, dtype=np.int64)
+        self.raised_at = np.zeros(capacity, dtype=np.int64)
+        self.raised_value = np.zeros(capacity, dtype=np.float64)
+
+    def grow(self, capacity):
+        for name, array in vars(self).items():
+            fill = {'breach_since': -1, 'recover_since': -1, 'last_clear': NEVER}.get(name, 0)
+            grown = np.full(capacity, fill, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+
+class AlertEngine:
+    """Evaluates RULES over a stream of readings, one state slot per sensor"""
+
+    def __init__(self, rules=RULES, registry=REGISTRY, capacity=1024):
+        self.rules = list(rules)
+        self.registry = registry
+        self._columns = [registry.columns[rule['param']] for rule in self.rules]
+        self._capacity = capacity
+        self._slots = {}
+        self._sensor_ids = []
+        self._states = [_RuleState(capacity) for _ in self.rules]
+        self._lock = threading.Lock()
+
+    def slots(self, sensor_ids):
+        """State slot per sensor id, allocating new slots as sensors appear"""
+        slots = np.empty(len(sensor_ids), dtype=np.int64)
+        for i, sensor_id in enumerate(sensor_ids):
+            slot = self._slots.get(sensor_id)
+            if slot is None:
+                slot = self._slots[sensor_id] = len(self._sensor_ids)
+                self._sensor_ids.append(sensor_id)
+            slots[i] = slot
+        if len(self._sensor_ids) > self._capacity:
+            while self._capacity < len(self._sensor_ids):
+                self._capacity *= 2
+            for state in self._states:
+                state.grow(self._capacity)
+        return slots
+
+    def evaluate(self, sensor_ids, ts, values):
+        """Advance every rule by one batch of readings and return transitions
+
+        `values` is shaped (len(sensor_ids), len(registry.params)) in registry
+        column order, with NaN for missing parameters; `ts` is a scalar or
+        per-row array of millisecond timestamps. Each sensor should appear at
+        most once per batch.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        ts = np.broadcast_to(np.asarray(ts, dtype=np.int64), (len(values),))
+        events = []
+        with self._lock:
+            slots = self.slots(sensor_ids)
+            for rule, column, state in zip(self.rules, self._columns, self._states):
+                events.extend(self._step(rule, state, slots, ts, values[:, column]))
+        return events
+
+    def _step(self, rule, state, slots, ts, value):
+        known = ~np.isnan(value)
+        if rule['op'] == '>':
+            breach = known & (value > rule['raise_at'])
+            recovered = known & (value <= rule['clear_at'])
+        else:
+            breach = known & (value < rule['raise_at'])
+            recovered = known & (value >= rule['clear_at'])
+
+        active = state.active[slots]
+
+        # Inactive sensors: track how long the breach has lasted
+        breach_since = state.breach_since[slots]
+        breach_since = np.where(breach & (breach_since < 0), ts, breach_since)
+        breach_since = np.where(~breach & ~active, -1, breach_since)
+        cooled = ts - state.last_clear[slots] >= rule['cooldown_ms']
+        raising = ~active & breach & (ts - breach_since >= rule['for_ms']) & cooled
+
+        # Active sensors: track how long the recovery has lasted
+        recover_since = state.recover_since[slots]
+        recover_since = np.where(active & recovered & (recover_since < 0), ts, recover_since)
+        recover_since = np.where(~recovered | ~active, -1, recover_since)
+        clearing = active & recovered & (ts - recover_since >= rule['clear_for_ms'])
+
+        state.breach_since[slots] = np.where(raising | clearing, -1, breach_since)
+        state.recover_since[slots] = np.where(raising | clearing, -1, recover_since)
+        state.active[slots] = (active | raising) & ~clearing
+
+        events = []
+        for i in np.flatnonzero(raising):
+            slot = slots[i]
+            state.raised_at[slot] = ts[i]
+            state.raised_value[slot] = value[i]
+            events.append(self._event(rule, slot, 'raised', ts[i], value[i]))
+        for i in np.flatnonzero(clearing):
+            slot = slots[i]
+            state.last_clear[slot] = ts[i]
+            events.append(self._event(rule, slot, 'cleared', ts[i], value[i]))
+        return events
+
+    def _event(self, rule, slot, transition, ts, value):
+        return {
+            'rule': rule['id'],
+            'sensor_id': self._sensor_ids[slot],
+            'transition': transition,
+            'time': int(ts),
+            'value': float(value),
+            'type': rule['type'],
+            'severity': rule['severity'],
+            'message': rule['message'].format(value=float(value), raise_at=rule['raise_at']),
+            'recommendation': rule['recommendation']
+        }
+
+    def evaluate_reading(self, sensor_id, reading, ts):
+        """Evaluate a single reading dict"""
+        row = [float(reading.get(param, np.nan)) for param in self.registry.params]
+        return self.evaluate([sensor_id], ts, [row])
+
+    def active(self, sensor_id=None):
+        """Currently raised alerts, optionally for one sensor"""
+        with self._lock:
+            alerts = []
+            for rule, state in zip(self.rules, self._states):
+                if sensor_id is None:
+                    slots = np.flatnonzero(state.active[:len(self._sensor_ids)])
+                else:
+                    slot = self._slots.get(sensor_id)
+                    slots = [] if slot is None or not state.active[slot] else [slot]
+                for slot in slots:
+                    alerts.append(self._event(rule, slot, 'raised', state.raised_at[slot], state.raised_value[slot]))
+            return alerts
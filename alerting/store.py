@@ -0,0 +1,166 @@
+"""In-memory alert store with secondary indexes for the Alerts page
+
+Alerts are kept as dicts for rendering, alongside columnar NumPy indexes:
+one boolean bitmap per severity, status, type and district value, and an
+int64 time column. A filter is an OR of bitmaps within each field, an AND
+across fields and a time range mask; ordering takes a bounded top-k with
+`argpartition`, so only the alerts actually shown are sorted.
+"""
+import threading
+from datetime import datetime
+
+import numpy as np
+import streamlit as st
+
+INDEXED_FIELDS = ('severity', 'status', 'type', 'district')
+SEVERITY_ORDER = {'critical': 0, 'high': 1, 'moderate': 2, 'low': 3}
+
+_TIME_BITS = 42  # ms timestamps below 2**42 (year 2109)
+
+
+def _ms(value):
+    return int(value.timestamp() * 1000) if isinstance(value, datetime) else int(value)
+
+
+class AlertStore:
+    """Append-mostly alert collection indexed by severity, status, type, district and time"""
+
+    def __init__(self, capacity=1024):
+        self._capacity = capacity
+        self._alerts = []
+        self._rows = {}  # alert id -> row
+        self._time = np.zeros(capacity, dtype=np.int64)
+        self._rank = np.zeros(capacity, dtype=np.int64)
+        self._affected = np.zeros(capacity, dtype=np.int64)
+        self._bitmaps = {field: {} for field in INDEXED_FIELDS}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._alerts)
+
+    def _grow(self):
+        self._capacity *= 2
+        for name in ('_time', '_rank', '_affected'):
+            array = getattr(self, name)
+            grown = np.zeros(self._capacity, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+        for bitmaps in self._bitmaps.values():
+            for value, bitmap in bitmaps.items():
+                grown = np.zeros(self._capacity, dtype=bool)
+                grown[:len(bitmap)] = bitmap
+                bitmaps[value] = grown
+
+    def _bitmap(self, field, value):
+        bitmaps = self._bitmaps[field]
+        if value not in bitmaps:
+            bitmaps[value] = np.zeros(self._capacity, dtype=bool)
+        return bitmaps[value]
+
+    def add(self, alert):
+        """Store an alert dict, assigning an `id` if it has none; returns the id
+
+        Raises ValueError if the alert brings an id that is already stored.
+        """
+        with self._lock:
+            return self._add(dict(alert))
+
+    def add_many(self, alerts):
+        with self._lock:
+            return [self._add(dict(alert)) for alert in alerts]
+
+    def _add(self, alert):
+        if alert.get('id') is None:
+            alert['id'] = self._next_id
+        elif alert['id'] in self._rows:
+            raise ValueError(f"alert id {alert['id']} is already in use")
+        self._next_id = max(self._next_id, alert['id'] + 1)
+        row = len(self._alerts)
+        if row == self._capacity:
+            self._grow()
+
+        self._alerts.append(alert)
+        self._rows[alert['id']] = row
+        self._time[row] = _ms(alert['time'])
+        self._rank[row] = SEVERITY_ORDER.get(alert['severity'], len(SEVERITY_ORDER))
+        self._affected[row] = alert.get('affected_population', 0)
+        for field in INDEXED_FIELDS:
+            self._bitmap(field, alert.get(field))[row] = True
+        return alert['id']
+
+    def update(self, alert_id, **changes):
+        """Change fields of a stored alert, keeping the indexes in sync"""
+        with self._lock:
+            row = self._rows[alert_id]
+            alert = self._alerts[row] = {**self._alerts[row], **changes}
+            for field in INDEXED_FIELDS:
+                if field in changes:
+                    for bitmap in self._bitmaps[field].values():
+                        bitmap[row] = False
+                    self._bitmap(field, alert.get(field))[row] = True
+            if 'severity' in changes:
+                self._rank[row] = SEVERITY_ORDER.get(alert['severity'], len(SEVERITY_ORDER))
+            if 'time' in changes:
+                self._time[row] = _ms(alert['time'])
+            return alert
+
+    def get(self, alert_id):
+        row = self._rows.get(alert_id)
+        return None if row is None else self._alerts[row]
+
+    def _mask(self, since, until, filters):
+        n = len(self._alerts)
+        mask = np.ones(n, dtype=bool)
+        for field, values in filters.items():
+            if values is None:
+                continue
+            if isinstance(values, str):
+                values = [values]
+            matched = np.zeros(n, dtype=bool)
+            for value in values:
+                bitmap = self._bitmaps[field].get(value)
+                if bitmap is not None:
+                    matched |= bitmap[:n]
+            mask &= matched
+        if since is not None:
+            mask &= self._time[:n] >= _ms(since)
+        if until is not None:
+            mask &= self._time[:n] < _ms(until)
+        return mask
+
+    def query(self, since=None, until=None, limit=None, offset=0, **filters):
+        """Matching alerts ordered by severity, then newest first
+
+        Filters are keyword arguments named after INDEXED_FIELDS, each a value
+        or list of values (None means no filter). Returns `(total, alerts)`
+        where `alerts` holds at most `limit` alerts starting at `offset`.
+        """
+        with self._lock:
+            rows = np.flatnonzero(self._mask(since, until, filters))
+            total = len(rows)
+            # Severity rank in the high bits, reversed time in the low bits
+            keys = (self._rank[rows] << _TIME_BITS) | ((1 << _TIME_BITS) - 1 - self._time[rows])
+            if limit is not None and offset + limit < total:
+                k = offset + limit
+                top = np.argpartition(keys, k - 1)[:k]
+                rows, keys = rows[top], keys[top]
+            # Ties (same severity and millisecond) keep insertion order
+            page = rows[np.lexsort((rows, keys))][offset:None if limit is None else offset + limit]
+            return total, [self._alerts[row] for row in page]
+
+    def count(self, since=None, until=None, **filters):
+        with self._lock:
+            return int(self._mask(since, until, filters).sum())
+
+    def total_affected(self, since=None, until=None, **filters):
+        """Sum of `affected_population` over matching alerts"""
+        with self._lock:
+            mask = self._mask(since, until, filters)
+            return int(self._affected[:len(mask)][mask].sum())
+
+
+@st.cache_resource
+def get_alert_store():
+    """The single alert store for this server process"""
+    return AlertStore()
@@ -1,6 +1,8 @@
 import streamlit as st
 from streamlit import session_state as ss
 
+from sensors.ingest import get_ingestion_worker
+
 
 
 # Page configuration
@@ -176,15 +178,10 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state for persistent data
-if 'sensor_data' not in ss:
-    ss.sensor_data = {
-        'TDS': 450,
-        'Turbidity': 5.2,
-        'Temperature': 28.5,
-        'pH': 7.1
-    }
+# Sensor readings are shared across sessions by a single ingestion worker
+ingestion = get_ingestion_worker()
 
+# Initialize session state for persistent data
 if 'alert_count' not in ss:
     ss.alert_count = 3
 
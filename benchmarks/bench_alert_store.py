@@ -0,0 +1,52 @@
+"""Alert store filter latency on the Alerts page query shape
+
+    python -m benchmarks.bench_alert_store --alerts 100000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from alerting.store import AlertStore, SEVERITY_ORDER
+
+STATUSES = ['active', 'monitoring', 'scheduled', 'resolved']
+TYPES = ['Water Quality', 'Disease Outbreak', 'Water Contamination', 'System Alert', 'Environmental']
+DISTRICTS = ['Kamrup', 'Dibrugarh', 'Cachar', 'Aizawl', 'Imphal West', 'Kohima', 'East Khasi Hills', 'Papum Pare']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--alerts', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    now = datetime.now()
+    store = AlertStore()
+    store.add_many({
+        'title': f"Alert {i}",
+        'severity': rng.choice(list(SEVERITY_ORDER)),
+        'status': rng.choice(STATUSES),
+        'type': rng.choice(TYPES),
+        'district': rng.choice(DISTRICTS),
+        'time': now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+        'affected_population': rng.randint(0, 50_000)
+    } for i in range(args.alerts))
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        total, shown = store.query(
+            severity=['critical', 'high', 'moderate', 'low'],
+            type=TYPES[:3],
+            status=['active', 'monitoring'],
+            district='Kamrup',
+            since=now - timedelta(weeks=1),
+            limit=50
+        )
+    elapsed = (time.perf_counter() - started) / args.repeat
+
+    print(f"{args.alerts:,} alerts: {elapsed * 1000:.2f} ms per filtered top-{len(shown)} query ({total:,} matches)")
+
+
+if __name__ == '__main__':
+    main()
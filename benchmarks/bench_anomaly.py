@@ -0,0 +1,50 @@
+"""Anomaly detection throughput: scoring and alerting a whole fleet per tick
+
+    python -m benchmarks.bench_anomaly --sensors 10000 --ticks 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+from alerting.anomaly import ANOMALY_RULES, AnomalyDetector
+from alerting.rules import AlertEngine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sensors', type=int, default=10_000)
+    parser.add_argument('--ticks', type=int, default=200)
+    args = parser.parse_args()
+
+    detector = AnomalyDetector()
+    engine = AlertEngine(ANOMALY_RULES, registry=detector)
+    params = detector.inputs
+    sensor_ids = [f"S{i:05d}" for i in range(args.sensors)]
+    rng = np.random.default_rng(0)
+    centre = np.array([450, 3, 7.2, 27, 7, 400, 0.5, 1.0])[:len(params)]
+    spread = np.array([20, 0.3, 0.1, 0.5, 0.3, 15, 0.05, 0.05])[:len(params)]
+    ticks = [centre + spread * rng.standard_normal((args.sensors, len(params))) for _ in range(args.ticks)]
+    for i, values in enumerate(ticks):
+        values[rng.random(values.shape) < 0.001] *= 3  # occasional spikes
+        values[:, 0] += i * 0.5 * (np.arange(args.sensors) % 10 == 0)  # a tenth of the fleet drifts
+
+    detector.update(sensor_ids, 0, ticks[0])  # allocate slots
+    events = 0
+    score_s = 0.0
+    started = time.perf_counter()
+    for i, values in enumerate(ticks):
+        t0 = time.perf_counter()
+        scores = detector.update(sensor_ids, (i + 1) * 30_000, values)
+        score_s += time.perf_counter() - t0
+        events += len(engine.evaluate(sensor_ids, (i + 1) * 30_000, scores))
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.sensors:,} sensors x {len(params)} parameters x {args.ticks} ticks, {len(engine.rules)} anomaly rules")
+    print(f"{elapsed / args.ticks * 1000:.2f} ms per tick ({score_s / args.ticks * 1000:.2f} ms scoring), "
+          f"{args.sensors * args.ticks / elapsed:,.0f} sensor readings/s")
+    print(f"{events:,} transitions emitted")
+
+
+if __name__ == '__main__':
+    main()
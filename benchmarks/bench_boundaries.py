@@ -0,0 +1,106 @@
+"""District choropleth: boundary file size and GeoJSON payload per zoom
+
+Generates a grid of synthetic districts whose shared borders are fractal
+lines, builds the multi-zoom topology from it and reports the GeoJSON the
+map sends for a few views, against sending the raw file.
+
+    python -m benchmarks.bench_boundaries --districts 80 --border-levels 10
+"""
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from geo.boundaries import DistrictBoundaries, build
+from geo.clusters import pad_bounds
+
+RURAL_KBPS = 1000  # a slow 3G / rural broadband link, kbit/s
+SOUTH, WEST, NORTH, EAST = 22.0, 89.7, 29.5, 97.4
+VIEWS = {
+    'region (z6)': (6, (21.5, 88.0, 29.5, 98.0)),
+    'state (z8)': (8, (25.0, 90.5, 27.0, 93.0)),
+    'district (z10)': (10, (25.8, 91.2, 26.3, 91.9)),
+    'town (z13)': (13, (26.12, 91.70, 26.16, 91.78))
+}
+
+
+def jagged(start, end, levels, rng, roughness=0.8):
+    """Fractal polyline from start to end by midpoint displacement, 2^levels + 1 vertices"""
+    points = np.array([start, end], dtype=np.float64)
+    amplitude = 0.1 * np.hypot(*(end - start))
+    for _ in range(levels):
+        mids = (points[:-1] + points[1:]) / 2 + rng.normal(0, amplitude, (len(points) - 1, 2))
+        points = np.insert(points, np.arange(1, len(points)), mids, axis=0)
+        amplitude *= 2 ** -roughness
+    return points
+
+
+def districts(count, levels, rng):
+    """GeoJSON features of a rows x cols grid of districts sharing their borders"""
+    rows = max(int(np.sqrt(count * (NORTH - SOUTH) / (EAST - WEST))), 1)
+    cols = max(count // rows, 1)
+    lons, lats = np.meshgrid(np.linspace(WEST, EAST, cols + 1), np.linspace(SOUTH, NORTH, rows + 1))
+    corners = np.dstack([lons, lats])
+    inner = (slice(1, -1), slice(1, -1))
+    corners[inner] += rng.normal(0, 0.15, corners[inner].shape) * [(EAST - WEST) / cols, (NORTH - SOUTH) / rows]
+    horizontal = {(r, c): jagged(corners[r, c], corners[r, c + 1], levels, rng)
+                  for r in range(rows + 1) for c in range(cols)}
+    vertical = {(r, c): jagged(corners[r, c], corners[r + 1, c], levels, rng)
+                for r in range(rows) for c in range(cols + 1)}
+    features = []
+    for r in range(rows):
+        for c in range(cols):
+            ring = np.concatenate([horizontal[r, c][:-1], vertical[r, c + 1][:-1],
+                                   horizontal[r + 1, c][::-1][:-1], vertical[r, c][::-1]])
+            features.append({
+                'type': 'Feature',
+                'properties': {'district': f"District {r * cols + c + 1}"},
+                'geometry': {'type': 'Polygon', 'coordinates': [np.round(ring, 6).tolist()]}
+            })
+    return features
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--districts', type=int, default=80)
+    parser.add_argument('--border-levels', type=int, default=10, help="each district side has 2^levels + 1 vertices")
+    args = parser.parse_args()
+
+    features = districts(args.districts, args.border_levels, np.random.default_rng(0))
+    raw = json.dumps({'type': 'FeatureCollection', 'features': features}, separators=(',', ':'))
+
+    started = time.perf_counter()
+    topology = build(features)
+    build_s = time.perf_counter() - started
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'districts.topo.json.gz')
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(topology, f, separators=(',', ':'))
+        stored = os.path.getsize(path)
+        started = time.perf_counter()
+        boundaries = DistrictBoundaries.load(path)
+        load_s = time.perf_counter() - started
+
+    print(f"{len(features)} districts, {len(topology['arcs'])} arcs: raw GeoJSON {len(raw) / 1e6:.1f} MB, "
+          f"built in {build_s:.1f} s, stored {stored / 1e3:.0f} kB, loaded in {load_s * 1000:.0f} ms")
+    properties = {name: {'cases': 10, 'rate': 12.5} for name in boundaries.names}
+    for name, (zoom, bounds) in VIEWS.items():
+        started = time.perf_counter()
+        boundaries.geojson(zoom)
+        first_s = time.perf_counter() - started
+        started = time.perf_counter()
+        collection = boundaries.geojson(zoom, properties, pad_bounds(bounds))
+        payload = json.dumps(collection, separators=(',', ':'))
+        join_s = time.perf_counter() - started
+        print(f"  {name:>14}: {len(collection['features']):3} districts, {len(payload) / 1e3:6.0f} kB, "
+              f"~{len(payload) * 8 / RURAL_KBPS / 1e3:4.2f} s at {RURAL_KBPS} kbit/s; "
+              f"first decode {first_s * 1000:3.0f} ms, join {join_s * 1000:4.1f} ms")
+    print(f"  (the raw file would take ~{len(raw) * 8 / RURAL_KBPS / 1e3:.0f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Disease map payload: one marker per location vs server-side clusters
+
+Builds the folium map the Disease Hotspot page sends for a few views and
+reports the marker count, HTML size and build time of each.
+
+    python -m benchmarks.bench_clusters --locations 50000 --unclustered 5000
+"""
+import argparse
+import time
+
+import folium
+import numpy as np
+
+from geo.clusters import ClusterPyramid, pad_bounds
+
+VIEWS = {
+    'region (z6)': (6, (21.5, 88.0, 29.5, 98.0)),
+    'district (z9)': (9, (25.8, 91.2, 26.5, 92.3)),
+    'town (z13)': (13, (26.12, 91.70, 26.16, 91.78))
+}
+
+
+def render(markers):
+    m = folium.Map(location=[25.5, 93.0], zoom_start=6)
+    for lat, lon in markers:
+        folium.CircleMarker(location=[lat, lon], radius=8, tooltip="location", fill=True).add_to(m)
+    return m.get_root().render()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--locations', type=int, default=50_000)
+    parser.add_argument('--unclustered', type=int, default=5_000, help="locations drawn one marker each, for comparison")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    cluster = args.locations // 5
+    lats = np.concatenate([rng.uniform(22, 29.5, args.locations - cluster), rng.normal(26.14, 0.05, cluster)])
+    lons = np.concatenate([rng.uniform(89.7, 97.4, args.locations - cluster), rng.normal(91.74, 0.05, cluster)])
+    cases = rng.integers(0, 50, args.locations)
+
+    started = time.perf_counter()
+    pyramid = ClusterPyramid(lats, lons, sums={'cases': cases})
+    print(f"{args.locations:,} locations, clusters for zoom 0-{pyramid.max_zoom} built in "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    started = time.perf_counter()
+    html = render(zip(lats[:args.unclustered], lons[:args.unclustered]))
+    print(f"  {'unclustered':>14}: {args.unclustered:7,} markers, {len(html) / 1e6:6.2f} MB, "
+          f"{(time.perf_counter() - started) * 1000:6.0f} ms (only {args.unclustered:,} of the locations)")
+
+    for name, (zoom, bounds) in VIEWS.items():
+        started = time.perf_counter()
+        kind, shown = pyramid.view(zoom, pad_bounds(bounds))
+        markers = zip(lats[shown], lons[shown]) if kind == 'points' else zip(shown['lat'], shown['lon'])
+        html = render(list(markers))
+        count = len(shown) if kind == 'points' else len(shown['lat'])
+        print(f"  {name:>14}: {count:7,} {kind:<8} {len(html) / 1e6:6.2f} MB, "
+              f"{(time.perf_counter() - started) * 1000:6.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Fleet overview: latest-value table updates and sorted, filtered queries
+
+    python -m benchmarks.bench_latest --sensors 10000 --updates 20000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from sensors.latest import LatestTable
+from sensors.timeseries import now_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sensors', type=int, default=10_000)
+    parser.add_argument('--updates', type=int, default=20_000, help="single-sensor readings after the first sweep")
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    table = LatestTable()
+    sensor_ids = [f"S{i:05d}" for i in range(args.sensors)]
+    rng = np.random.default_rng(0)
+    readings = [
+        {'TDS': float(tds), 'pH': float(ph), 'Turbidity': float(turbidity)}
+        for tds, ph, turbidity in zip(rng.integers(100, 900, args.sensors), rng.uniform(6, 9, args.sensors),
+                                      rng.uniform(0, 8, args.sensors))
+    ]
+
+    started = time.perf_counter()
+    table.update(sensor_ids, now_ms(), readings)
+    sweep_s = time.perf_counter() - started
+
+    picks = rng.integers(0, args.sensors, args.updates)
+    started = time.perf_counter()
+    for i in picks:
+        table.update([sensor_ids[i]], now_ms(), [readings[i]])
+    update_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(args.queries):
+        index, _ = table.query('TDS', descending=bool(i % 2), worst=['poor', 'moderate'], search=str(i % 10))
+    query_s = time.perf_counter() - started
+
+    print(f"{args.sensors:,} sensors x {len(table.params)} parameters")
+    print(f"first sweep {sweep_s * 1000:.1f} ms, single-sensor update {update_s / args.updates * 1e6:.0f} µs")
+    print(f"sorted + filtered query {query_s / args.queries * 1000:.1f} ms ({len(index):,} matching)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""MQTT gateway throughput: JSON messages stored per second via the local broker
+
+    python -m benchmarks.bench_mqtt --sensors 500 --messages 50
+"""
+import argparse
+import json
+import tempfile
+import time
+
+from sensors.fake_device import simulated_payload
+from sensors.history import SegmentStore
+from sensors.ingest import IngestionWorker
+from sensors.mqtt import LocalBroker, MQTTGateway
+from sensors.poller import SensorPoller
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sensors', type=int, default=500)
+    parser.add_argument('--messages', type=int, default=50, help="messages per sensor")
+    parser.add_argument('--queue', type=int, default=5000, help="gateway queue size")
+    args = parser.parse_args()
+
+    # One second apart per sensor, ending now, so no reading is a duplicate
+    start = int(time.time() * 1000) - args.messages * 1000
+    messages = []
+    for m in range(args.messages):
+        for i in range(args.sensors):
+            payload = simulated_payload()
+            payload['timestamp'] = start + m * 1000
+            messages.append((f"bluealert/Assam/Kamrup/M{i:05d}", json.dumps(payload).encode()))
+
+    with tempfile.TemporaryDirectory() as root:
+        poller = SensorPoller([])
+        worker = IngestionWorker(poller, archive=SegmentStore(root))
+        worker.pipeline.start()
+        broker = LocalBroker()
+        gateway = MQTTGateway(worker, broker.client(), queue_size=args.queue, flush_interval=0.2).start()
+        while not gateway.client.filters:
+            time.sleep(0.01)
+
+        started = time.perf_counter()
+        for topic, payload in messages:
+            broker.publish(topic, payload)
+        published = time.perf_counter() - started
+        while gateway.stats['batches'] == 0 or gateway._queue.qsize():
+            time.sleep(0.01)
+        worker.pipeline.join()
+        elapsed = time.perf_counter() - started
+        gateway.stop()
+        worker.pipeline.stop()
+        poller.close()
+
+    readings = len(messages) * 8
+    print(f"{len(messages):,} messages from {args.sensors} sensors, 8 parameters each")
+    print(f"published in {published:.2f} s, stored in {elapsed:.2f} s: "
+          f"{len(messages) / elapsed:,.0f} messages/s ({readings / elapsed:,.0f} values/s)")
+    print(gateway.stats)
+    for row in worker.pipeline.metrics():
+        print(f"  {row['stage']:>8} ({row['policy']}): peak depth {row['peak_depth']:,} readings, "
+              f"busy {row['busy_s']:.2f} s, blocked {row['blocked_s']:.2f} s, shed {row['shed_readings']:,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Push ingest throughput: buffered readings stored per second over HTTP
+
+    python -m benchmarks.bench_push --sensors 20 --batch 2880
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+import requests
+
+from sensors.history import SegmentStore
+from sensors.ingest import IngestionWorker
+from sensors.poller import SensorPoller
+from sensors.push import PushServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sensors', type=int, default=20)
+    parser.add_argument('--batch', type=int, default=2880, help="readings per upload (2880 = one day at 30 s)")
+    parser.add_argument('--uploads', type=int, default=5, help="uploads per sensor")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    step = 30_000
+    start = int(time.time() * 1000) - args.uploads * args.batch * step
+    bodies = []
+    for upload in range(args.uploads):
+        ts = start + (upload * args.batch + np.arange(args.batch)) * step
+        for i in range(args.sensors):
+            bodies.append(json.dumps({
+                'id': f"P{i:04d}",
+                'ts': ts.tolist(),
+                'tds': rng.integers(200, 800, args.batch).tolist(),
+                'turbidity': np.round(rng.uniform(1.5, 12, args.batch), 1).tolist(),
+                'temperature': np.round(rng.uniform(22, 35, args.batch), 1).tolist(),
+                'ph': np.round(rng.uniform(6, 9, args.batch), 1).tolist()
+            }).encode())
+
+    with tempfile.TemporaryDirectory() as root:
+        poller = SensorPoller([])
+        worker = IngestionWorker(poller, archive=SegmentStore(root))
+        worker.pipeline.start()
+        with PushServer(worker, host='127.0.0.1', port=0) as server, requests.Session() as session:
+            started = time.perf_counter()
+            for body in bodies:
+                response = session.post(server.url, data=body, headers={'Content-Type': 'application/json'})
+                response.raise_for_status()
+            elapsed = time.perf_counter() - started
+            # A resent batch is acknowledged without storing anything
+            duplicate = session.post(server.url, data=bodies[0]).json()
+        worker.pipeline.stop()
+        poller.close()
+
+    readings = len(bodies) * args.batch
+    print(f"{len(bodies)} uploads of {args.batch:,} readings x 4 parameters, one client connection")
+    print(f"{elapsed / len(bodies) * 1000:.1f} ms per upload, {readings / elapsed:,.0f} readings/s")
+    print(f"resent batch: {duplicate}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Alert rule engine throughput: sensors evaluated per second
+
+    python -m benchmarks.bench_rules --sensors 10000 --ticks 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+from alerting.rules import AlertEngine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sensors', type=int, default=10_000)
+    parser.add_argument('--ticks', type=int, default=200)
+    args = parser.parse_args()
+
+    engine = AlertEngine()
+    params = engine.registry.params
+    sensor_ids = [f"S{i:05d}" for i in range(args.sensors)]
+    rng = np.random.default_rng(0)
+    # Readings hover around the alert thresholds so rules keep transitioning
+    centre = np.array([600, 5, 7.5, 30, 6, 400, 0.6, 1.0])[:len(params)]
+    spread = np.array([80, 1, 1.2, 2, 1, 100, 0.3, 0.3])[:len(params)]
+    ticks = [centre + spread * rng.standard_normal((args.sensors, len(params))) for _ in range(args.ticks)]
+
+    engine.evaluate(sensor_ids, 0, ticks[0])  # allocate slots
+    events = 0
+    started = time.perf_counter()
+    for i, values in enumerate(ticks):
+        events += len(engine.evaluate(sensor_ids, i * 30_000, values))
+    elapsed = time.perf_counter() - started
+
+    evaluated = args.sensors * args.ticks
+    print(f"{args.sensors:,} sensors x {args.ticks} ticks, {len(engine.rules)} rules")
+    print(f"{elapsed / args.ticks * 1000:.2f} ms per tick, {evaluated / elapsed:,.0f} sensor readings/s")
+    print(f"{events:,} transitions emitted")
+
+
+if __name__ == '__main__':
+    main()
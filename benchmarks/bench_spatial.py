@@ -0,0 +1,53 @@
+"""Map click resolution: nearest and radius lookups in the spatial grid index
+
+    python -m benchmarks.bench_spatial --points 50000 --queries 5000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from geo.spatial import GridIndex, haversine_km
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, default=50_000, help="villages and health facilities")
+    parser.add_argument('--queries', type=int, default=5_000)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--radius-km', type=float, default=10.0)
+    args = parser.parse_args()
+
+    # Northeast India, with a dense cluster around a city
+    rng = np.random.default_rng(0)
+    cluster = args.points // 5
+    lats = np.concatenate([rng.uniform(22, 29.5, args.points - cluster), rng.normal(26.14, 0.05, cluster)])
+    lons = np.concatenate([rng.uniform(89.7, 97.4, args.points - cluster), rng.normal(91.74, 0.05, cluster)])
+    clicks = np.column_stack([rng.uniform(22, 29.5, args.queries), rng.uniform(89.7, 97.4, args.queries)])
+
+    started = time.perf_counter()
+    index = GridIndex(lats, lons)
+    build_s = time.perf_counter() - started
+
+    timings = {}
+    for name, query in (('nearest', lambda lat, lon: index.nearest(lat, lon)),
+                        (f'nearest {args.k}', lambda lat, lon: index.nearest(lat, lon, args.k)),
+                        (f'within {args.radius_km:g} km', lambda lat, lon: index.within(lat, lon, args.radius_km))):
+        started = time.perf_counter()
+        for lat, lon in clicks:
+            query(lat, lon)
+        timings[name] = (time.perf_counter() - started) / args.queries
+
+    # The loop the index replaced: every point, every click
+    started = time.perf_counter()
+    for lat, lon in clicks[:200]:
+        np.argmin(haversine_km(lat, lon, lats, lons))
+    timings['full scan'] = (time.perf_counter() - started) / 200
+
+    print(f"{args.points:,} points, index built in {build_s * 1000:.1f} ms")
+    for name, seconds in timings.items():
+        print(f"  {name:>14}: {seconds * 1e6:8.1f} µs per click")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Batch validation and cleaning throughput
+
+    python -m benchmarks.bench_validation --batch 2880 --repeat 50
+"""
+import argparse
+import time
+
+import numpy as np
+
+from sensors.validation import validate_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch', type=int, default=2880, help="readings per batch")
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--bad', type=float, default=0.01, help="fraction of bad values and timestamps")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    now = int(time.time() * 1000)
+    ts = now - args.batch * 30_000 + np.arange(args.batch) * 30_000
+    columns = {
+        'TDS': rng.integers(200, 800, args.batch).astype(np.float32),
+        'Turbidity': np.round(rng.uniform(1.5, 12, args.batch), 1).astype(np.float32),
+        'Temperature': np.round(rng.uniform(22, 35, args.batch), 1).astype(np.float32),
+        'pH': np.round(rng.uniform(6, 9, args.batch), 1).astype(np.float32)
+    }
+    # Sprinkle in what real uploads carry: probe errors, resends and reordering
+    bad = rng.random(args.batch) < args.bad
+    columns['pH'][bad] = 0
+    columns['Temperature'][rng.random(args.batch) < args.bad] = -127
+    ts[rng.random(args.batch) < args.bad] = 0
+    swap = rng.integers(0, args.batch - 1, int(args.batch * args.bad))
+    ts[swap], ts[swap + 1] = ts[swap + 1], ts[swap]
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        _, _, report = validate_batch('S001', ts, columns, now=now)
+    elapsed = (time.perf_counter() - started) / args.repeat
+
+    print(f"{args.batch:,} readings x {len(columns)} parameters per batch")
+    print(f"{elapsed * 1000:.3f} ms per batch, {args.batch / elapsed:,.0f} readings/s")
+    print(f"report: {report}")
+
+
+if __name__ == '__main__':
+    main()
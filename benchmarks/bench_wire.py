@@ -0,0 +1,51 @@
+"""Batch decode throughput: JSON vs binary frames
+
+    python -m benchmarks.bench_wire --batch 2880 --repeat 50
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from sensors.push import parse_batch, parse_frame
+from sensors.wire import encode_batch
+
+
+def throughput(decode, body, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        decode(body)
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch', type=int, default=2880, help="readings per batch")
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    ts = int(time.time() * 1000) - args.batch * 30_000 + np.arange(args.batch) * 30_000
+    columns = {
+        'tds': rng.integers(200, 800, args.batch).astype(np.float32),
+        'turbidity': np.round(rng.uniform(1.5, 12, args.batch), 1).astype(np.float32),
+        'temperature': np.round(rng.uniform(22, 35, args.batch), 1).astype(np.float32),
+        'ph': np.round(rng.uniform(6, 9, args.batch), 1).astype(np.float32)
+    }
+    json_body = json.dumps({'id': 'S001', 'ts': ts.tolist(), **{k: v.tolist() for k, v in columns.items()}}).encode()
+    frame = encode_batch('S001', ts, columns)
+
+    formats = [
+        ('json', json_body, lambda body: parse_batch(json.loads(body))),
+        ('binary', frame, parse_frame)
+    ]
+    print(f"{args.batch:,} readings x {len(columns)} parameters per batch")
+    for name, body, decode in formats:
+        elapsed = throughput(decode, body, args.repeat)
+        print(f"{name:>6}: {len(body) / args.batch:5.1f} bytes/reading, "
+              f"{elapsed * 1000:7.3f} ms per batch, {args.batch / elapsed:,.0f} readings/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Spatial indexing and map helpers for BlueAlert"""
@@ -0,0 +1,287 @@
+"""District boundaries simplified per zoom level, in a compact topology
+
+The offline step turns a GeoJSON of district polygons (several MB for
+Northeast India) into a small gzipped file:
+
+    python -m geo.boundaries districts.geojson --name-property district
+
+Rings are cut into arcs wherever they meet a different neighbour, and a
+border shared by two districts is stored once as a single arc (TopoJSON
+style). Each arc is simplified with Douglas-Peucker run once to full
+depth, which gives every vertex the tolerance at which it would be
+dropped; that is turned into the lowest zoom level the vertex appears at.
+Arc end points are always kept, so neighbouring districts stay seamless
+at every zoom. Coordinates are quantized to integers and delta-encoded.
+
+At runtime `DistrictBoundaries.geojson(zoom, properties)` keeps the
+vertices visible at that zoom, rebuilds the rings and joins per-district
+properties, such as incidence rates, into a GeoJSON FeatureCollection.
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+
+import numpy as np
+
+DEFAULT_PATH = os.environ.get('BLUEALERT_BOUNDARIES', os.path.join('data', 'districts.topo.json.gz'))
+MIN_ZOOM, MAX_ZOOM = 4, 12
+TOLERANCE_PX = 1.5  # simplification error allowed at each zoom, in screen pixels
+QUANTIZATION = 1_000_000  # integer grid steps across the bounding box
+
+
+def tolerance(zoom):
+    """Simplification tolerance in degrees at a zoom level"""
+    return TOLERANCE_PX * 360 / (256 * 2 ** zoom)
+
+
+def _rings(geometry):
+    """Polygons of a GeoJSON (Multi)Polygon as lists of rings, closing point removed"""
+    polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+    return [[np.asarray(ring, dtype=np.float64)[:-1, :2] for ring in polygon] for polygon in polygons]
+
+
+def _significance(points, scale):
+    """Douglas-Peucker drop tolerance of every vertex of an open polyline
+
+    End points get infinity. A vertex never outlives the vertex that split
+    the segment it lies on, so keeping those above a tolerance always gives
+    the same result as running Douglas-Peucker with that tolerance.
+    """
+    xy = points * scale
+    weights = np.full(len(points), np.inf)
+    stack = [(0, len(points) - 1, np.inf)]
+    while stack:
+        first, last, ceiling = stack.pop()
+        if last - first < 2:
+            continue
+        inner = xy[first + 1:last]
+        start, end = xy[first], xy[last]
+        chord = end - start
+        length = np.hypot(*chord)
+        if length == 0:
+            distances = np.hypot(*(inner - start).T)
+        else:
+            distances = np.abs(chord[0] * (inner[:, 1] - start[1]) - chord[1] * (inner[:, 0] - start[0])) / length
+        split = first + 1 + int(np.argmax(distances))
+        weight = min(float(distances[split - first - 1]), ceiling)
+        weights[split] = weight
+        stack.append((first, split, weight))
+        stack.append((split, last, weight))
+    return weights
+
+
+def build(features, name_property='district', min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    """Compact multi-zoom topology of GeoJSON district features"""
+    names, shapes = [], []
+    for feature in features:
+        geometry = feature.get('geometry')
+        if geometry is None or geometry['type'] not in ('Polygon', 'MultiPolygon'):
+            continue
+        names.append(str(feature['properties'][name_property]))
+        shapes.append(_rings(geometry))
+    rings = [ring for shape in shapes for polygon in shape for ring in polygon]
+    if not rings:
+        raise ValueError("no Polygon or MultiPolygon features")
+
+    # Quantize, then drop repeated vertices the grid merged
+    everything = np.concatenate(rings)
+    translate = everything.min(axis=0)
+    scale = np.maximum(everything.max(axis=0) - translate, 1e-9) / (QUANTIZATION - 1)
+    quantized = []
+    for ring in rings:
+        q = np.round((ring - translate) / scale).astype(np.int64)
+        q = q[np.concatenate([[True], np.any(q[1:] != q[:-1], axis=1)])]
+        if len(q) > 1 and (q[0] == q[-1]).all():
+            q = q[:-1]
+        quantized.append(q)
+
+    # A vertex is a junction if its occurrences disagree on their neighbours
+    keys = [q[:, 0] * QUANTIZATION + q[:, 1] for q in quantized]
+    flat = np.concatenate(keys)
+    prev = np.concatenate([np.roll(k, 1) for k in keys])
+    after = np.concatenate([np.roll(k, -1) for k in keys])
+    low, high = np.minimum(prev, after), np.maximum(prev, after)
+    order = np.argsort(flat, kind='stable')
+    starts = np.flatnonzero(np.concatenate([[True], flat[order][1:] != flat[order][:-1]]))
+    counts = np.diff(np.append(starts, len(flat)))
+    disagree = (
+        (np.minimum.reduceat(low[order], starts) != np.maximum.reduceat(low[order], starts)) |
+        (np.minimum.reduceat(high[order], starts) != np.maximum.reduceat(high[order], starts))
+    )
+    junctions = set(flat[order][starts][(counts > 1) & disagree].tolist())
+
+    # Cut rings into arcs at junctions; a shared border becomes one arc
+    arcs, arc_index, forced, ring_arcs = [], {}, set(), []
+    for q, k in zip(quantized, keys):
+        cuts = [i for i, key in enumerate(k.tolist()) if key in junctions]
+        if not cuts:
+            # No neighbour: one closed arc, rotated to a canonical start so
+            # an enclave and the hole around it still share it
+            cuts = [int(np.argmin(k))]
+        q = np.roll(q, -cuts[0], axis=0)
+        cuts = [c - cuts[0] for c in cuts] + [len(q)]
+        closed = np.vstack([q, q[:1]])
+        refs = []
+        for a, b in zip(cuts[:-1], cuts[1:]):
+            arc = closed[a:b + 1]
+            key = arc.tobytes()
+            if key in arc_index:
+                refs.append(arc_index[key])
+                continue
+            reverse = arc[::-1].tobytes()
+            if reverse in arc_index:
+                refs.append(~arc_index[reverse])
+                continue
+            arc_index[key] = len(arcs)
+            refs.append(len(arcs))
+            arcs.append(arc)
+        if len(refs) < 3:
+            # Keep enough of this ring that it stays a polygon when simplified
+            forced.update(r if r >= 0 else ~r for r in refs)
+        ring_arcs.append(refs)
+
+    # Lowest zoom every vertex shows up at; vertices below the finest
+    # tolerance are dropped from the file
+    squash = math.cos(math.radians(translate[1] + scale[1] * QUANTIZATION / 2))
+    unit = scale * np.array([squash, 1.0])
+    zoom_levels = np.arange(min_zoom, max_zoom + 1)
+    cutoffs = np.array([tolerance(z) for z in zoom_levels])
+    packed_arcs, packed_zooms = [], []
+    for i, arc in enumerate(arcs):
+        weights = _significance(arc.astype(np.float64), unit)
+        if i in forced or (arc[0] == arc[-1]).all():
+            # Closed or nearly bare arcs keep their extreme vertices at every zoom
+            inner = arc[1:-1].astype(np.float64) * unit
+            if len(inner):
+                far = 1 + int(np.argmax(np.hypot(*(inner - arc[0] * unit).T)))
+                weights[far] = np.inf
+                for lo, hi in ((0, far), (far, len(arc) - 1)):
+                    if hi - lo > 1:
+                        part = arc[lo + 1:hi].astype(np.float64) * unit
+                        weights[lo + 1 + int(np.argmax(np.hypot(*(part - arc[lo] * unit).T)))] = np.inf
+        first_zoom = zoom_levels[np.minimum(np.searchsorted(-cutoffs, -weights, side='left'), len(zoom_levels) - 1)]
+        visible = weights > cutoffs[-1]
+        kept = arc[visible]
+        deltas = np.vstack([kept[:1], np.diff(kept, axis=0)])
+        packed_arcs.append(deltas.ravel().tolist())
+        packed_zooms.append(first_zoom[visible].tolist())
+
+    districts, position = [], 0
+    for name, shape in zip(names, shapes):
+        polygons = []
+        for polygon in shape:
+            polygons.append(ring_arcs[position:position + len(polygon)])
+            position += len(polygon)
+        districts.append({'name': name, 'polygons': polygons})
+
+    return {
+        'type': 'BlueAlertTopology',
+        'transform': {'scale': scale.tolist(), 'translate': translate.tolist()},
+        'zooms': [min_zoom, max_zoom],
+        'arcs': packed_arcs,
+        'arc_zooms': packed_zooms,
+        'districts': districts
+    }
+
+
+class DistrictBoundaries:
+    """Runtime view of a topology written by `build`
+
+    Decoded geometry is kept per zoom level, so each level is rebuilt at
+    most once per process.
+    """
+
+    def __init__(self, topology):
+        transform = topology['transform']
+        scale, translate = np.array(transform['scale']), np.array(transform['translate'])
+        self.min_zoom, self.max_zoom = topology['zooms']
+        self.districts = topology['districts']
+        self.names = [d['name'] for d in self.districts]
+        self._arcs = [np.cumsum(np.array(arc, dtype=np.int64).reshape(-1, 2), axis=0) * scale + translate
+                      for arc in topology['arcs']]
+        self._arc_zooms = [np.array(zooms, dtype=np.int64) for zooms in topology['arc_zooms']]
+        self._levels = {}
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def level(self, zoom):
+        """The stored zoom level used for a map zoom"""
+        return int(np.clip(zoom, self.min_zoom, self.max_zoom))
+
+    def _geometries(self, level):
+        """(geometry, bbox) per district at a stored zoom level"""
+        if level not in self._levels:
+            decimals = max(int(math.ceil(-math.log10(tolerance(level)))), 0)
+            arcs = []
+            for arc, zooms in zip(self._arcs, self._arc_zooms):
+                arc = np.round(arc[zooms <= level], decimals)
+                # Rounding can stack neighbouring vertices; the stacked copies are redundant
+                arcs.append(arc[np.concatenate([[True], np.any(arc[1:] != arc[:-1], axis=1)])])
+            geometries = []
+            for district in self.districts:
+                polygons = []
+                for polygon in district['polygons']:
+                    rings = [self._ring(arcs, refs) for refs in polygon]
+                    if len(rings[0]) < 4:
+                        continue  # the outer ring vanished at this zoom
+                    polygons.append([ring.tolist() for ring in rings if len(ring) >= 4])
+                points = np.concatenate([np.asarray(ring) for polygon in polygons for ring in polygon]) if polygons else None
+                bbox = None if points is None else (*points.min(axis=0)[::-1], *points.max(axis=0)[::-1])
+                geometries.append(({'type': 'MultiPolygon', 'coordinates': polygons}, bbox))
+            self._levels[level] = geometries
+        return self._levels[level]
+
+    @staticmethod
+    def _ring(arcs, refs):
+        parts = [arcs[r] if r >= 0 else arcs[~r][::-1] for r in refs]
+        # Consecutive arcs share their junction; keep it once, then close
+        ring = np.concatenate([parts[0]] + [part[1:] for part in parts[1:]])
+        return ring if len(ring) and (ring[0] == ring[-1]).all() else np.vstack([ring, ring[:1]])
+
+    def geojson(self, zoom, properties=None, bounds=None):
+        """FeatureCollection of the districts at a map zoom
+
+        `properties` maps district names to dicts merged into their feature
+        properties; `bounds` (south, west, north, east) leaves out districts
+        entirely outside it.
+        """
+        features = []
+        for district, (geometry, bbox) in zip(self.districts, self._geometries(self.level(zoom))):
+            if bbox is None:
+                continue
+            if bounds is not None:
+                south, west, north, east = bounds
+                if bbox[2] < south or bbox[0] > north or bbox[3] < west or bbox[1] > east:
+                    continue
+            features.append({
+                'type': 'Feature',
+                'properties': {'name': district['name'], **(properties or {}).get(district['name'], {})},
+                'geometry': geometry
+            })
+        return {'type': 'FeatureCollection', 'features': features}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simplify district boundaries for the disease map")
+    parser.add_argument('source', help="GeoJSON FeatureCollection of district (Multi)Polygons")
+    parser.add_argument('--name-property', default='district', help="feature property holding the district name")
+    parser.add_argument('--out', default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    with open(args.source, encoding='utf-8') as f:
+        features = json.load(f)['features']
+    topology = build(features, args.name_property)
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    with gzip.open(args.out, 'wt', encoding='utf-8') as f:
+        json.dump(topology, f, separators=(',', ':'))
+    print(f"{len(topology['districts'])} districts, {len(topology['arcs'])} arcs: "
+          f"{os.path.getsize(args.source) / 1e6:.1f} MB -> {os.path.getsize(args.out) / 1e3:.0f} kB at {args.out}")
+
+
+if __name__ == '__main__':
+    main()
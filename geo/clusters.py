@@ -0,0 +1,110 @@
+"""Per-zoom marker clusters aggregated on the server
+
+Each zoom level z of a web map divides the Web Mercator square into
+2^z x 2^z tiles of TILE_PX pixels. `ClusterPyramid` buckets points into
+cells of CELL_PX screen pixels at every zoom level from `max_zoom` down to
+0, so a cell at level z holds four cells of level z + 1 and each coarser
+level is aggregated from the finer one, not from the raw points. A cell
+keeps its point count, the sums of its numeric columns, the maximum of its
+ranked columns (such as a risk level) and its centroid.
+
+A map view then costs at most one marker per visible cell, whatever the
+number of points: about (width / CELL_PX) x (height / CELL_PX) clusters.
+`view` switches to the individual points once few enough are visible.
+"""
+import numpy as np
+
+TILE_PX = 256
+CELL_PX = 64
+MAX_ZOOM = 16
+MAX_POINTS = 300  # draw individual points when no more than this are in view
+MAX_LAT = 85.05112878  # Web Mercator's latitude limit
+
+
+def mercator(lats, lons):
+    """Web Mercator coordinates of points, both in [0, 1) with y growing south"""
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -MAX_LAT, MAX_LAT)
+    x = (np.asarray(lons, dtype=np.float64) + 180) / 360
+    y = 0.5 - np.log(np.tan(np.pi / 4 + np.radians(lats) / 2)) / (2 * np.pi)
+    return np.clip(x, 0, 1 - 1e-12), np.clip(y, 0, 1 - 1e-12)
+
+
+def _aggregate(cx, cy, sums, maxes):
+    """Merge rows that share a cell; returns (cx, cy, sums, maxes) per cell"""
+    keys = cy.astype(np.int64) << 32 | cx.astype(np.int64)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) if len(keys) else np.zeros(0, dtype=np.int64)
+    cells = order[starts]
+    sums = {name: np.add.reduceat(values[order], starts) if len(starts) else values[:0] for name, values in sums.items()}
+    maxes = {name: np.maximum.reduceat(values[order], starts) if len(starts) else values[:0] for name, values in maxes.items()}
+    return cx[cells], cy[cells], sums, maxes
+
+
+class ClusterPyramid:
+    """Clusters of `lats`/`lons` at every zoom level up to `max_zoom`
+
+    `sums` and `maxes` map column names to arrays aligned with the points;
+    each cluster reports the sum or maximum of them over its points, plus
+    `count` and a centroid `lat`/`lon`.
+    """
+
+    def __init__(self, lats, lons, sums=None, maxes=None, max_zoom=MAX_ZOOM):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.max_zoom = max_zoom
+        x, y = mercator(self.lats, self.lons)
+        side = TILE_PX // CELL_PX << max_zoom
+        cx, cy = (x * side).astype(np.int64), (y * side).astype(np.int64)
+        sums = {name: np.asarray(values, dtype=np.float64) for name, values in (sums or {}).items()}
+        sums.update({'count': np.ones(len(self.lats)), '_lat': self.lats.copy(), '_lon': self.lons.copy()})
+        maxes = {name: np.asarray(values) for name, values in (maxes or {}).items()}
+
+        self.levels = [None] * (max_zoom + 1)
+        for zoom in range(max_zoom, -1, -1):
+            cx, cy, sums, maxes = _aggregate(cx, cy, sums, maxes)
+            level = {name: values for name, values in sums.items() if not name.startswith('_')}
+            level.update(maxes)
+            level['lat'] = sums['_lat'] / sums['count']
+            level['lon'] = sums['_lon'] / sums['count']
+            self.levels[zoom] = level
+            cx, cy = cx >> 1, cy >> 1
+
+    def clusters(self, zoom, bounds=None):
+        """Clusters of one zoom level, optionally only those inside `bounds`
+
+        `bounds` is (south, west, north, east) in degrees. Returns a dict of
+        aligned arrays.
+        """
+        level = self.levels[int(np.clip(zoom, 0, self.max_zoom))]
+        if bounds is None:
+            return level
+        inside = _inside(level['lat'], level['lon'], bounds)
+        return {name: values[inside] for name, values in level.items()}
+
+    def view(self, zoom, bounds=None, max_points=MAX_POINTS):
+        """('points', positions) or ('clusters', clusters) to draw for a map view
+
+        Individual points are drawn once no more than `max_points` of them
+        fall inside `bounds`; otherwise the zoom level's clusters are, and
+        past `max_zoom` the finest level's, so no point is ever left out.
+        """
+        inside = np.ones(len(self.lats), dtype=bool) if bounds is None else _inside(self.lats, self.lons, bounds)
+        if inside.sum() <= max_points:
+            return 'points', np.flatnonzero(inside)
+        return 'clusters', self.clusters(zoom, bounds)
+
+    def __len__(self):
+        return len(self.lats)
+
+
+def _inside(lats, lons, bounds):
+    south, west, north, east = bounds
+    return (lats >= south) & (lats <= north) & (lons >= west) & (lons <= east)
+
+
+def pad_bounds(bounds, fraction=0.5):
+    """Bounds grown by `fraction` of their size on every side, so a short pan stays covered"""
+    south, west, north, east = bounds
+    dlat, dlon = (north - south) * fraction, (east - west) * fraction
+    return max(south - dlat, -90), max(west - dlon, -180), min(north + dlat, 90), min(east + dlon, 180)
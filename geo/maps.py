@@ -0,0 +1,57 @@
+"""Folium maps that are built once and shared between reruns and sessions"""
+import folium
+import streamlit_folium
+
+
+class PrerenderedMap(folium.Map):
+    """A folium Map that is rendered and turned into Leaflet JS only once
+
+    st_folium renders the map it is given and templates every child into
+    Leaflet JS on every call, which for a few hundred markers with popups
+    costs far more than building them, and renames the children's ids as it
+    goes, which is unsafe on a map shared between sessions. Render a cached
+    map once when it is built, which also keeps the generated script, and
+    draw it with `st_prerendered`; nothing should be added to it after that.
+    """
+
+    def render(self, **kwargs):
+        if getattr(self, 'leaflet', None) is None:
+            super().render(**kwargs)
+            # Same order as st_folium: generating the script renames the ids
+            leaflet = streamlit_folium._get_map_string(self)
+            self.sibling_html = streamlit_folium._get_siblings(self)
+            self.full_id = streamlit_folium.get_full_id(self)
+            self.script_hash = streamlit_folium.generate_js_hash(leaflet)
+            self.leaflet = leaflet
+
+
+def st_prerendered(m, height=700, width=500, returned_objects=None):
+    """st_folium for a PrerenderedMap, passing its kept script straight to the component
+
+    Mirrors st_folium of the streamlit-folium version pinned in
+    requirements.txt, without the per-call templating.
+    """
+    m.render()
+    south_west, north_east = m.get_bounds()
+    defaults = {
+        'last_clicked': None,
+        'last_object_clicked': None,
+        'last_object_clicked_tooltip': None,
+        'last_object_clicked_popup': None,
+        'all_drawings': None,
+        'last_active_drawing': None,
+        'bounds': {
+            '_southWest': {'lat': south_west[0], 'lng': south_west[1]},
+            '_northEast': {'lat': north_east[0], 'lng': north_east[1]}
+        },
+        'zoom': m.options.get('zoom'),
+        'last_circle_radius': None,
+        'last_circle_polygon': None
+    }
+    if returned_objects is not None:
+        defaults = {name: value for name, value in defaults.items() if name in returned_objects}
+    return streamlit_folium._component_func(
+        script=m.leaflet, html=m.sibling_html, id=m.full_id, key=m.script_hash, height=height, width=width,
+        returned_objects=returned_objects, default=defaults, zoom=None, center=None, feature_group=None,
+        return_on_hover=False
+    )
@@ -0,0 +1,142 @@
+"""Grid index over latitude/longitude points for nearest and radius queries
+
+Points are bucketed into a regular grid of cells roughly CELL_POINTS
+points each, with longitude cells widened by 1/cos(latitude) so cells are
+close to square on the ground. Points are sorted by cell, and a dense
+offsets array maps each cell to its slice of the sorted order; the cells of
+one grid row over a column range are then a single contiguous slice.
+
+A nearest query searches a square of cells around the query point, growing
+it one ring at a time until the k-th best haversine distance is no further
+than the square's edge, so nothing outside can beat it. A radius query
+scans the rows of cells overlapping the circle's bounding box. Both touch a
+handful of cells and a few dozen points, whatever the size of the index.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG = np.pi * EARTH_RADIUS_KM / 180
+CELL_POINTS = 4  # average points per occupied cell the grid is sized for
+MAX_CELLS = 4_000_000
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance from (lat, lon) to arrays of points, in km"""
+    lat, lon, lats, lons = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    """Static index over `lats`/`lons`; query results are positions into them
+
+    Build once per version of the data and reuse it for every query.
+    """
+
+    def __init__(self, lats, lons):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        n = len(self.lats)
+        if n:
+            self._lat0, self._lon0 = self.lats.min(), self.lons.min()
+            lat_span = max(self.lats.max() - self._lat0, 1e-6)
+            lon_span = max(self.lons.max() - self._lon0, 1e-6)
+        else:
+            self._lat0 = self._lon0 = 0.0
+            lat_span = lon_span = 1.0
+        # Square-ish cells on the ground, sized for CELL_POINTS points each
+        self._squash = max(np.cos(np.radians(self._lat0 + lat_span / 2)), 0.01)
+        area = lat_span * lon_span * self._squash
+        self._cell_lat = max(np.sqrt(area * CELL_POINTS / max(n, 1)), np.sqrt(area / MAX_CELLS), 1e-6)
+        self._cell_lon = self._cell_lat / self._squash
+        self._rows = int(lat_span // self._cell_lat) + 1
+        self._cols = int(lon_span // self._cell_lon) + 1
+
+        rows, cols = self._cell_of(self.lats, self.lons)
+        keys = rows * self._cols + cols
+        self._order = np.argsort(keys, kind='stable')
+        self._offsets = np.searchsorted(keys[self._order], np.arange(self._rows * self._cols + 1))
+
+    def _cell_of(self, lat, lon):
+        rows = np.clip(((np.asarray(lat) - self._lat0) // self._cell_lat).astype(np.int64), 0, self._rows - 1)
+        cols = np.clip(((np.asarray(lon) - self._lon0) // self._cell_lon).astype(np.int64), 0, self._cols - 1)
+        return rows, cols
+
+    def _cell(self, lat, lon):
+        """Grid cell of one point, clamped to the grid; plain floats are faster here"""
+        row = min(max(int((lat - self._lat0) // self._cell_lat), 0), self._rows - 1)
+        col = min(max(int((lon - self._lon0) // self._cell_lon), 0), self._cols - 1)
+        return row, col
+
+    def _block(self, row_lo, row_hi, col_lo, col_hi):
+        """Positions of the points in a rectangle of cells, bounds inclusive"""
+        row_lo, row_hi = max(row_lo, 0), min(row_hi, self._rows - 1)
+        col_lo, col_hi = max(col_lo, 0), min(col_hi, self._cols - 1)
+        if row_lo > row_hi or col_lo > col_hi:
+            return np.zeros(0, dtype=np.int64)
+        base = np.arange(row_lo, row_hi + 1) * self._cols
+        starts, ends = self._offsets[base + col_lo], self._offsets[base + col_hi + 1]
+        return self._order[np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])]
+
+    def nearest(self, lat, lon, k=1, mask=None):
+        """(positions, km) of the k points closest to (lat, lon), nearest first
+
+        `mask`, a boolean array over the points, restricts the search to the
+        points where it is True.
+        """
+        row, col = self._cell(lat, lon)
+        limit = max(row, self._rows - 1 - row, col, self._cols - 1 - col)
+        for ring in range(limit + 1):
+            found = self._block(row - ring, row + ring, col - ring, col + ring)
+            if mask is not None:
+                found = found[mask[found]]
+            if len(found) < k and ring < limit:
+                continue
+            km = haversine_km(lat, lon, self.lats[found], self.lons[found])
+            best = np.argsort(km, kind='stable')[:k]
+            if len(best) < k and ring < limit:
+                continue
+            # Nothing outside the searched square is closer than its nearest edge
+            reach = self._reach(lat, lon, row - ring, row + ring, col - ring, col + ring)
+            if ring == limit or (len(best) and km[best[-1]] <= reach):
+                return found[best], km[best]
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+    def _reach(self, lat, lon, row_lo, row_hi, col_lo, col_hi):
+        """Lower bound on the distance from (lat, lon) to any cell outside a block"""
+        south = self._lat0 + row_lo * self._cell_lat
+        north = self._lat0 + (row_hi + 1) * self._cell_lat
+        west = self._lon0 + col_lo * self._cell_lon
+        east = self._lon0 + (col_hi + 1) * self._cell_lon
+        edges = []
+        if row_lo > 0:
+            edges.append(math.radians(lat - south))
+        if row_hi < self._rows - 1:
+            edges.append(math.radians(north - lat))
+        # Distance to a meridian great circle, exact at the query's latitude
+        cos_lat = math.cos(math.radians(lat))
+        if col_lo > 0:
+            edges.append(math.asin(min(math.sin(math.radians(min(lon - west, 90))) * cos_lat, 1)))
+        if col_hi < self._cols - 1:
+            edges.append(math.asin(min(math.sin(math.radians(min(east - lon, 90))) * cos_lat, 1)))
+        return max(min(edges, default=np.inf), 0) * EARTH_RADIUS_KM
+
+    def within(self, lat, lon, radius_km, mask=None):
+        """(positions, km) of every point within `radius_km`, nearest first"""
+        dlat = radius_km / KM_PER_DEG
+        squash = math.cos(math.radians(min(abs(lat) + dlat, 89.9)))
+        dlon = dlat / squash
+        row_lo, col_lo = self._cell(lat - dlat, lon - dlon)
+        row_hi, col_hi = self._cell(lat + dlat, lon + dlon)
+        found = self._block(row_lo, row_hi, col_lo, col_hi)
+        if mask is not None:
+            found = found[mask[found]]
+        km = haversine_km(lat, lon, self.lats[found], self.lons[found])
+        hit = np.flatnonzero(km <= radius_km)
+        order = hit[np.argsort(km[hit], kind='stable')]
+        return found[order], km[order]
+
+    def __len__(self):
+        return len(self.lats)
@@ -4,6 +4,8 @@ import pandas as pd
 from datetime import datetime, timedelta
 import random
 
+from alerting.store import get_alert_store
+
 st.title("🚨 Health & Safety Alerts")
 st.markdown("### Real-time notifications and emergency warnings")
 
@@ -12,60 +14,60 @@ st.markdown("### Real-time notifications and emergency warnings")
 def generate_alerts_data():
     alerts = [
         {
-            "id": 1,
             "type": "Water Quality",
             "title": "High TDS Levels Detected",
             "message": "TDS levels in Guwahati district exceed 600 ppm. Immediate water treatment recommended.",
             "severity": "high",
             "location": "Guwahati, Kamrup",
+            "district": "Kamrup",
             "time": datetime.now() - timedelta(hours=2),
             "status": "active",
             "affected_population": 25000,
             "source": "Sensor Network"
         },
         {
-            "id": 2,
             "type": "Disease Outbreak",
             "title": "Cholera Cases Rising",
             "message": "15 new cholera cases reported in Aizawl region. Enhanced surveillance activated.",
             "severity": "critical",
             "location": "Aizawl, Mizoram",
+            "district": "Aizawl",
             "time": datetime.now() - timedelta(hours=5),
             "status": "active",
             "affected_population": 8000,
             "source": "Health Department"
         },
         {
-            "id": 3,
             "type": "Water Contamination",
             "title": "Turbidity Alert",
             "message": "High turbidity detected in Silchar water supply. Boiling water recommended.",
             "severity": "moderate",
             "location": "Silchar, Cachar",
+            "district": "Cachar",
             "time": datetime.now() - timedelta(days=1),
             "status": "monitoring",
             "affected_population": 12000,
             "source": "Sensor Network"
         },
         {
-            "id": 4,
             "type": "System Alert",
             "title": "Sensor Maintenance Required",
             "message": "Sensor S004 at Distribution Point 2 requires maintenance check.",
             "severity": "low",
             "location": "Dibrugarh District",
+            "district": "Dibrugarh",
             "time": datetime.now() - timedelta(days=2),
             "status": "scheduled",
             "affected_population": 0,
             "source": "System Monitoring"
         },
         {
-            "id": 5,
             "type": "Environmental",
             "title": "Monsoon Water Quality Warning",
             "message": "Heavy rainfall may affect water quality. Increased monitoring activated.",
             "severity": "moderate",
             "location": "Regional",
+            "district": None,
             "time": datetime.now() - timedelta(days=3),
             "status": "resolved",
             "affected_population": 50000,
@@ -74,7 +76,14 @@ def generate_alerts_data():
     ]
     return alerts
 
-alerts_data = generate_alerts_data()
+@st.cache_resource
+def seed_demo_alerts():
+    """Load the demo alerts into the shared store once per server process"""
+    store = get_alert_store()
+    store.add_many(generate_alerts_data())
+    return store
+
+alert_store = seed_demo_alerts()
 
 # Alert summary cards
 st.markdown('<div class="card">', unsafe_allow_html=True)
@@ -82,14 +91,14 @@ st.markdown("### 📊 Alert Summary")
 
 col1, col2, col3, col4 = st.columns(4)
 
-active_alerts = [a for a in alerts_data if a['status'] == 'active']
-critical_alerts = [a for a in alerts_data if a['severity'] == 'critical']
-total_affected = sum(a['affected_population'] for a in active_alerts)
+active_count = alert_store.count(status='active')
+critical_count = alert_store.count(severity='critical')
+total_affected = alert_store.total_affected(status='active')
 
 with col1:
     st.markdown(f"""
     <div class="metric-card" style="border-left: 4px solid #e74c3c;">
-        <h3 style="color: #e74c3c; margin: 0;">{len(active_alerts)}</h3>
+        <h3 style="color: #e74c3c; margin: 0;">{active_count}</h3>
         <p style="margin: 5px 0 0 0; opacity: 0.8;">Active Alerts</p>
     </div>
     """, unsafe_allow_html=True)
@@ -97,7 +106,7 @@ with col1:
 with col2:
     st.markdown(f"""
     <div class="metric-card" style="border-left: 4px solid #c0392b;">
-        <h3 style="color: #c0392b; margin: 0;">{len(critical_alerts)}</h3>
+        <h3 style="color: #c0392b; margin: 0;">{critical_count}</h3>
         <p style="margin: 5px 0 0 0; opacity: 0.8;">Critical Alerts</p>
     </div>
     """, unsafe_allow_html=True)
@@ -156,122 +165,159 @@ with col4:
 
 st.markdown('</div>', unsafe_allow_html=True)
 
-# Filter alerts based on selection
-filtered_alerts = alerts_data.copy()
-
-if severity_filter:
-    filtered_alerts = [a for a in filtered_alerts if a['severity'] in severity_filter]
-if type_filter:
-    filtered_alerts = [a for a in filtered_alerts if a['type'] in type_filter]
-if status_filter:
-    filtered_alerts = [a for a in filtered_alerts if a['status'] in status_filter]
-
-# Time filtering
-if time_filter != 'All Time':
-    cutoff_times = {
-        'Last 24 Hours': datetime.now() - timedelta(days=1),
-        'Last Week': datetime.now() - timedelta(weeks=1),
-        'Last Month': datetime.now() - timedelta(days=30)
-    }
-    cutoff = cutoff_times[time_filter]
-    filtered_alerts = [a for a in filtered_alerts if a['time'] >= cutoff]
+# Filter alerts based on selection; an empty multiselect means no filter
+cutoff_times = {
+    'All Time': None,
+    'Last 24 Hours': datetime.now() - timedelta(days=1),
+    'Last Week': datetime.now() - timedelta(weeks=1),
+    'Last Month': datetime.now() - timedelta(days=30)
+}
+
+alert_filters = {
+    'severity': severity_filter or None,
+    'type': type_filter or None,
+    'status': status_filter or None,
+    # Regional and sensor alerts have no district and stay visible under any district
+    'district': None if ss.selected_district == "All" else [ss.selected_district, None],
+    'since': cutoff_times[time_filter]
+}
+total_found = alert_store.count(**alert_filters)
+
+severity_colors = {
+    'critical': '#c0392b',
+    'high': '#e74c3c',
+    'moderate': '#f39c12',
+    'low': '#3498db'
+}
+
+severity_icons = {
+    'critical': '🆘',
+    'high': '🚨',
+    'moderate': '⚠️',
+    'low': 'ℹ️'
+}
+
+status_colors = {
+    'active': '#e74c3c',
+    'monitoring': '#f39c12',
+    'scheduled': '#3498db',
+    'resolved': '#27ae60'
+}
+
+def format_time_ago(time):
+    time_ago = datetime.now() - time
+    if time_ago.days > 0:
+        return f"{time_ago.days} day{'s' if time_ago.days > 1 else ''} ago"
+    elif time_ago.seconds > 3600:
+        hours = time_ago.seconds // 3600
+        return f"{hours} hour{'s' if hours > 1 else ''} ago"
+    else:
+        minutes = time_ago.seconds // 60
+        return f"{minutes} minute{'s' if minutes > 1 else ''} ago"
+
+def render_alert_details(alert):
+    """Full alert body, only built for alerts whose details are open"""
+    col1, col2 = st.columns([3, 1])
+    
+    with col1:
+        st.markdown(f"""
+        **{alert['message']}**
+        
+        📍 **Location:** {alert['location']}  
+        🕐 **Time:** {format_time_ago(alert['time'])}  
+        📊 **Source:** {alert['source']}  
+        👥 **Affected Population:** {alert['affected_population']:,} people  
+        """)
+        
+        # Action buttons based on alert type
+        if alert['type'] == 'Water Quality':
+            if st.button(f"View Water Quality Data", key=f"water_{alert['id']}"):
+                st.switch_page("pages/water_quality.py")
+        elif alert['type'] == 'Disease Outbreak':
+            if st.button(f"View Disease Map", key=f"map_{alert['id']}"):
+                st.switch_page("pages/map.py")
+    
+    with col2:
+        st.markdown(f"""
+        <div style="text-align: center;">
+            <div style="
+                background: {severity_colors[alert['severity']]};
+                color: white;
+                padding: 8px 16px;
+                border-radius: 20px;
+                font-weight: bold;
+                font-size: 12px;
+                margin: 8px 0;
+            ">
+                {alert['severity'].upper()}
+            </div>
+            <div style="
+                background: {status_colors[alert['status']]};
+                color: white;
+                padding: 6px 12px;
+                border-radius: 16px;
+                font-size: 11px;
+                margin: 4px 0;
+            ">
+                {alert['status'].upper()}
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        if alert['status'] == 'active':
+            if st.button("Mark Resolved", key=f"resolve_{alert['id']}", type="primary"):
+                alert_store.update(alert['id'], status='resolved')
+                st.success(f"Alert {alert['id']} marked as resolved!")
 
 # Active alerts list
 st.markdown('<div class="card">', unsafe_allow_html=True)
-st.markdown(f"### 🔔 Current Alerts ({len(filtered_alerts)} found)")
+st.markdown(f"### 🔔 Current Alerts ({total_found} found)")
 
-if not filtered_alerts:
+if not total_found:
     st.info("No alerts match the current filters.")
 else:
-    # Sort by severity and time
-    severity_order = {'critical': 0, 'high': 1, 'moderate': 2, 'low': 3}
-    filtered_alerts.sort(key=lambda x: (severity_order[x['severity']], -x['time'].timestamp()))
+    # Only the current page is fetched and rendered, whatever the alert count
+    col1, col2, col3 = st.columns([2, 1, 1])
     
-    for alert in filtered_alerts:
-        severity_colors = {
-            'critical': '#c0392b',
-            'high': '#e74c3c',
-            'moderate': '#f39c12',
-            'low': '#3498db'
-        }
+    with col2:
+        page_size = st.selectbox("Alerts per page", options=[10, 25, 50], key="alerts_page_size")
+    
+    page_count = (total_found + page_size - 1) // page_size
+    if ss.get('alerts_page', 1) > page_count:
+        ss.alerts_page = page_count
+    
+    with col3:
+        page_number = st.number_input("Page", min_value=1, max_value=page_count, step=1, key="alerts_page")
+    
+    with col1:
+        first = (page_number - 1) * page_size
+        st.caption(f"Showing {first + 1}–{min(first + page_size, total_found)} of {total_found} alerts, most urgent first")
+    
+    _, page_alerts = alert_store.query(**alert_filters, limit=page_size, offset=first)
+    
+    for alert in page_alerts:
+        color = severity_colors[alert['severity']]
         
-        severity_icons = {
-            'critical': '🆘',
-            'high': '🚨',
-            'moderate': '⚠️',
-            'low': 'ℹ️'
-        }
+        col1, col2 = st.columns([6, 1])
         
-        status_colors = {
-            'active': '#e74c3c',
-            'monitoring': '#f39c12',
-            'scheduled': '#3498db',
-            'resolved': '#27ae60'
-        }
+        with col1:
+            st.markdown(f"""
+            <div style="border-left: 4px solid {color}; padding: 4px 12px; margin: 4px 0;">
+                <strong>{severity_icons[alert['severity']]} {alert['title']}</strong> - {alert['location']}<br>
+                <small style="opacity: 0.8;">
+                    <span style="color: {color}; font-weight: 600;">{alert['severity'].upper()}</span>
+                    • <span style="color: {status_colors[alert['status']]};">{alert['status'].title()}</span>
+                    • {format_time_ago(alert['time'])}
+                </small>
+            </div>
+            """, unsafe_allow_html=True)
         
-        time_ago = datetime.now() - alert['time']
-        if time_ago.days > 0:
-            time_str = f"{time_ago.days} day{'s' if time_ago.days > 1 else ''} ago"
-        elif time_ago.seconds > 3600:
-            hours = time_ago.seconds // 3600
-            time_str = f"{hours} hour{'s' if hours > 1 else ''} ago"
-        else:
-            minutes = time_ago.seconds // 60
-            time_str = f"{minutes} minute{'s' if minutes > 1 else ''} ago"
+        with col2:
+            show_details = st.toggle("Details", key=f"details_{alert['id']}")
         
-        with st.expander(f"{severity_icons[alert['severity']]} {alert['title']} - {alert['location']}", 
-                        expanded=alert['severity'] in ['critical', 'high']):
-            
-            col1, col2 = st.columns([3, 1])
-            
-            with col1:
-                st.markdown(f"""
-                **{alert['message']}**
-                
-                📍 **Location:** {alert['location']}  
-                🕐 **Time:** {time_str}  
-                📊 **Source:** {alert['source']}  
-                👥 **Affected Population:** {alert['affected_population']:,} people  
-                """)
-                
-                # Action buttons based on alert type
-                if alert['type'] == 'Water Quality':
-                    if st.button(f"View Water Quality Data", key=f"water_{alert['id']}"):
-                        st.switch_page("pages/water_quality.py")
-                elif alert['type'] == 'Disease Outbreak':
-                    if st.button(f"View Disease Map", key=f"map_{alert['id']}"):
-                        st.switch_page("pages/map.py")
-            
-            with col2:
-                st.markdown(f"""
-                <div style="text-align: center;">
-                    <div style="
-                        background: {severity_colors[alert['severity']]};
-                        color: white;
-                        padding: 8px 16px;
-                        border-radius: 20px;
-                        font-weight: bold;
-                        font-size: 12px;
-                        margin: 8px 0;
-                    ">
-                        {alert['severity'].upper()}
-                    </div>
-                    <div style="
-                        background: {status_colors[alert['status']]};
-                        color: white;
-                        padding: 6px 12px;
-                        border-radius: 16px;
-                        font-size: 11px;
-                        margin: 4px 0;
-                    ">
-                        {alert['status'].upper()}
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                if alert['status'] == 'active':
-                    if st.button("Mark Resolved", key=f"resolve_{alert['id']}", type="primary"):
-                        st.success(f"Alert {alert['id']} marked as resolved!")
+        if show_details:
+            with st.container(border=True):
+                render_alert_details(alert)
 
 st.markdown('</div>', unsafe_allow_html=True)
 
@@ -6,6 +6,10 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import random
 
+from sensors.ingest import get_ingestion_worker
+from sensors.thresholds import REGISTRY, STATUS_CLASSES
+from sensors.wqi import WQI, WQI_SERIES
+
 st.title("🌊 BlueAlert Dashboard")
 st.markdown("### Real-time Health Surveillance Overview")
 
@@ -125,32 +129,22 @@ with col2:
 st.markdown('<div class="card">', unsafe_allow_html=True)
 st.markdown("### 💧 Current Water Quality Status")
 
+sensor_data = get_ingestion_worker().snapshot.primary
+
 col1, col2, col3, col4 = st.columns(4)
 
-def get_status_class(value, thresholds, reverse=False):
-    if reverse:
-        if value < thresholds[0]: return "status-high"
-        elif value < thresholds[1]: return "status-moderate"
-        else: return "status-good"
-    else:
-        if value > thresholds[1]: return "status-high"
-        elif value > thresholds[0]: return "status-moderate"
-        else: return "status-good"
-
-def get_status_text(value, thresholds, reverse=False):
-    if reverse:
-        if value < thresholds[0]: return "Poor"
-        elif value < thresholds[1]: return "Fair"
-        else: return "Good"
-    else:
-        if value > thresholds[1]: return "High"
-        elif value > thresholds[0]: return "Moderate"
-        else: return "Good"
+statuses = REGISTRY.classify_reading(sensor_data)
+
+def get_status_class(param):
+    return STATUS_CLASSES[statuses[param]]
+
+def get_status_text(param):
+    return statuses[param].title()
 
 with col1:
-    tds_value = ss.sensor_data['TDS']
-    tds_class = get_status_class(tds_value, [300, 500])
-    tds_status = get_status_text(tds_value, [300, 500])
+    tds_value = sensor_data['TDS']
+    tds_class = get_status_class('TDS')
+    tds_status = get_status_text('TDS')
     
     st.markdown(f"""
     <div class="metric-card">
@@ -161,9 +155,9 @@ with col1:
     """, unsafe_allow_html=True)
 
 with col2:
-    turbidity = ss.sensor_data['Turbidity']
-    turb_class = get_status_class(turbidity, [3, 8])
-    turb_status = get_status_text(turbidity, [3, 8])
+    turbidity = sensor_data['Turbidity']
+    turb_class = get_status_class('Turbidity')
+    turb_status = get_status_text('Turbidity')
     
     st.markdown(f"""
     <div class="metric-card">
@@ -174,9 +168,9 @@ with col2:
     """, unsafe_allow_html=True)
 
 with col3:
-    temp = ss.sensor_data['Temperature']
-    temp_class = get_status_class(temp, [25, 32])
-    temp_status = "Normal" if 20 <= temp <= 30 else "High"
+    temp = sensor_data['Temperature']
+    temp_class = get_status_class('Temperature')
+    temp_status = get_status_text('Temperature')
     
     st.markdown(f"""
     <div class="metric-card">
@@ -187,9 +181,9 @@ with col3:
     """, unsafe_allow_html=True)
 
 with col4:
-    ph = ss.sensor_data['pH']
-    ph_class = "status-good" if 6.5 <= ph <= 8.5 else "status-high"
-    ph_status = "Good" if 6.5 <= ph <= 8.5 else "Poor"
+    ph = sensor_data['pH']
+    ph_class = get_status_class('pH')
+    ph_status = get_status_text('pH')
     
     st.markdown(f"""
     <div class="metric-card">
@@ -199,6 +193,10 @@ with col4:
     </div>
     """, unsafe_allow_html=True)
 
+wqi = sensor_data.get(WQI_SERIES)
+if wqi is not None:
+    st.caption(f"Water Quality Index: {wqi:.0f} ({WQI.grade(wqi)})")
+
 if st.button("View Detailed Water Quality", key="view_water_quality"):
     st.switch_page("pages/water_quality.py")
 
@@ -4,6 +4,14 @@ import pandas as pd
 import folium
 from streamlit_folium import st_folium
 import random
+import os
+
+import numpy as np
+
+from geo.boundaries import DEFAULT_PATH as BOUNDARIES_PATH, DistrictBoundaries
+from geo.clusters import ClusterPyramid, pad_bounds
+from geo.maps import PrerenderedMap, st_prerendered
+from geo.spatial import GridIndex
 
 st.title("📍 Disease Hotspot Map")
 st.markdown("### Interactive mapping of water-borne disease cases across Northeast India")
@@ -25,6 +33,46 @@ def generate_location_data():
     ]
     return pd.DataFrame(locations)
 
+@st.cache_resource(max_entries=32)
+def location_index(locations):
+    """Spatial index over a set of locations, built once per version of the data"""
+    return GridIndex(locations['lat'].to_numpy(), locations['lon'].to_numpy())
+
+RISK_LEVELS = ['low', 'moderate', 'high']
+
+@st.cache_resource(max_entries=32)
+def location_clusters(locations):
+    """Per-zoom clusters of a set of locations, aggregated once per version of the data"""
+    return ClusterPyramid(
+        locations['lat'].to_numpy(), locations['lon'].to_numpy(),
+        sums={'cases': locations['cases'].to_numpy(), 'population': locations['population'].to_numpy()},
+        maxes={'risk': locations['risk'].map(RISK_LEVELS.index).to_numpy()}
+    )
+
+@st.cache_resource(max_entries=1)
+def district_boundaries(version):
+    """Simplified district shapes, reloaded when the boundary file is rebuilt"""
+    return DistrictBoundaries.load(BOUNDARIES_PATH)
+
+def returned_view(map_data, rendered_bounds):
+    """(zoom, (south, west, north, east)) the user moved the map to, or None
+
+    Until the user interacts, the component reports the map's initial zoom
+    and the bounds of its markers, which are not a view.
+    """
+    bounds = map_data.get('bounds') or {}
+    south_west, north_east = bounds.get('_southWest') or {}, bounds.get('_northEast') or {}
+    corners = (south_west.get('lat'), south_west.get('lng'), north_east.get('lat'), north_east.get('lng'))
+    if map_data.get('zoom') is None or None in corners:
+        return None
+    if [list(corners[:2]), list(corners[2:])] == rendered_bounds:
+        return None
+    return int(map_data['zoom']), corners
+
+NEARBY_KM = 25
+DEFAULT_VIEW = {'zoom': 6, 'center': (25.5, 93.0), 'bounds': None}
+MAP_CACHE_ENTRIES = 16
+
 # Load and filter location data
 location_data = generate_location_data()
 
@@ -55,9 +103,27 @@ with col2:
         ["OpenStreetMap", "Satellite", "Terrain"],
         key="map_style"
     )
+    show_districts = st.checkbox(
+        "District Shading",
+        value=False,
+        help="Shade districts by incidence rate per 100k",
+        key="district_shading"
+    )
 
 with col3:
     show_population = st.checkbox("Show Population Data", value=False)
+    cluster_markers = st.checkbox(
+        "Cluster Markers",
+        value=True,
+        help="Group nearby locations into one marker per area until zoomed in",
+        key="cluster_markers"
+    )
+    incremental_updates = st.checkbox(
+        "Incremental Updates",
+        value=True,
+        help="Keep the base map and your zoom when filters change; only the markers are replaced",
+        key="incremental_updates"
+    )
 
 st.markdown('</div>', unsafe_allow_html=True)
 
@@ -76,48 +142,14 @@ tile_mapping = {
     "Terrain": "Stamen Terrain"
 }
 
-m = folium.Map(
-    location=[25.5, 93.0], 
-    zoom_start=6,
-    tiles=tile_mapping[map_style]
-)
-
 # Color mapping for risk levels
 color_map = {'low': 'green', 'moderate': 'orange', 'high': 'red'}
 risk_icons = {'low': '✅', 'moderate': '⚠️', 'high': '🚨'}
 
-# Add markers
-for idx, row in filtered_locations.iterrows():
-    # Calculate incidence rate per 100k
-    incidence_rate = round((row['cases'] / row['population']) * 100000, 1)
-    
-    popup_content = f"""
-    <div style="min-width: 200px;">
-        <h4 style="color: {color_map[row['risk']]}; margin: 0 0 10px 0;">
-            {risk_icons[row['risk']]} {row['name']}
-        </h4>
-        <p><strong>District:</strong> {row['district']}</p>
-        <p><strong>Total Cases:</strong> {row['cases']}</p>
-        <p><strong>Risk Level:</strong> {row['risk'].title()}</p>
-        <p><strong>Incidence Rate:</strong> {incidence_rate}/100k</p>
-        {f"<p><strong>Population:</strong> {row['population']:,}</p>" if show_population else ""}
-        <p><strong>Water Quality:</strong> {'Poor' if row['risk'] == 'high' else 'Moderate' if row['risk'] == 'moderate' else 'Good'}</p>
-    </div>
-    """
-    
-    # Create circle marker with size based on cases
-    folium.CircleMarker(
-        location=[row['lat'], row['lon']],
-        radius=max(8, min(row['cases'] / 2, 30)),  # Scale radius with cases
-        popup=folium.Popup(popup_content, max_width=300),
-        tooltip=f"{row['name']}: {row['cases']} cases ({row['risk']} risk)",
-        color=color_map[row['risk']],
-        fillColor=color_map[row['risk']],
-        fillOpacity=0.7,
-        weight=2
-    ).add_to(m)
-
-# Add a legend
+# District shading: incidence per 100k from, and colour
+shading_bins = [(0, '#ffffb2'), (5, '#fecc5c'), (10, '#fd8d3c'), (20, '#f03b20'), (40, '#bd0026')]
+
+# Legend drawn over the map
 legend_html = '''
 <div style="position: fixed; 
             top: 10px; right: 10px; width: 150px; height: 120px; 
@@ -130,10 +162,183 @@ legend_html = '''
 </div>
 '''
 
-m.get_root().html.add_child(folium.Element(legend_html))
+@st.cache_data(max_entries=MAP_CACHE_ENTRIES)
+def marker_specs(locations, show_population, cluster_markers, zoom, covered):
+    """CircleMarker options for one filter state and drawn view, popups included
 
-# Display the map
-map_data = st_folium(m, width=None, height=500, returned_objects=["last_object_clicked"])
+    Only the visible area's markers are listed: clusters aggregated on the
+    server while zoomed out, individual locations once few are in view.
+    """
+    if cluster_markers:
+        marker_kind, shown = location_clusters(locations).view(zoom, covered)
+    else:
+        marker_kind, shown = 'points', np.arange(len(locations))
+
+    specs = []
+    if marker_kind == 'clusters':
+        for lat, lon, count, cases, population, risk in zip(
+            shown['lat'], shown['lon'], shown['count'], shown['cases'], shown['population'], shown['risk']
+        ):
+            risk = RISK_LEVELS[risk]
+            specs.append({
+                'location': [float(lat), float(lon)],
+                'radius': float(max(10, min(8 + 4 * np.log2(count), 40))),
+                'popup': f"<strong>{count:,.0f} locations</strong><br>{cases:,.0f} cases • "
+                         f"{cases / population * 100000:.1f}/100k<br>Highest risk: {risk.title()}",
+                'popup_width': 250,
+                'tooltip': f"{count:,.0f} locations: {cases:,.0f} cases (up to {risk} risk)",
+                'color': color_map[risk],
+                'fillOpacity': 0.5
+            })
+
+    for idx, row in locations.iloc[shown if marker_kind == 'points' else []].iterrows():
+        # Calculate incidence rate per 100k
+        incidence_rate = round((row['cases'] / row['population']) * 100000, 1)
+        
+        popup_content = f"""
+        <div style="min-width: 200px;">
+            <h4 style="color: {color_map[row['risk']]}; margin: 0 0 10px 0;">
+                {risk_icons[row['risk']]} {row['name']}
+            </h4>
+            <p><strong>District:</strong> {row['district']}</p>
+            <p><strong>Total Cases:</strong> {row['cases']}</p>
+            <p><strong>Risk Level:</strong> {row['risk'].title()}</p>
+            <p><strong>Incidence Rate:</strong> {incidence_rate}/100k</p>
+            {f"<p><strong>Population:</strong> {row['population']:,}</p>" if show_population else ""}
+            <p><strong>Water Quality:</strong> {'Poor' if row['risk'] == 'high' else 'Moderate' if row['risk'] == 'moderate' else 'Good'}</p>
+        </div>
+        """
+        
+        specs.append({
+            'location': [row['lat'], row['lon']],
+            'radius': max(8, min(row['cases'] / 2, 30)),  # Scale radius with cases
+            'popup': popup_content,
+            'popup_width': 300,
+            'tooltip': f"{row['name']}: {row['cases']} cases ({row['risk']} risk)",
+            'color': color_map[row['risk']],
+            'fillOpacity': 0.7
+        })
+    return specs
+
+@st.cache_data(max_entries=MAP_CACHE_ENTRIES)
+def district_layer(locations, zoom, covered, version):
+    """Choropleth GeoJSON for one filter state and drawn view
+
+    District shapes simplified for the zoom and limited to the drawn area,
+    joined with each district's cases and incidence rate.
+    """
+    totals = locations.groupby('district')[['cases', 'population']].sum()
+    rates = {
+        district: {'cases': int(row['cases']), 'rate': round(row['cases'] / row['population'] * 100000, 1)}
+        for district, row in totals.iterrows()
+    }
+    boundaries = district_boundaries(version)
+    properties = {name: rates.get(name, {'cases': 'no data', 'rate': 'no data'}) for name in boundaries.names}
+    return boundaries.geojson(zoom, properties, covered)
+
+def district_style(feature):
+    rate = feature['properties']['rate']
+    if not isinstance(rate, (int, float)):
+        return {'fillColor': '#cccccc', 'fillOpacity': 0.15, 'color': 'grey', 'weight': 1}
+    fill = [colour for start, colour in shading_bins if rate >= start][-1]
+    return {'fillColor': fill, 'fillOpacity': 0.45, 'color': 'grey', 'weight': 1}
+
+def add_districts(parent, districts):
+    if districts['features']:
+        folium.GeoJson(
+            districts,
+            name="Districts",
+            style_function=district_style,
+            tooltip=folium.GeoJsonTooltip(fields=['name', 'cases', 'rate'], aliases=['District', 'Cases', 'Per 100k'])
+        ).add_to(parent)
+    return parent
+
+def add_markers(parent, specs):
+    for spec in specs:
+        folium.CircleMarker(
+            location=spec['location'],
+            radius=spec['radius'],
+            popup=folium.Popup(spec['popup'], max_width=spec['popup_width']),
+            tooltip=spec['tooltip'],
+            color=spec['color'],
+            fillColor=spec['color'],
+            fillOpacity=spec['fillOpacity'],
+            weight=2
+        ).add_to(parent)
+    return parent
+
+def base_map(map_style, center, zoom, map_class=folium.Map):
+    """Tiles and legend, without markers"""
+    m = map_class(location=list(center), zoom_start=zoom, tiles=tile_mapping[map_style])
+    m.get_root().html.add_child(folium.Element(legend_html))
+    return m
+
+@st.cache_resource(max_entries=MAP_CACHE_ENTRIES)
+def build_map(locations, map_style, show_population, cluster_markers, zoom, center, covered, shading):
+    """The full map for one filter state and drawn view, built and rendered once
+
+    Cached on the filtered locations (the data version, district and risk
+    filter) and the map options, least recently used first out, so reruns
+    from widgets that do not change the map reuse it as is. `shading` is the
+    boundary file version to shade districts from, or None.
+    """
+    m = base_map(map_style, center, zoom, PrerenderedMap)
+    if shading is not None:
+        add_districts(m, district_layer(locations, zoom, covered, shading))
+    add_markers(m, marker_specs(locations, show_population, cluster_markers, zoom, covered if cluster_markers else None))
+    m.render()
+    return m, m.get_bounds()
+
+# Markers are drawn for the view they were last redrawn at (see below)
+view = ss.get('map_view', DEFAULT_VIEW)
+covered = pad_bounds(view['bounds']) if view['bounds'] is not None else None
+returned_objects = ["last_object_clicked", "zoom", "bounds"]
+
+# Boundary file version (its modification time), None when shading is off
+shading = None
+if show_districts:
+    if os.path.exists(BOUNDARIES_PATH):
+        shading = os.path.getmtime(BOUNDARIES_PATH)
+    else:
+        st.caption(f"District shading needs simplified boundaries at `{BOUNDARIES_PATH}`: "
+                   "build them with `python -m geo.boundaries <districts.geojson>`.")
+
+if incremental_updates:
+    # The base map never changes, so the browser keeps it mounted along
+    # with the user's zoom and pan; only the marker layer is swapped
+    markers = folium.FeatureGroup(name="Locations")
+    if shading is not None:
+        add_districts(markers, district_layer(filtered_locations, view['zoom'], covered, shading))
+    add_markers(
+        markers,
+        marker_specs(filtered_locations, show_population, cluster_markers, view['zoom'],
+                     covered if cluster_markers else None)
+    )
+    m = base_map(map_style, DEFAULT_VIEW['center'], DEFAULT_VIEW['zoom'])
+    rendered_bounds = m.get_bounds()
+    map_data = st_folium(m, width=None, height=500, returned_objects=returned_objects, feature_group_to_add=markers)
+else:
+    m, rendered_bounds = build_map(
+        filtered_locations, map_style, show_population, cluster_markers, view['zoom'], view['center'], covered, shading
+    )
+    map_data = st_prerendered(m, width=None, height=500, returned_objects=returned_objects)
+
+if shading is not None:
+    st.caption("District shading, cases per 100k: " + " • ".join(
+        f'<span style="color: {colour};">■</span> {start}+' for start, colour in shading_bins
+    ), unsafe_allow_html=True)
+
+# Redraw the clusters and district shapes once the user zooms, or pans out
+# of the area they were drawn for; other moves keep the layers as they are
+moved = returned_view(map_data, rendered_bounds)
+if (cluster_markers or shading is not None) and moved is not None:
+    zoom, (south, west, north, east) = moved
+    stale = covered is not None and not (
+        covered[0] <= south and covered[1] <= west and north <= covered[2] and east <= covered[3]
+    )
+    if zoom != view['zoom'] or stale:
+        ss.map_view = {'zoom': zoom, 'center': ((south + north) / 2, (west + east) / 2), 'bounds': (south, west, north, east)}
+        st.rerun()
 
 st.markdown('</div>', unsafe_allow_html=True)
 
@@ -208,14 +413,13 @@ if map_data['last_object_clicked']:
     clicked_lat = map_data['last_object_clicked']['lat']
     clicked_lng = map_data['last_object_clicked']['lng']
     
-    # Find the closest location
-    distances = []
-    for idx, row in filtered_locations.iterrows():
-        dist = ((row['lat'] - clicked_lat) ** 2 + (row['lon'] - clicked_lng) ** 2) ** 0.5
-        distances.append((dist, idx, row))
+    # Nearest location by great-circle distance, from the spatial index
+    index = location_index(filtered_locations)
+    nearest, nearest_km = index.nearest(clicked_lat, clicked_lng)
     
-    if distances:
-        _, _, closest_location = min(distances)
+    if len(nearest):
+        closest_location = filtered_locations.iloc[nearest[0]]
+        nearby, nearby_km = index.within(closest_location['lat'], closest_location['lon'], NEARBY_KM)
         
         col1, col2 = st.columns(2)
         
@@ -226,6 +430,7 @@ if map_data['last_object_clicked']:
             - **Total Cases:** {closest_location['cases']}
             - **Risk Level:** {closest_location['risk'].title()}
             - **Population:** {closest_location['population']:,}
+            - **Distance from click:** {nearest_km[0]:.1f} km
             """)
         
         with col2:
@@ -238,6 +443,12 @@ if map_data['last_object_clicked']:
             - **Risk Status:** <span style="color: {risk_color};">●</span> {closest_location['risk'].title()}
             - **Water Quality:** {'Poor' if closest_location['risk'] == 'high' else 'Good'}
             """, unsafe_allow_html=True)
+        
+        others = [(filtered_locations.iloc[i], km) for i, km in zip(nearby, nearby_km) if i != nearest[0]]
+        if others:
+            st.caption(f"Within {NEARBY_KM} km: " + " • ".join(
+                f"{row['name']} ({km:.1f} km, {row['cases']} cases)" for row, km in others
+            ))
     
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -3,34 +3,21 @@ from streamlit import session_state as ss
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import random
-import time
+from datetime import datetime
+
+import numpy as np
+
+from sensors.ingest import get_ingestion_worker
+from sensors.rollups import choose_resolution
+from sensors.thresholds import STATUS_LABELS, get_status_info
+from sensors.wqi import GRADE_COLORS, WQI, WQI_SERIES, rank
 
 st.title("💧 Water Quality Monitoring")
 st.markdown("### Real-time sensor data and water quality analysis")
 
-# Refresh sensor data function
-def refresh_sensor_data():
-    """Simulate sensor data refresh with realistic variations"""
-    # Simulate API call placeholder
-    # In real implementation: response = requests.get('/api/sensors')
-    
-    ss.sensor_data = {
-        'TDS': random.randint(200, 800),
-        'Turbidity': round(random.uniform(1.5, 12.0), 1),
-        'Temperature': round(random.uniform(22.0, 35.0), 1),
-        'pH': round(random.uniform(6.0, 9.0), 1),
-        'Dissolved_Oxygen': round(random.uniform(4.0, 10.0), 1),
-        'Conductivity': random.randint(150, 600),
-        'Chlorine': round(random.uniform(0.1, 2.0), 2),
-        'Fluoride': round(random.uniform(0.5, 2.5), 2)
-    }
-    ss.last_update = datetime.now()
-
-# Initialize last update time
-if 'last_update' not in ss:
-    ss.last_update = datetime.now()
+# Latest readings come from the shared ingestion worker, not per-session state
+ingestion = get_ingestion_worker()
+LOCAL_TZ = datetime.now().astimezone().tzinfo
 
 # Real-time controls
 st.markdown('<div class="card">', unsafe_allow_html=True)
@@ -39,185 +26,168 @@ col1, col2, col3, col4 = st.columns(4)
 with col1:
     if st.button("🔄 Refresh Data", type="primary", use_container_width=True):
         with st.spinner("Fetching latest sensor readings..."):
-            time.sleep(1)  # Simulate API delay
-            refresh_sensor_data()
-        st.success("Data updated successfully!")
+            failed = ingestion.refresh(timeout=10).failed
+        if failed:
+            st.warning(f"{failed} sensor(s) did not respond in time")
+        else:
+            st.success("Data updated successfully!")
         st.rerun()
 
 with col2:
-    auto_refresh = st.checkbox("🔁 Auto Refresh", help="Refresh every 30 seconds")
+    auto_refresh = st.checkbox(
+        "🔁 Auto Refresh",
+        help=f"Update live readings every {ingestion.interval:g} seconds",
+        key="wq_auto_refresh"
+    )
 
-with col3:
+# With auto refresh on, the live sections below rerun on their own timer as
+# fragments; trends, sensor network and export are only rebuilt on a full rerun
+refresh_every = ingestion.interval if auto_refresh else None
+
+@st.fragment(run_every=refresh_every)
+def render_last_update():
     st.markdown(f"**📡 Last Update:**")
-    st.markdown(f"{ss.last_update.strftime('%H:%M:%S')}")
+    st.markdown(f"{ingestion.snapshot.updated.strftime('%H:%M:%S')}")
 
-with col4:
-    status_icon = "🟢" if all(
-        400 <= ss.sensor_data.get('TDS', 0) <= 600,
-        ss.sensor_data.get('Turbidity', 0) <= 5,
-        6.5 <= ss.sensor_data.get('pH', 0) <= 8.5
-    ) else "🔴"
+@st.fragment(run_every=refresh_every)
+def render_system_status():
+    # Within the drinking water standards means a WQI of 100 or less
+    wqi = ingestion.snapshot.primary.get(WQI_SERIES)
+    status_icon = "🔴" if wqi is not None and wqi > 100 else "🟢"
     st.markdown(f"**⚡ System Status:** {status_icon} {'Online' if status_icon == '🟢' else 'Alert'}")
 
-st.markdown('</div>', unsafe_allow_html=True)
+with col3:
+    render_last_update()
 
-# Auto-refresh implementation
-if auto_refresh:
-    # This would typically use st.rerun() with a timer in a real app
-    st.info("Auto-refresh enabled. Data will update every 30 seconds.")
+with col4:
+    render_system_status()
 
-# Current sensor readings
-st.markdown('<div class="card">', unsafe_allow_html=True)
-st.markdown("### 🌡️ Current Sensor Readings")
-
-def get_status_info(param, value):
-    """Get status color and text for each parameter"""
-    thresholds = {
-        'TDS': {'good': (0, 300), 'moderate': (300, 600), 'poor': (600, float('inf'))},
-        'Turbidity': {'good': (0, 1), 'moderate': (1, 5), 'poor': (5, float('inf'))},
-        'pH': {'good': (6.5, 8.5), 'moderate': (6.0, 9.0), 'poor': (0, float('inf'))},
-        'Temperature': {'good': (20, 30), 'moderate': (15, 35), 'poor': (0, float('inf'))},
-        'Dissolved_Oxygen': {'good': (6, float('inf')), 'moderate': (4, 6), 'poor': (0, 4)},
-        'Conductivity': {'good': (0, 400), 'moderate': (400, 800), 'poor': (800, float('inf'))},
-        'Chlorine': {'good': (0.2, 1.0), 'moderate': (0.1, 2.0), 'poor': (0, float('inf'))},
-        'Fluoride': {'good': (0.7, 1.2), 'moderate': (0.5, 1.5), 'poor': (0, float('inf'))}
-    }
+st.markdown('</div>', unsafe_allow_html=True)
+
+@st.fragment(run_every=refresh_every)
+def render_current_readings():
+    sensor_data = ingestion.snapshot.primary
     
-    if param not in thresholds:
-        return 'good', '#27ae60'
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("### 🌡️ Current Sensor Readings")
+
+    wqi = sensor_data.get(WQI_SERIES)
+    grade = WQI.grade(wqi)
+    st.markdown(
+        f"**Water Quality Index:** <span style=\"color: {GRADE_COLORS[grade]}; font-weight: 600;\">"
+        f"{'–' if wqi is None else f'{wqi:.0f}'} ({grade})</span> "
+        f"<small style=\"opacity: 0.7;\">weighted index, lower is better; 100 is the limit of the standards</small>",
+        unsafe_allow_html=True
+    )
     
-    thresh = thresholds[param]
+    # Create sensor metrics in a grid
+    sensor_metrics = [
+        ('TDS', sensor_data['TDS'], 'ppm', 'Total Dissolved Solids'),
+        ('Turbidity', sensor_data['Turbidity'], 'NTU', 'Water Clarity'),
+        ('Temperature', sensor_data['Temperature'], '°C', 'DS18B20 Sensor'),
+        ('pH', sensor_data['pH'], '', 'pH Level'),
+        ('Dissolved_Oxygen', sensor_data.get('Dissolved_Oxygen', 6.5), 'mg/L', 'Oxygen Content'),
+        ('Conductivity', sensor_data.get('Conductivity', 350), 'µS/cm', 'Electrical Conductivity'),
+        ('Chlorine', sensor_data.get('Chlorine', 0.5), 'mg/L', 'Chlorine Level'),
+        ('Fluoride', sensor_data.get('Fluoride', 1.0), 'mg/L', 'Fluoride Content')
+    ]
     
-    # Special handling for pH (good range is between two values)
-    if param == 'pH':
-        if thresh['good'][0] <= value <= thresh['good'][1]:
-            return 'good', '#27ae60'
-        elif thresh['moderate'][0] <= value <= thresh['moderate'][1]:
-            return 'moderate', '#f39c12'
-        else:
-            return 'poor', '#e74c3c'
+    # Display in 4x2 grid
+    for i in range(0, len(sensor_metrics), 4):
+        cols = st.columns(4)
+        for j, (param, value, unit, description) in enumerate(sensor_metrics[i:i+4]):
+            if j < len(cols):
+                status, color = get_status_info(param, value)
+                
+                with cols[j]:
+                    st.markdown(f"""
+                    <div class="metric-card" style="border-left: 4px solid {color};">
+                        <h4 style="margin: 0; color: {color};">{param.replace('_', ' ')}</h4>
+                        <h2 style="margin: 5px 0; color: white;">{value} <small style="opacity: 0.7;">{unit}</small></h2>
+                        <p style="margin: 5px 0 0 0; opacity: 0.8; font-size: 12px;">{description}</p>
+                        <p style="margin: 5px 0 0 0; color: {color}; font-weight: 600; font-size: 14px;">{status.title()}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
     
-    # Special handling for Dissolved Oxygen (higher is better)
-    elif param == 'Dissolved_Oxygen':
-        if value >= thresh['good'][0]:
-            return 'good', '#27ae60'
-        elif value >= thresh['moderate'][0]:
-            return 'moderate', '#f39c12'
-        else:
-            return 'poor', '#e74c3c'
+    st.markdown('</div>', unsafe_allow_html=True)
     
-    # Standard handling (lower is better)
-    else:
-        if thresh['good'][0] <= value <= thresh['good'][1]:
-            return 'good', '#27ae60'
-        elif thresh['moderate'][0] <= value <= thresh['moderate'][1]:
-            return 'moderate', '#f39c12'
-        else:
-            return 'poor', '#e74c3c'
-
-# Create sensor metrics in a grid
-sensor_metrics = [
-    ('TDS', ss.sensor_data['TDS'], 'ppm', 'Total Dissolved Solids'),
-    ('Turbidity', ss.sensor_data['Turbidity'], 'NTU', 'Water Clarity'),
-    ('Temperature', ss.sensor_data['Temperature'], '°C', 'DS18B20 Sensor'),
-    ('pH', ss.sensor_data['pH'], '', 'pH Level'),
-    ('Dissolved_Oxygen', ss.sensor_data.get('Dissolved_Oxygen', 6.5), 'mg/L', 'Oxygen Content'),
-    ('Conductivity', ss.sensor_data.get('Conductivity', 350), 'µS/cm', 'Electrical Conductivity'),
-    ('Chlorine', ss.sensor_data.get('Chlorine', 0.5), 'mg/L', 'Chlorine Level'),
-    ('Fluoride', ss.sensor_data.get('Fluoride', 1.0), 'mg/L', 'Fluoride Content')
-]
-
-# Display in 4x2 grid
-for i in range(0, len(sensor_metrics), 4):
-    cols = st.columns(4)
-    for j, (param, value, unit, description) in enumerate(sensor_metrics[i:i+4]):
-        if j < len(cols):
-            status, color = get_status_info(param, value)
-            
-            with cols[j]:
-                st.markdown(f"""
-                <div class="metric-card" style="border-left: 4px solid {color};">
-                    <h4 style="margin: 0; color: {color};">{param.replace('_', ' ')}</h4>
-                    <h2 style="margin: 5px 0; color: white;">{value} <small style="opacity: 0.7;">{unit}</small></h2>
-                    <p style="margin: 5px 0 0 0; opacity: 0.8; font-size: 12px;">{description}</p>
-                    <p style="margin: 5px 0 0 0; color: {color}; font-weight: 600; font-size: 14px;">{status.title()}</p>
-                </div>
-                """, unsafe_allow_html=True)
-
-st.markdown('</div>', unsafe_allow_html=True)
-
-# Progress bars for key parameters
-st.markdown('<div class="card">', unsafe_allow_html=True)
-st.markdown("### 📊 Parameter Status Indicators")
-
-col1, col2 = st.columns(2)
-
-with col1:
-    # TDS Progress
-    tds_progress = min(ss.sensor_data['TDS'] / 1000, 1.0)
-    st.markdown("**TDS Level**")
-    st.progress(tds_progress)
-    st.caption(f"{ss.sensor_data['TDS']} ppm / 1000 ppm (safe limit)")
+    # Progress bars for key parameters
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("### 📊 Parameter Status Indicators")
     
-    # pH Progress (need to normalize pH scale)
-    ph_value = ss.sensor_data['pH']
-    ph_progress = abs(ph_value - 7.0) / 3.0  # Distance from neutral (7.0)
-    st.markdown("**pH Level**")
-    st.progress(1 - ph_progress if 6.5 <= ph_value <= 8.5 else ph_progress)
-    st.caption(f"pH {ph_value} (optimal: 6.5-8.5)")
-
-with col2:
-    # Turbidity Progress
-    turb_progress = min(ss.sensor_data['Turbidity'] / 10, 1.0)
-    st.markdown("**Turbidity Level**")
-    st.progress(turb_progress)
-    st.caption(f"{ss.sensor_data['Turbidity']} NTU / 10 NTU (alert level)")
+    col1, col2 = st.columns(2)
     
-    # Temperature Progress
-    temp_value = ss.sensor_data['Temperature']
-    temp_progress = min(max(temp_value - 20, 0) / 20, 1.0)  # 20-40°C range
-    st.markdown("**Temperature**")
-    st.progress(temp_progress)
-    st.caption(f"{temp_value}°C (normal: 20-30°C)")
-
-st.markdown('</div>', unsafe_allow_html=True)
-
-# Historical trends
-st.markdown('<div class="card">', unsafe_allow_html=True)
-st.markdown("### 📈 24-Hour Trends")
-
-# Generate mock historical data
-@st.cache_data
-def generate_historical_data():
-    hours = pd.date_range(start=datetime.now() - timedelta(hours=24), end=datetime.now(), freq='H')
+    with col1:
+        # TDS Progress
+        tds_progress = min(sensor_data['TDS'] / 1000, 1.0)
+        st.markdown("**TDS Level**")
+        st.progress(tds_progress)
+        st.caption(f"{sensor_data['TDS']} ppm / 1000 ppm (safe limit)")
+        
+        # pH Progress (need to normalize pH scale)
+        ph_value = sensor_data['pH']
+        ph_progress = abs(ph_value - 7.0) / 3.0  # Distance from neutral (7.0)
+        st.markdown("**pH Level**")
+        st.progress(1 - ph_progress if 6.5 <= ph_value <= 8.5 else ph_progress)
+        st.caption(f"pH {ph_value} (optimal: 6.5-8.5)")
     
-    data = []
-    for hour in hours:
-        # Simulate realistic variations
-        base_tds = 450 + random.randint(-50, 100)
-        base_turb = 3.5 + random.uniform(-1, 3)
-        base_temp = 26 + random.uniform(-3, 6)
-        base_ph = 7.2 + random.uniform(-0.5, 0.8)
+    with col2:
+        # Turbidity Progress
+        turb_progress = min(sensor_data['Turbidity'] / 10, 1.0)
+        st.markdown("**Turbidity Level**")
+        st.progress(turb_progress)
+        st.caption(f"{sensor_data['Turbidity']} NTU / 10 NTU (alert level)")
         
-        data.append({
-            'Time': hour,
-            'TDS': base_tds,
-            'Turbidity': round(base_turb, 1),
-            'Temperature': round(base_temp, 1),
-            'pH': round(base_ph, 1)
-        })
+        # Temperature Progress
+        temp_value = sensor_data['Temperature']
+        temp_progress = min(max(temp_value - 20, 0) / 20, 1.0)  # 20-40°C range
+        st.markdown("**Temperature**")
+        st.progress(temp_progress)
+        st.caption(f"{temp_value}°C (normal: 20-30°C)")
     
-    return pd.DataFrame(data)
+    st.markdown('</div>', unsafe_allow_html=True)
 
-historical_data = generate_historical_data()
+render_current_readings()
+
+# Historical trends
+st.markdown('<div class="card">', unsafe_allow_html=True)
+st.markdown("### 📈 Trends")
+
+TREND_RANGES = {'Last 24 Hours': 24, 'Last 7 Days': 24 * 7, 'Last 30 Days': 24 * 30, 'Last Year': 24 * 365}
+
+def load_trend(sensor_id, param, hours):
+    """Return (resolution, series) for a trend, keeping the point count bounded
+
+    Raw samples come from the in-memory ring buffer when it holds the whole
+    range; anything else is read from the precomputed rollups.
+    """
+    span = hours * 3600 * 1000
+    end = int(datetime.now().timestamp() * 1000)
+    raw_ts, raw_values = ingestion.history.window(sensor_id, param, hours=hours, end_ms=end)
+    # The buffer holds the whole range only if it reaches back to the range
+    # start, or to the first archived sample when history is shorter than
+    # the range, give or take one sample slot
+    bounds = ingestion.archive.bounds(sensor_id, param)
+    start = end - span if bounds is None else max(end - span, bounds[0])
+    if len(raw_ts):
+        covered = raw_ts[0] - start <= span // ingestion.history.capacity
+    else:
+        covered = bounds is None or bounds[1] < end - span
+    resolution = choose_resolution(span, raw_count=len(raw_ts) if covered else None)
+    if resolution == 'raw':
+        return resolution, {'ts': raw_ts, 'mean': raw_values}
+    return resolution, ingestion.rollups.query(sensor_id, param, resolution, end - span, end + 1)
 
 # Parameter selection for trend display
 col1, col2 = st.columns([3, 1])
 
 with col2:
+    trend_sensors = ingestion.history.sensors() or ['S001']
+    trend_sensor = st.selectbox("Sensor:", options=trend_sensors, key="trend_sensor")
+    trend_range = st.selectbox("Time Range:", options=list(TREND_RANGES), key="trend_range")
     selected_params = st.multiselect(
         "Select Parameters:",
-        options=['TDS', 'Turbidity', 'Temperature', 'pH'],
+        options=['TDS', 'Turbidity', 'Temperature', 'pH', WQI_SERIES],
         default=['TDS', 'pH'],
         key="trend_params"
     )
@@ -227,20 +197,34 @@ with col1:
         # Create subplot for selected parameters
         fig = go.Figure()
         
-        colors = {'TDS': '#3498db', 'Turbidity': '#e67e22', 'Temperature': '#e74c3c', 'pH': '#27ae60'}
+        colors = {'TDS': '#3498db', 'Turbidity': '#e67e22', 'Temperature': '#e74c3c', 'pH': '#27ae60', WQI_SERIES: '#9b59b6'}
         
         for param in selected_params:
+            resolution, trend = load_trend(trend_sensor, param, TREND_RANGES[trend_range])
+            times = pd.to_datetime(trend['ts'], unit='ms', utc=True).tz_convert(LOCAL_TZ)
+            color = colors.get(param, '#ffffff')
+            if resolution != 'raw':
+                # Min/max envelope behind the bucket means
+                fig.add_trace(go.Scatter(
+                    x=times, y=trend['max'], mode='lines', line=dict(width=0),
+                    legendgroup=param, showlegend=False, hoverinfo='skip'
+                ))
+                fig.add_trace(go.Scatter(
+                    x=times, y=trend['min'], mode='lines', line=dict(width=0),
+                    fill='tonexty', fillcolor=color, opacity=0.2,
+                    legendgroup=param, showlegend=False, hoverinfo='skip'
+                ))
             fig.add_trace(go.Scatter(
-                x=historical_data['Time'],
-                y=historical_data[param],
-                mode='lines+markers',
-                name=param,
-                line=dict(color=colors.get(param, '#ffffff'), width=2),
-                marker=dict(size=4)
+                x=times,
+                y=trend['mean'],
+                mode='lines',
+                name=param if resolution == 'raw' else f"{param} ({resolution} mean)",
+                legendgroup=param,
+                line=dict(color=color, width=2)
             ))
         
         fig.update_layout(
-            title='Water Quality Trends - Last 24 Hours',
+            title=f'Water Quality Trends - {trend_range}',
             xaxis_title='Time',
             yaxis_title='Values',
             plot_bgcolor='rgba(0,0,0,0)',
@@ -257,73 +241,114 @@ with col1:
 st.markdown('</div>', unsafe_allow_html=True)
 
 # Water quality alerts and recommendations
-st.markdown('<div class="card">', unsafe_allow_html=True)
-st.markdown("### ⚠️ Quality Alerts & Recommendations")
-
-def generate_alerts():
-    alerts = []
-    
-    # Check each parameter and generate alerts
-    if ss.sensor_data['TDS'] > 500:
-        alerts.append({
-            'type': 'High TDS Level',
-            'message': f"TDS level is {ss.sensor_data['TDS']} ppm, exceeding recommended limit of 500 ppm",
-            'recommendation': "Use water filtration or reverse osmosis system",
-            'severity': 'high'
-        })
+@st.fragment(run_every=refresh_every)
+def render_quality_alerts():
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("### ⚠️ Quality Alerts & Recommendations")
     
-    if ss.sensor_data['Turbidity'] > 5:
-        alerts.append({
-            'type': 'High Turbidity',
-            'message': f"Water clarity is poor ({ss.sensor_data['Turbidity']} NTU)",
-            'recommendation': "Boil water for 10 minutes before consumption",
-            'severity': 'high'
-        })
+    # Alerts are raised and cleared by the shared rule engines as readings arrive
+    alerts = ingestion.alerts.active() + ingestion.anomaly_alerts.active()
     
-    if not (6.5 <= ss.sensor_data['pH'] <= 8.5):
-        alerts.append({
-            'type': 'pH Imbalance',
-            'message': f"pH level is {ss.sensor_data['pH']}, outside safe range (6.5-8.5)",
-            'recommendation': "Test water source and consider pH correction",
-            'severity': 'moderate'
-        })
-    
-    if ss.sensor_data['Temperature'] > 30:
-        alerts.append({
-            'type': 'High Temperature',
-            'message': f"Water temperature is {ss.sensor_data['Temperature']}°C",
-            'recommendation': "Allow water to cool before consumption",
-            'severity': 'low'
-        })
+    if alerts:
+        for alert in alerts:
+            severity_colors = {'high': '#e74c3c', 'moderate': '#f39c12', 'low': '#3498db'}
+            severity_icons = {'high': '🚨', 'moderate': '⚠️', 'low': 'ℹ️'}
+            
+            st.markdown(f"""
+            <div style="
+                background: rgba(255, 255, 255, 0.05);
+                border: 1px solid {severity_colors[alert['severity']]};
+                border-radius: 8px;
+                padding: 16px;
+                margin: 12px 0;
+            ">
+                <h4 style="color: {severity_colors[alert['severity']]}; margin: 0 0 8px 0;">
+                    {severity_icons[alert['severity']]} {alert['type']}
+                    <small style="opacity: 0.7; font-weight: 400;">
+                        {alert['sensor_id']} • since {datetime.fromtimestamp(alert['time'] / 1000).strftime('%H:%M')}
+                    </small>
+                </h4>
+                <p style="margin: 0 0 8px 0; opacity: 0.9;">{alert['message']}</p>
+                <p style="margin: 0; font-weight: 500; color: {severity_colors[alert['severity']]};">
+                    💡 {alert['recommendation']}
+                </p>
+            </div>
+            """, unsafe_allow_html=True)
+    else:
+        st.success("✅ All water quality parameters are within acceptable limits!")
     
-    return alerts
+    st.markdown('</div>', unsafe_allow_html=True)
 
-alerts = generate_alerts()
+render_quality_alerts()
 
-if alerts:
-    for alert in alerts:
-        severity_colors = {'high': '#e74c3c', 'moderate': '#f39c12', 'low': '#3498db'}
-        severity_icons = {'high': '🚨', 'moderate': '⚠️', 'low': 'ℹ️'}
-        
-        st.markdown(f"""
-        <div style="
-            background: rgba(255, 255, 255, 0.05);
-            border: 1px solid {severity_colors[alert['severity']]};
-            border-radius: 8px;
-            padding: 16px;
-            margin: 12px 0;
-        ">
-            <h4 style="color: {severity_colors[alert['severity']]}; margin: 0 0 8px 0;">
-                {severity_icons[alert['severity']]} {alert['type']}
-            </h4>
-            <p style="margin: 0 0 8px 0; opacity: 0.9;">{alert['message']}</p>
-            <p style="margin: 0; font-weight: 500; color: {severity_colors[alert['severity']]};">
-                💡 {alert['recommendation']}
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-else:
-    st.success("✅ All water quality parameters are within acceptable limits!")
+# Fleet overview, served from the worker's latest-value table
+st.markdown('<div class="card">', unsafe_allow_html=True)
+st.markdown("### 🛰️ Fleet Overview")
+
+FLEET_PAGE_SIZE = 50
+fleet_params = ingestion.latest.params
+FLEET_ICONS = {'good': '🟢', 'moderate': '🟡', 'poor': '🔴', 'unknown': '⚪'}
+
+col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
+with col1:
+    fleet_sort = st.selectbox("Sort by:", options=[WQI_SERIES, 'sensor_id'] + [p for p in fleet_params if p != WQI_SERIES],
+                              key="fleet_sort")
+with col2:
+    fleet_worst = st.multiselect("Worst status:", options=['poor', 'moderate', 'good', 'unknown', 'stale'], key="fleet_worst")
+with col3:
+    fleet_search = st.text_input("Sensor ID contains:", key="fleet_search")
+with col4:
+    fleet_descending = st.checkbox("Descending", value=True, key="fleet_descending")
+
+@st.fragment(run_every=refresh_every)
+def render_fleet_overview():
+    index, table = ingestion.latest.query(fleet_sort, fleet_descending, fleet_worst, fleet_search.strip())
+    counts = ingestion.latest.counts()
+    st.caption(
+        f"{len(table['sensor_id']):,} sensors • " +
+        " • ".join(f"{FLEET_ICONS[label]} {counts[label]:,} {label}" for label in ['poor', 'moderate', 'good', 'unknown']) +
+        f" • {len(index):,} matching"
+    )
+    if not len(index):
+        st.info("No sensors match the filters")
+        return
+    pages = (len(index) - 1) // FLEET_PAGE_SIZE + 1
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, key="fleet_page") if pages > 1 else 1
+    shown = index[(page - 1) * FLEET_PAGE_SIZE:page * FLEET_PAGE_SIZE]
+    now = datetime.now().timestamp() * 1000
+    header = "| Sensor | Age | " + " | ".join(p.replace('_', ' ') for p in fleet_params) + " |\n"
+    header += "|---|---|" + "---|" * len(fleet_params) + "\n"
+    rows = []
+    for i in shown:
+        cells = [
+            '–' if np.isnan(value) else f"{FLEET_ICONS[STATUS_LABELS[int(code)]]} {value:g}"
+            for value, code in zip(table['values'][i], table['status'][i])
+        ]
+        age = f"{(now - table['ts'][i]) / 60000:.0f} min"
+        rows.append(f"| {table['sensor_id'][i]} | {age} | " + " | ".join(cells) + " |")
+    st.markdown(header + "\n".join(rows))
+
+render_fleet_overview()
+
+# Drill-down into one sensor; opening its history points the trend chart at it
+def open_sensor_history():
+    ss.trend_sensor = ss.fleet_sensor
+
+fleet_ids = ingestion.latest.sensors()
+if fleet_ids:
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        drill_sensor = st.selectbox("Sensor details:", options=fleet_ids, key="fleet_sensor")
+    with col2:
+        st.button("📈 Open History", use_container_width=True, on_click=open_sensor_history,
+                  disabled=drill_sensor not in ingestion.history.sensors())
+    row = ingestion.latest.row(drill_sensor)
+    if row is not None:
+        reading, ts = row
+        st.markdown(
+            f"**{drill_sensor}** • last reading {datetime.fromtimestamp(ts / 1000).strftime('%Y-%m-%d %H:%M:%S')}  \n" +
+            " • ".join(f"{FLEET_ICONS[status]} {param.replace('_', ' ')} {value:g}" for param, (value, status) in reading.items())
+        )
 
 st.markdown('</div>', unsafe_allow_html=True)
 
@@ -378,49 +403,70 @@ for i, sensor in enumerate(sensor_locations):
         </div>
         """, unsafe_allow_html=True)
 
+# Every live source ordered by its latest WQI, worst first
+ranked = rank(ingestion.snapshot.readings)
+if ranked:
+    with st.expander(f"🏅 Sources by Water Quality Index ({len(ranked):,})"):
+        grades = WQI.grades([wqi for _, wqi in ranked[:20]])
+        st.markdown(
+            "| Sensor | WQI | Grade |\n|---|---|---|\n" +
+            "\n".join(f"| {sensor_id} | {wqi:.0f} | {grade} |" for (sensor_id, wqi), grade in zip(ranked[:20], grades))
+        )
+
+# Queue depth and shed load of the push/MQTT ingest pipeline
+with st.expander("📥 Ingest Pipeline"):
+    counts = ingestion.pipeline.counts
+    st.caption(
+        f"{counts['submitted']:,} readings submitted • {counts['aligned']:,} clock-aligned • {counts['stored']:,} stored • "
+        f"{counts['cleaned']:,} cleaned out • {counts['duplicates']:,} duplicates • {counts['invalid']:,} invalid • "
+        f"alert lag {counts['alert_lag_s'] * 1000:.0f} ms (worst {counts['alert_lag_max_s'] * 1000:.0f} ms)"
+    )
+    rows = [
+        f"| {m['stage']} | {m['policy']} | {m['depth']:,} / {m['capacity']:,} | {m['peak_depth']:,} | "
+        f"{m['shed_readings']:,} | {m['coalesced']:,} | {m['blocked_s']:.1f} s |"
+        for m in ingestion.pipeline.metrics()
+    ]
+    st.markdown(
+        "| Stage | Policy | Queued readings | Peak | Shed | Coalesced | Producers blocked |\n"
+        "|---|---|---|---|---|---|---|\n" + "\n".join(rows)
+    )
+    if ingestion.rejected:
+        st.caption("Values rejected by validation: " + " • ".join(
+            f"{param} {count:,}" for param, count in sorted(ingestion.rejected.items())
+        ))
+
 st.markdown('</div>', unsafe_allow_html=True)
 
-# API Integration placeholder
+# Where live readings come from
 st.markdown('<div class="card">', unsafe_allow_html=True)
 st.markdown("### 🔧 Sensor Integration")
 
+sources = {
+    "📡 Polled nodes": f"{len(ingestion.poller.devices)} configured" if ingestion.poller.devices else "none (simulated readings)",
+    "📥 Push endpoint": ingestion.push_server.url if ingestion.push_server is not None else "off",
+    "🛰️ MQTT gateway": "subscribed" if ingestion.mqtt_gateway is not None else "off"
+}
+st.markdown("\n".join(f"- **{name}:** {status}" for name, status in sources.items()))
+
 st.markdown("""
-```python
-# Real sensor integration example
-import requests
-import json
-
-# Arduino/ESP32 API endpoint
-SENSOR_API_URL = "http://192.168.1.100/api/sensors"
-
-def fetch_sensor_data():
-    try:
-        response = requests.get(SENSOR_API_URL, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                'TDS': data.get('tds', 0),
-                'Turbidity': data.get('turbidity', 0),
-                'Temperature': data.get('temperature', 0),
-                'pH': data.get('ph', 0),
-                'timestamp': data.get('timestamp')
-            }
-    except requests.RequestException as e:
-        print(f"Error fetching sensor data: {e}")
-        return None
-
-# Usage in production:
-# sensor_data = fetch_sensor_data()
-# if sensor_data:
-#     st.session_state.sensor_data = sensor_data
+```bash
+# ESP32 nodes serving /api/sensors, polled every 30 s
+BLUEALERT_SENSORS="S001=http://192.168.1.100,S002=http://192.168.1.101@1.5"
+# Nodes that upload batches to POST /api/ingest
+BLUEALERT_INGEST_PORT=8602
+# Nodes that publish to bluealert/<state>/<district>/<sensor_id>
+BLUEALERT_MQTT=192.168.1.10:1883
 ```
 """)
 
-st.info("💡 In production, replace mock data with real sensor API calls to Arduino/ESP32 devices")
+st.caption("Readings from every source go through the shared ingestion worker; the sections above refresh from it automatically.")
 
 st.markdown('</div>', unsafe_allow_html=True)
 
 # Export and sharing
+sensor_data = ingestion.snapshot.primary
+alerts = ingestion.alerts.active() + ingestion.anomaly_alerts.active()
+
 st.markdown('<div class="card">', unsafe_allow_html=True)
 st.markdown("### 📤 Export & Share")
 
@@ -431,7 +477,7 @@ with col1:
         # Prepare water quality report data
         report_data = {
             'timestamp': datetime.now().isoformat(),
-            'sensors': ss.sensor_data,
+            'sensors': dict(sensor_data),
             'alerts': len(alerts),
             'status': 'good' if not alerts else 'alert'
         }
@@ -439,7 +485,7 @@ with col1:
 
 with col2:
     # Export current readings
-    export_df = pd.DataFrame([ss.sensor_data])
+    export_df = pd.DataFrame([dict(sensor_data)])
     export_df['timestamp'] = datetime.now()
     
     st.download_button(
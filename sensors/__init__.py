@@ -0,0 +1 @@
+"""Sensor network integration for BlueAlert water quality monitoring"""
@@ -0,0 +1,143 @@
+"""Map device uptime timestamps onto wall-clock time
+
+Nodes without an RTC stamp readings with `millis()`, which restarts at 0 on
+every boot. For each device, `DeviceClocks` fits
+
+    arrival - device_ts = offset + drift * (device_ts - epoch_start)
+
+by exponentially weighted least squares over (device_ts, arrival) pairs,
+where `arrival` is when the server received the reading (for a buffered
+batch, its newest reading). The state is a handful of running sums per
+device, so each observation is O(1) in time and memory. A timestamp that
+goes backwards by more than REORDER_TOLERANCE_MS, or a reading that lands
+more than RESYNC_MS away from where the fit puts it, starts a new epoch:
+the offset is re-learnt, while the drift, a property of the device's
+crystal, is carried over. Network latency makes arrivals late, so offsets
+are biased by the typical delivery delay, a few hundred milliseconds on a
+working link.
+
+Timestamps at or after MIN_TS are already wall-clock and pass through.
+"""
+import threading
+
+import numpy as np
+
+from sensors.validation import MIN_TS
+
+DECAY = 0.99  # per observation; roughly the last 100 observations count
+REORDER_TOLERANCE_MS = 60_000
+RESYNC_MS = 600_000
+MIN_DRIFT_SPAN_MS = 3_600_000  # an epoch must span this long before drift is fitted
+MAX_DRIFT = 1e-3  # 1000 ppm; anything larger is noise, not a crystal
+
+# [epoch_start, last_device_ts, s0, sx, sy, sxx, sxy, offset, drift, reboots]
+_EPOCH_START, _LAST, _S0, _SX, _SY, _SXX, _SXY, _OFFSET, _DRIFT, _REBOOTS = range(10)
+
+
+def is_uptime(ts):
+    """Whether device timestamps are uptime counters rather than Unix ms"""
+    return np.asarray(ts) < MIN_TS
+
+
+class DeviceClocks:
+    """Incremental per-device offset and drift estimates"""
+
+    def __init__(self):
+        self._state = {}  # sensor id -> list laid out as above
+        self._lock = threading.Lock()
+
+    def observe(self, sensor_id, device_ts, arrival, first=None):
+        """Fold one (device time, arrival time) pair into the device's estimate
+
+        `first` is the oldest device timestamp sent along with `device_ts`,
+        used to spot a restarted counter.
+        """
+        first = device_ts if first is None else first
+        with self._lock:
+            state = self._state.get(sensor_id)
+            if state is None:
+                state = self._state[sensor_id] = [device_ts, device_ts, 0, 0, 0, 0, 0, 0, 0.0, 0]
+            elif first < state[_LAST] - REORDER_TOLERANCE_MS or abs(arrival - self._wall(state, device_ts)) > RESYNC_MS:
+                # Rebooted: new epoch, same crystal
+                state[:_OFFSET] = [device_ts, device_ts, 0, 0, 0, 0, 0]
+                state[_REBOOTS] += 1
+            state[_LAST] = max(state[_LAST], device_ts)
+
+            # Seconds keep the squared sums well inside float64 precision
+            x = (device_ts - state[_EPOCH_START]) / 1000
+            y = arrival - device_ts
+            for i, term in ((_S0, 1), (_SX, x), (_SY, y), (_SXX, x * x), (_SXY, x * y)):
+                state[i] = state[i] * DECAY + term
+            mean_x, mean_y = state[_SX] / state[_S0], state[_SY] / state[_S0]
+            if state[_LAST] - state[_EPOCH_START] >= MIN_DRIFT_SPAN_MS:
+                var = state[_SXX] / state[_S0] - mean_x ** 2
+                cov = state[_SXY] / state[_S0] - mean_x * mean_y
+                if var > 0:
+                    # ms of offset per s of device time, i.e. drift in thousandths
+                    state[_DRIFT] = float(np.clip(cov / var / 1000, -MAX_DRIFT, MAX_DRIFT))
+            state[_OFFSET] = mean_y - state[_DRIFT] * 1000 * mean_x
+
+    @staticmethod
+    def _wall(state, device_ts):
+        return device_ts + np.round(state[_OFFSET] + state[_DRIFT] * (device_ts - state[_EPOCH_START])).astype(np.int64)
+
+    def to_wall(self, sensor_id, device_ts):
+        """Wall-clock ms for device timestamps in the device's current epoch
+
+        Returns None for a device with no observations yet.
+        """
+        state = self._state.get(sensor_id)
+        if state is None:
+            return None
+        return self._wall(state, np.asarray(device_ts, dtype=np.int64))
+
+    def align(self, sensor_id, ts, arrival):
+        """Map a batch of device timestamps, in the order sent, to wall-clock ms
+
+        Learns from the batch's newest reading, assumed taken just before
+        `arrival`. Readings from before a reboot inside the batch are placed
+        back to back before the first reading after it, since the device
+        cannot tell how long it was down. Unix timestamps pass through.
+        """
+        ts = np.asarray(ts, dtype=np.int64)
+        uptime = is_uptime(ts)
+        if not uptime.any():
+            return ts
+        device_ts = ts[uptime]
+        # Epochs within the batch, split wherever the counter restarted
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(device_ts) < -REORDER_TOLERANCE_MS) + 1])
+        epochs = np.split(device_ts, starts[1:])
+
+        state = self._state.get(sensor_id)
+        # The first epoch may continue the one the device was already in
+        previous = None
+        if len(epochs) > 1 and state is not None and epochs[0][0] >= state[_LAST] - REORDER_TOLERANCE_MS:
+            previous = self.to_wall(sensor_id, epochs[0])
+
+        self.observe(sensor_id, int(epochs[-1].max()), arrival, first=int(epochs[-1].min()))
+        walls = [self.to_wall(sensor_id, epochs[-1])]
+        for k in range(len(epochs) - 2, -1, -1):
+            if k == 0 and previous is not None:
+                walls.insert(0, previous)
+                break
+            anchor = walls[0].min()
+            walls.insert(0, anchor - (epochs[k].max() - epochs[k]) - 1)
+
+        ts = ts.copy()
+        ts[uptime] = np.concatenate(walls)
+        return ts
+
+    def status(self, sensor_id):
+        """Current estimate of one device, or None"""
+        state = self._state.get(sensor_id)
+        if state is None:
+            return None
+        return {
+            'offset_ms': state[_OFFSET],
+            'drift_ppm': state[_DRIFT] * 1e6,
+            'epoch_start': state[_EPOCH_START],
+            'reboots': state[_REBOOTS]
+        }
+
+    def __len__(self):
+        return len(self._state)
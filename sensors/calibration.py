@@ -0,0 +1,168 @@
+"""Per-sensor calibration of raw ADC readings
+
+Nodes can report raw ADC counts (`tds_raw`, `conductivity_raw`, `ph_raw`)
+instead of converting on the device, so calibration curves and temperature
+compensation change here rather than by reflashing firmware. Raw values are
+archived as their own series, `<param>.raw`, next to the calibrated ones,
+which lets `IngestionWorker.recalibrate` re-derive history after the
+coefficients change.
+
+Each parameter has a `kind`:
+
+    ec  conductivity-style probes. The voltage is compensated to 25 °C,
+        V25 = V / (1 + alpha * (T - 25)), and the value is the cubic
+        poly[0] + poly[1] * V25 + poly[2] * V25**2 + poly[3] * V25**3
+    ph  glass electrodes, pH = 7 + (V - neutral) / (slope * T_K / 298.15),
+        with `neutral` the voltage at pH 7 and `slope` in V/pH at 25 °C
+
+`scale` converts ADC counts to volts. Coefficients are compiled into one
+array per parameter with a row per sensor, so a whole batch, or one reading
+from every sensor, is calibrated in a few NumPy operations.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+from sensors.validation import clean_values
+
+DEFAULT_PATH = os.environ.get('BLUEALERT_CALIBRATION', os.path.join('data', 'calibration.json'))
+REFERENCE_TEMP = 25.0
+ADC_SCALE = 3.3 / 4096  # ESP32 12-bit ADC at 3.3 V
+
+# DFRobot Gravity TDS/EC curve; TDS is half the conductivity
+EC_POLY = (0.0, 857.39, -255.86, 133.42)
+DEFAULT_CALIBRATION = {
+    'TDS': {'kind': 'ec', 'scale': ADC_SCALE, 'poly': [c * 0.5 for c in EC_POLY], 'alpha': 0.02},
+    'Conductivity': {'kind': 'ec', 'scale': ADC_SCALE, 'poly': list(EC_POLY), 'alpha': 0.02},
+    # Gravity pH board: 1.5 V at pH 7 and an amplified slope of about -177 mV/pH
+    'pH': {'kind': 'ph', 'scale': ADC_SCALE, 'neutral': 1.5, 'slope': -0.1773}
+}
+COEFFICIENTS = {
+    'ec': lambda c: [c['scale'], *c['poly'], c['alpha']],
+    'ph': lambda c: [c['scale'], c['neutral'], c['slope']]
+}
+
+
+def raw_series(param):
+    return f"{param}.raw"
+
+
+def is_raw_series(name):
+    return name.endswith('.raw')
+
+
+class CalibrationTable:
+    """Calibration coefficients per sensor, falling back to DEFAULT_CALIBRATION
+
+    Overrides are kept in a JSON file at `path` (None keeps them in memory
+    only) as {sensor_id: {param: {coefficient: value}}}; only the
+    coefficients that differ from the defaults need to be given.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, defaults=DEFAULT_CALIBRATION):
+        self.path = path
+        self.defaults = defaults
+        self.overrides = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self.overrides = json.load(f)
+        self._lock = threading.Lock()
+        self._compile()
+
+    def _compile(self):
+        # Row 0 holds the defaults, so unknown sensors map to it
+        self._rows = {sensor_id: i + 1 for i, sensor_id in enumerate(self.overrides)}
+        self._tables = {}
+        for param, default in self.defaults.items():
+            rows = [default] + [{**default, **self.overrides[s].get(param, {})} for s in self.overrides]
+            self._tables[param] = np.array([COEFFICIENTS[default['kind']](c) for c in rows], dtype=np.float64)
+
+    def coefficients(self, sensor_id, param):
+        """Effective coefficients of one sensor"""
+        return {**self.defaults[param], **self.overrides.get(sensor_id, {}).get(param, {})}
+
+    def set(self, sensor_id, param, **coefficients):
+        """Override coefficients of one sensor and persist the table
+
+        History is not touched; call `IngestionWorker.recalibrate` to
+        re-derive it from the archived raw values.
+        """
+        if param not in self.defaults:
+            raise ValueError(f"{param} has no calibration curve")
+        unknown = set(coefficients) - set(self.defaults[param]) - {'kind'}
+        if unknown:
+            raise ValueError(f"Unknown {param} coefficients: {', '.join(sorted(unknown))}")
+        with self._lock:
+            self.overrides.setdefault(sensor_id, {}).setdefault(param, {}).update(coefficients)
+            self._compile()
+            if self.path is not None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                tmp = self.path + '.tmp'
+                with open(tmp, 'w') as f:
+                    json.dump(self.overrides, f, indent=2)
+                os.replace(tmp, self.path)
+
+    def apply(self, param, sensor_ids, raw, temperature=None):
+        """Calibrated values for an array of raw ADC counts
+
+        `sensor_ids` is one id for a whole batch, or an array of ids aligned
+        with `raw`. `temperature` (°C, aligned with `raw`) drives the
+        compensation; missing or implausible temperatures fall back to
+        REFERENCE_TEMP. NaN raw values stay NaN.
+        """
+        raw = np.asarray(raw, dtype=np.float64)
+        if isinstance(sensor_ids, str):
+            rows = self._rows.get(sensor_ids, 0)
+        else:
+            rows = np.array([self._rows.get(s, 0) for s in sensor_ids], dtype=np.intp)
+        coefficients = self._tables[param][rows].T  # one row, or one column per reading
+        temperature = np.full(raw.shape, REFERENCE_TEMP) if temperature is None else \
+            clean_values('Temperature', np.broadcast_to(temperature, raw.shape))[0]
+        temperature = np.where(np.isnan(temperature), REFERENCE_TEMP, temperature)
+
+        volts = raw * coefficients[0]
+        if self.defaults[param]['kind'] == 'ec':
+            c0, c1, c2, c3, alpha = coefficients[1:]
+            v = volts / (1 + alpha * (temperature - REFERENCE_TEMP))
+            return c0 + v * (c1 + v * (c2 + v * c3))
+        neutral, slope = coefficients[1:]
+        return 7 + (volts - neutral) / (slope * (temperature + 273.15) / 298.15)
+
+    def calibrate_columns(self, sensor_id, columns):
+        """Add calibrated columns for every raw column of a batch
+
+        Calibrated values replace any the device computed itself. Raw values
+        that fail validation (see sensors.validation) calibrate to NaN, so a
+        saturated ADC never yields a plausible-looking reading.
+        """
+        temperature = columns.get('Temperature')
+        for param in self.defaults:
+            raw = columns.get(raw_series(param))
+            if raw is not None:
+                raw = clean_values(raw_series(param), raw)[0]
+                columns[param] = self.apply(param, sensor_id, raw, temperature)
+        return columns
+
+    def calibrate_readings(self, readings):
+        """Add calibrated values to polled readings (sensor id -> reading dict)
+
+        Each parameter is calibrated for all sensors reporting it at once. A
+        sensor whose raw value fails validation loses the calibrated value
+        too, including one the device computed itself.
+        """
+        for param in self.defaults:
+            key = raw_series(param)
+            sensor_ids = [s for s, reading in readings.items() if isinstance(reading.get(key), (int, float))]
+            if not sensor_ids:
+                continue
+            raw = clean_values(key, [readings[s][key] for s in sensor_ids])[0]
+            temperature = [readings[s].get('Temperature', np.nan) for s in sensor_ids]
+            temperature = [t if isinstance(t, (int, float)) else np.nan for t in temperature]
+            for sensor_id, value in zip(sensor_ids, self.apply(param, sensor_ids, raw, temperature)):
+                if np.isnan(value):
+                    readings[sensor_id].pop(param, None)
+                else:
+                    readings[sensor_id][param] = float(value)
+        return readings
@@ -0,0 +1,132 @@
+"""Local stand-in for ESP32 sensor nodes, for offline development
+
+Run a fleet of fake nodes and point the dashboard at them:
+
+    python -m sensors.fake_device --count 8
+    BLUEALERT_SENSORS="S001=http://127.0.0.1:8601,..." streamlit run app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def simulated_payload():
+    """Build a reading in the firmware's JSON format"""
+    return {
+        'tds': random.randint(200, 800),
+        'turbidity': round(random.uniform(1.5, 12.0), 1),
+        'temperature': round(random.uniform(22.0, 35.0), 1),
+        'ph': round(random.uniform(6.0, 9.0), 1),
+        'dissolved_oxygen': round(random.uniform(4.0, 10.0), 1),
+        'conductivity': random.randint(150, 600),
+        'chlorine': round(random.uniform(0.1, 2.0), 2),
+        'fluoride': round(random.uniform(0.5, 2.5), 2),
+        'timestamp': int(time.monotonic() * 1000)
+    }
+
+
+class _SensorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the ESP32 WebServer
+
+    def do_GET(self):
+        if self.path != '/api/sensors':
+            self.send_error(404)
+            return
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.server.requests_served += 1
+        body = json.dumps(self.server.payload_factory()).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeESP32:
+    """A fake sensor node serving /api/sensors on a background thread
+
+    `delay` adds a fixed response latency in seconds, which is useful for
+    simulating slow rural links.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, payload_factory=simulated_payload):
+        self._server = ThreadingHTTPServer((host, port), _SensorHandler)
+        self._server.daemon_threads = True
+        self._server.delay = delay
+        self._server.payload_factory = payload_factory
+        self._server.requests_served = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/sensors"
+
+    @property
+    def requests_served(self):
+        return self._server.requests_served
+
+    @property
+    def delay(self):
+        return self._server.delay
+
+    @delay.setter
+    def delay(self, value):
+        self._server.delay = value
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def start_fleet(count, base_port=0, delay=0.0):
+    """Start `count` fake nodes and return them with a matching device list"""
+    nodes = []
+    devices = []
+    for i in range(count):
+        port = base_port + i if base_port else 0
+        node = FakeESP32(port=port, delay=delay).start()
+        nodes.append(node)
+        devices.append({'id': f"S{i + 1:03d}", 'url': node.url, 'timeout': 2.0})
+    return nodes, devices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake ESP32 sensor nodes")
+    parser.add_argument('--count', type=int, default=8)
+    parser.add_argument('--port', type=int, default=8601, help="port of the first node")
+    parser.add_argument('--delay', type=float, default=0.0, help="response latency in seconds")
+    args = parser.parse_args()
+
+    nodes, devices = start_fleet(args.count, base_port=args.port, delay=args.delay)
+    spec = ','.join(f"{d['id']}={d['url']}" for d in devices)
+    print(f"Serving {len(nodes)} fake sensors. Use:\n  BLUEALERT_SENSORS=\"{spec}\"")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for node in nodes:
+            node.stop()
+
+
+if __name__ == '__main__':
+    main()
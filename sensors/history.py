@@ -0,0 +1,214 @@
+"""Append-only, memory-mapped on-disk history of sensor readings
+
+Layout under the data directory:
+
+    <sensor_id>/<param>/<day>.seg    packed (int64 ts_ms, float32 value) records
+    <sensor_id>/<param>/index.npy    one (day, first_ts, last_ts, count) row per segment
+
+`day` is the UTC day number (ts_ms // 86_400_000). Segments are only ever
+appended to, and queries memory-map just the segments that overlap the
+requested range, so neither cold start nor query cost grows with the total
+amount of history on disk.
+"""
+import os
+import re
+import threading
+
+import numpy as np
+
+DAY_MS = 86_400_000
+DEFAULT_DATA_DIR = os.environ.get('BLUEALERT_DATA_DIR', os.path.join('data', 'history'))
+
+RECORD = np.dtype([('ts', '<i8'), ('value', '<f4')])
+INDEX_ENTRY = np.dtype([('day', '<i8'), ('first_ts', '<i8'), ('last_ts', '<i8'), ('count', '<i8')])
+
+_SAFE_NAME = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9_.-]*$')
+
+
+def _check_name(name):
+    if not _SAFE_NAME.match(name):
+        raise ValueError(f"Invalid series name: {name!r}")
+    return name
+
+
+class SegmentStore:
+    """Per sensor, per parameter, per day segment files with a small index
+
+    Writes are expected from a single ingestion thread; readers only map the
+    records the index knows about, so they never observe a partial append.
+    Call `flush()` to persist index changes; segment data is written through
+    on every append.
+    """
+
+    def __init__(self, root=DEFAULT_DATA_DIR):
+        self.root = root
+        self._indexes = {}  # (sensor, param) -> INDEX_ENTRY array, loaded lazily
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def _dir(self, sensor_id, param):
+        return os.path.join(self.root, _check_name(sensor_id), _check_name(param))
+
+    def _segment_path(self, sensor_id, param, day):
+        return os.path.join(self._dir(sensor_id, param), f"{day}.seg")
+
+    def _load_index(self, sensor_id, param):
+        key = (sensor_id, param)
+        index = self._indexes.get(key)
+        if index is not None:
+            return index
+        path = os.path.join(self._dir(sensor_id, param), 'index.npy')
+        index = np.load(path) if os.path.exists(path) else np.empty(0, dtype=INDEX_ENTRY)
+        index = self._reconcile(sensor_id, param, index)
+        self._indexes[key] = index
+        return index
+
+    def _reconcile(self, sensor_id, param, index):
+        """Pick up records and segments written after the index was last flushed"""
+        last_day = int(index['day'][-1]) if len(index) else None
+        series_dir = self._dir(sensor_id, param)
+        days = sorted(
+            int(name[:-4]) for name in (os.listdir(series_dir) if os.path.isdir(series_dir) else [])
+            if name.endswith('.seg')
+        )
+        entries = []
+        for day in days:
+            if last_day is not None and day < last_day:
+                continue
+            path = self._segment_path(sensor_id, param, day)
+            count = os.path.getsize(path) // RECORD.itemsize
+            if not count or (day == last_day and count == index['count'][-1]):
+                continue
+            records = np.memmap(path, dtype=RECORD, mode='r', shape=(count,))
+            entries.append((day, records['ts'][0], records['ts'][-1], count))
+        if not entries:
+            return index
+        if entries[0][0] == last_day:
+            index = index[:-1]
+        return np.concatenate([index, np.array(entries, dtype=INDEX_ENTRY)])
+
+    def append(self, sensor_id, param, ts, values):
+        """Append a batch of samples (timestamps in ms, non-decreasing)"""
+        ts = np.asarray(ts, dtype=np.int64)
+        if not len(ts):
+            return
+        records = np.empty(len(ts), dtype=RECORD)
+        records['ts'] = ts
+        records['value'] = values
+
+        with self._lock:
+            index = self._load_index(sensor_id, param)
+            if not len(index):
+                os.makedirs(self._dir(sensor_id, param), exist_ok=True)
+            days = ts // DAY_MS
+            # One write per day touched by the batch
+            bounds = np.flatnonzero(np.diff(days)) + 1
+            for chunk in np.split(records, bounds):
+                day = int(chunk['ts'][0] // DAY_MS)
+                with open(self._segment_path(sensor_id, param, day), 'ab') as f:
+                    f.write(chunk.tobytes())
+                if len(index) and index['day'][-1] == day:
+                    index['last_ts'][-1] = chunk['ts'][-1]
+                    index['count'][-1] += len(chunk)
+                else:
+                    entry = np.array([(day, chunk['ts'][0], chunk['ts'][-1], len(chunk))], dtype=INDEX_ENTRY)
+                    index = np.concatenate([index, entry])
+            self._indexes[(sensor_id, param)] = index
+            self._dirty.add((sensor_id, param))
+
+    def append_reading(self, sensor_id, reading, ts):
+        """Record every numeric parameter of one reading dict"""
+        for param, value in reading.items():
+            if param != 'timestamp' and isinstance(value, (int, float)):
+                self.append(sensor_id, param, [ts], [value])
+
+    def replace_day(self, sensor_id, param, day, ts, values):
+        """Atomically replace one day segment, e.g. with recalibrated values
+
+        `ts` must fall within `day`; an empty batch removes the segment.
+        Readers already mapping the old segment keep seeing it until they
+        are done with it.
+        """
+        ts = np.asarray(ts, dtype=np.int64)
+        records = np.empty(len(ts), dtype=RECORD)
+        records['ts'] = ts
+        records['value'] = values
+
+        with self._lock:
+            index = self._load_index(sensor_id, param)
+            path = self._segment_path(sensor_id, param, day)
+            if len(ts):
+                os.makedirs(self._dir(sensor_id, param), exist_ok=True)
+                tmp = path + '.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(records.tobytes())
+                os.replace(tmp, path)
+            elif os.path.exists(path):
+                os.remove(path)
+            index = index[index['day'] != day]
+            if len(ts):
+                entry = np.array([(day, ts[0], ts[-1], len(ts))], dtype=INDEX_ENTRY)
+                index = np.sort(np.concatenate([index, entry]), order='day')
+            self._indexes[(sensor_id, param)] = index
+            self._dirty.add((sensor_id, param))
+
+    def flush(self):
+        """Persist the index of every series written since the last flush"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            for sensor_id, param in dirty:
+                path = os.path.join(self._dir(sensor_id, param), 'index.npy')
+                tmp = path + '.tmp'
+                with open(tmp, 'wb') as f:
+                    np.save(f, self._indexes[(sensor_id, param)])
+                os.replace(tmp, path)
+
+    def query(self, sensor_id, param, start_ms, end_ms):
+        """Samples with start_ms <= ts < end_ms as (ts, values) arrays
+
+        Only the segments overlapping the range are mapped; the result is a
+        copy of just the selected records.
+        """
+        with self._lock:
+            index = self._load_index(sensor_id, param)
+            hits = index[(index['last_ts'] >= start_ms) & (index['first_ts'] < end_ms)]
+
+        ts_parts, value_parts = [], []
+        for entry in hits:
+            path = self._segment_path(sensor_id, param, int(entry['day']))
+            records = np.memmap(path, dtype=RECORD, mode='r', shape=(int(entry['count']),))
+            lo = np.searchsorted(records['ts'], start_ms, side='left')
+            hi = np.searchsorted(records['ts'], end_ms, side='left')
+            ts_parts.append(np.array(records['ts'][lo:hi]))
+            value_parts.append(np.array(records['value'][lo:hi]))
+        if not ts_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return np.concatenate(ts_parts), np.concatenate(value_parts)
+
+    def series(self):
+        """All (sensor_id, param) pairs with data on disk"""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for sensor_id in sorted(os.listdir(self.root)):
+            sensor_dir = os.path.join(self.root, sensor_id)
+            if os.path.isdir(sensor_dir):
+                found.extend((sensor_id, param) for param in sorted(os.listdir(sensor_dir)))
+        return found
+
+    def days(self, sensor_id, param):
+        """UTC day numbers that have a segment, oldest first"""
+        with self._lock:
+            return self._load_index(sensor_id, param)['day'].tolist()
+
+    def bounds(self, sensor_id, param):
+        """(first_ts, last_ts) of a series, or None if it has no data"""
+        with self._lock:
+            index = self._load_index(sensor_id, param)
+            if not len(index):
+                return None
+            return int(index['first_ts'][0]), int(index['last_ts'][-1])
+
+    def is_empty(self, sensor_id, param):
+        with self._lock:
+            return not len(self._load_index(sensor_id, param))
@@ -0,0 +1,411 @@
+"""Process-wide sensor ingestion shared by every dashboard session"""
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from datetime import datetime
+from types import MappingProxyType
+
+import numpy as np
+import streamlit as st
+
+from alerting.anomaly import ANOMALY_RULES, AnomalyDetector
+from alerting.rules import AlertEngine
+from alerting.store import AlertStore, get_alert_store
+from sensors.alignment import DeviceClocks
+from sensors.calibration import CalibrationTable, is_raw_series, raw_series
+from sensors.fake_device import simulated_payload
+from sensors.history import DAY_MS, SegmentStore
+from sensors.latest import LatestTable
+from sensors.mqtt import MQTTGateway, connect_broker
+from sensors.pipeline import IngestPipeline
+from sensors.poller import SensorPoller, load_devices, normalize_payload
+from sensors.push import PushServer
+from sensors.rollups import RollupStore, is_rollup_series
+from sensors.timeseries import TimeSeriesStore, now_ms
+from sensors.validation import clean_readings, clean_values
+from sensors.wqi import WQI, WQI_SERIES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 30.0
+INDEX_FLUSH_INTERVAL = 300.0
+
+# Shown until the first sweep completes
+DEFAULT_READING = {
+    'TDS': 450,
+    'Turbidity': 5.2,
+    'Temperature': 28.5,
+    'pH': 7.1
+}
+
+# Immutable view of the latest readings. `readings` maps sensor id to that
+# sensor's reading; `primary` is the reading that drives the summary cards.
+Snapshot = namedtuple('Snapshot', ['version', 'updated', 'readings', 'primary', 'failed'])
+
+
+def _freeze(readings):
+    return MappingProxyType({sid: MappingProxyType(dict(r)) for sid, r in readings.items()})
+
+
+def simulated_history(hours, interval):
+    """Vectorized demo history around typical readings, one array per parameter"""
+    n = int(hours * 3600 / interval)
+    ts = now_ms() - np.arange(n, 0, -1, dtype=np.int64) * int(interval * 1000)
+    rng = np.random.default_rng()
+    return ts, {
+        'TDS': 450 + rng.integers(-50, 100, n),
+        'Turbidity': np.round(3.5 + rng.uniform(-1, 3, n), 1),
+        'Temperature': np.round(26 + rng.uniform(-3, 6, n), 1),
+        'pH': np.round(7.2 + rng.uniform(-0.5, 0.8, n), 1)
+    }
+
+
+class IngestionWorker:
+    """Background loop that polls the sensor fleet and publishes snapshots
+
+    The latest Snapshot is swapped in with a single attribute assignment, so
+    sessions read it without taking a lock and never hold a copy of their
+    own. Every reading is appended to the in-memory `history`, the on-disk
+    `archive` and its `rollups`, and evaluated by the `alerts` rule engine.
+    The `anomalies` detector scores it too, and `anomaly_alerts` turns those
+    scores into alerts. Transitions of both are kept in `alert_events` and
+    mirrored into `alert_store` for the Alerts page. The `latest` table
+    holds the newest value and status of every sensor for fleet views. Batches from devices
+    that push instead of being polled go through the staged `pipeline`. Raw
+    ADC values are converted with the per-sensor `calibration` table and
+    archived as well, so `recalibrate` can re-derive history later. On start
+    the last day of the archive is loaded back into `history`. When no
+    devices are configured the worker publishes simulated readings for a
+    single node, seeded with a day of simulated history.
+    """
+
+    def __init__(self, poller, interval=DEFAULT_INTERVAL, archive=None, alert_store=None, calibration=None):
+        self.poller = poller
+        self.interval = interval
+        self.history = TimeSeriesStore()
+        self.archive = SegmentStore() if archive is None else archive
+        self.rollups = RollupStore(self.archive)
+        self.calibration = CalibrationTable() if calibration is None else calibration
+        self.clocks = DeviceClocks()  # uptime -> wall-clock estimates of pushing devices
+        self.alerts = AlertEngine()
+        self.anomalies = AnomalyDetector(self.alerts.registry.params)
+        self.anomaly_alerts = AlertEngine(ANOMALY_RULES, registry=self.anomalies)
+        self.latest = LatestTable(self.alerts.registry)
+        self.alert_events = deque(maxlen=1000)
+        self.alert_store = AlertStore() if alert_store is None else alert_store
+        self._open_alerts = {}  # (sensor, rule) -> alert store id
+        self._last_flush = time.monotonic()
+        self._high_water = {}  # sensor id -> newest stored ts
+        self._primary_id = poller.devices[0]['id'] if poller.devices else 'S001'
+        self._write_lock = threading.Lock()
+        self._alert_lock = threading.Lock()
+        self._evaluated = {}  # sensor id -> ts of the newest reading the rules have seen
+        self.rejected = defaultdict(int)  # param -> values dropped by validation
+        self.pipeline = IngestPipeline(self)
+        self.push_server = None
+        self.mqtt_gateway = None
+        self.snapshot = Snapshot(0, datetime.now(), _freeze({}), MappingProxyType(dict(DEFAULT_READING)), 0)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._published = threading.Condition()
+        self._thread = None
+
+    def _collect(self):
+        if not self.poller.devices:
+            return {'S001': normalize_payload(simulated_payload())}, 0
+        results = self.poller.sweep()
+        readings = {r['id']: r['data'] for r in results if r['ok']}
+        return readings, len(results) - len(readings)
+
+    def poll_once(self):
+        """Run one sweep and publish the result"""
+        readings, failed = self._collect()
+        readings, rejected = clean_readings(self.calibration.calibrate_readings(readings))
+        for param, count in rejected.items():
+            self.rejected[param] += count
+        # Raw ADC values are only archived, for recalibration
+        raw = {sensor_id: {param: reading.pop(param) for param in list(reading) if is_raw_series(param)}
+               for sensor_id, reading in readings.items()}
+        # The index is derived for every sensor at once and stored like a parameter
+        for reading, wqi in zip(readings.values(), WQI.compute_readings(list(readings.values()))):
+            if not np.isnan(wqi):
+                reading[WQI_SERIES] = round(float(wqi), 1)
+        ts = now_ms()
+        with self._write_lock:
+            for sensor_id, reading in readings.items():
+                self.history.append_reading(sensor_id, reading, ts)
+                self.archive.append_reading(sensor_id, {**reading, **raw[sensor_id]}, ts)
+                self.rollups.add_reading(sensor_id, reading, ts)
+                self._high_water[sensor_id] = ts
+        if readings:
+            self._evaluate_alerts(list(readings), ts, list(readings.values()))
+        self._maybe_flush()
+        # The first responding node in device order drives the summary cards
+        primary = next(iter(readings.values()), None)
+        return self._publish(readings, failed, primary, updated=bool(readings))
+
+    def store_batch(self, sensor_id, ts, columns):
+        """Bulk-append a validated batch; returns (stored, high-water mark)
+
+        `ts` holds strictly increasing millisecond timestamps and `columns`
+        maps parameter names to float arrays of the same length, with NaN
+        for rejected values (see sensors.validation). Readings at or before
+        the sensor's high-water mark were already stored and are dropped, so
+        a device can safely resend a batch whose acknowledgement was lost.
+        The batch's WQI series is derived here, off the validate path.
+        Alerts and the snapshot are updated separately through
+        `evaluate_latest`.
+        """
+        ts = np.asarray(ts, dtype=np.int64)
+        wqi = WQI.compute_columns(columns)
+        if wqi is not None:
+            columns = {**columns, WQI_SERIES: np.round(wqi, 1)}
+        with self._write_lock:
+            high_water = self.high_water_mark(sensor_id)
+            start = np.searchsorted(ts, high_water, side='right')
+            if start == len(ts):
+                return 0, high_water
+            ts = ts[start:]
+            for param, values in columns.items():
+                values = np.asarray(values)[start:]
+                ok = ~np.isnan(values)
+                param_ts, values = (ts, values) if ok.all() else (ts[ok], values[ok])
+                if not len(param_ts):
+                    continue
+                if is_raw_series(param):
+                    self.archive.append(sensor_id, param, param_ts, values)
+                    continue
+                self.history.series(sensor_id, param).extend(param_ts, values)
+                self.archive.append(sensor_id, param, param_ts, values)
+                self.rollups.add_batch(sensor_id, param, param_ts, values)
+            high_water = self._high_water[sensor_id] = int(ts[-1])
+        self._maybe_flush()
+        return len(ts), high_water
+
+    def recalibrate(self, sensor_id, params=None):
+        """Re-derive a sensor's calibrated history from its archived raw values
+
+        Run after changing the sensor's coefficients in `calibration`. Each
+        day with raw values is recalibrated, together with its rollups and
+        the in-memory last day; values that were stored without a raw
+        counterpart are kept, and the WQI of those days is recomputed.
+        Returns the number of readings re-derived.
+        """
+        params = self.calibration.defaults if params is None else params
+        total = 0
+        recalibrated = set()
+        with self._write_lock:
+            for param in params:
+                days = self.archive.days(sensor_id, raw_series(param))
+                if not days:
+                    continue
+                recalibrated.update(days)
+                for day in days:
+                    start, end = day * DAY_MS, (day + 1) * DAY_MS
+                    ts, raw = self.archive.query(sensor_id, raw_series(param), start, end)
+                    # Temperature comes in the same reading as the raw value
+                    temp_ts, temp = self.archive.query(sensor_id, 'Temperature', start, end)
+                    i = np.minimum(np.searchsorted(temp_ts, ts), max(len(temp_ts) - 1, 0))
+                    temperature = np.where(temp_ts[i] == ts, temp[i], np.nan) if len(temp_ts) else None
+                    values, _ = clean_values(param, self.calibration.apply(param, sensor_id, raw, temperature))
+                    ok = ~np.isnan(values)
+
+                    old_ts, old_values = self.archive.query(sensor_id, param, start, end)
+                    kept = ~np.isin(old_ts, ts)
+                    day_ts = np.concatenate([old_ts[kept], ts[ok]])
+                    order = np.argsort(day_ts, kind='stable')
+                    day_ts = day_ts[order]
+                    day_values = np.concatenate([old_values[kept], values[ok]])[order]
+                    self.archive.replace_day(sensor_id, param, day, day_ts, day_values)
+                    self.rollups.rebuild_day(sensor_id, param, day, day_ts, day_values)
+                    total += int(ok.sum())
+                self.rollups.restore_open(sensor_id, param)
+                end = now_ms()
+                self.history.replace(sensor_id, param, *self.archive.query(sensor_id, param, end - DAY_MS, end + 1))
+            self.archive.flush()
+        if recalibrated:
+            self.derive_wqi(sensor_id, sorted(recalibrated))
+        return total
+
+    def evaluate_latest(self, latest):
+        """Run the rules over the newest reading per sensor and publish them
+
+        `latest` maps sensor id to (ts, reading); readings no newer than the
+        last one evaluated for that sensor are ignored.
+        """
+        fresh = {sensor_id: (ts, reading) for sensor_id, (ts, reading) in latest.items()
+                 if ts > self._evaluated.get(sensor_id, -1)}
+        if not fresh:
+            return
+        self._evaluate_alerts(list(fresh), np.array([ts for ts, _ in fresh.values()]), [r for _, r in fresh.values()])
+        readings = {sensor_id: reading for sensor_id, (_, reading) in fresh.items()}
+        self._publish(readings, self.snapshot.failed, readings.get(self._primary_id))
+
+    def high_water_mark(self, sensor_id):
+        """Timestamp of the newest stored reading of a sensor, -1 if none"""
+        high_water = self._high_water.get(sensor_id)
+        if high_water is None:
+            bounds = [self.archive.bounds(sensor_id, param) for param in self.alerts.registry.params]
+            high_water = max((b[1] for b in bounds if b is not None), default=-1)
+            self._high_water[sensor_id] = high_water
+        return high_water
+
+    def _evaluate_alerts(self, sensor_ids, ts, readings):
+        params = self.alerts.registry.params
+        rows = [[float(r.get(p, np.nan)) for p in params] for r in readings]
+        with self._alert_lock:
+            events = self.alerts.evaluate(sensor_ids, ts, rows)
+            scores = self.anomalies.update(sensor_ids, ts, rows)
+            events += self.anomaly_alerts.evaluate(sensor_ids, ts, scores)
+            self._evaluated.update(zip(sensor_ids, np.broadcast_to(ts, (len(sensor_ids),)).tolist()))
+            self.alert_events.extend(events)
+            self._store_alerts(events)
+        self.latest.update(sensor_ids, ts, readings)
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._last_flush >= INDEX_FLUSH_INTERVAL:
+            self._last_flush = time.monotonic()
+            self.archive.flush()
+
+    def _publish(self, readings, failed, primary=None, updated=True):
+        with self._published:
+            previous = self.snapshot
+            # Sensors missing from this update keep their last known reading
+            snapshot = Snapshot(
+                previous.version + 1,
+                datetime.now() if updated else previous.updated,
+                MappingProxyType({**previous.readings, **_freeze(readings)}),
+                previous.primary if primary is None else MappingProxyType({**previous.primary, **primary}),
+                failed
+            )
+            self.snapshot = snapshot
+            self._published.notify_all()
+        return snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception:  # keep the shared loop alive
+                logger.exception("Sensor ingestion error")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _store_alerts(self, events):
+        """Mirror rule engine transitions into the alert store"""
+        for event in events:
+            key = (event['sensor_id'], event['rule'])
+            if event['transition'] == 'raised':
+                self._open_alerts[key] = self.alert_store.add({
+                    'type': 'Water Quality',
+                    'title': event['type'],
+                    'message': event['message'],
+                    'severity': event['severity'],
+                    'location': f"Sensor {event['sensor_id']}",
+                    'district': None,
+                    'time': datetime.fromtimestamp(event['time'] / 1000),
+                    'status': 'active',
+                    'affected_population': 0,
+                    'source': 'Sensor Network'
+                })
+            elif key in self._open_alerts:
+                self.alert_store.update(self._open_alerts.pop(key), status='resolved')
+
+    def derive_wqi(self, sensor_id, days=None):
+        """(Re)compute the WQI series of a sensor's archived history, one day at a time
+
+        Readings of different parameters are matched on their timestamps and
+        each day's index is computed in one vectorized call, replacing that
+        day's WQI segment and rollups. `days` defaults to every archived day.
+        Returns the number of index values stored.
+        """
+        if days is None:
+            days = sorted({day for param in WQI.params for day in self.archive.days(sensor_id, param)})
+        total = 0
+        with self._write_lock:
+            for day in days:
+                start, end = day * DAY_MS, (day + 1) * DAY_MS
+                series = {param: self.archive.query(sensor_id, param, start, end) for param in WQI.params}
+                ts = np.unique(np.concatenate([param_ts for param_ts, _ in series.values()]))
+                columns = {}
+                for param, (param_ts, values) in series.items():
+                    if len(param_ts):
+                        columns[param] = np.full(len(ts), np.nan)
+                        columns[param][np.searchsorted(ts, param_ts)] = values
+                wqi = WQI.compute_columns(columns)
+                ok = ~np.isnan(wqi)
+                self.archive.replace_day(sensor_id, WQI_SERIES, day, ts[ok], wqi[ok])
+                self.rollups.rebuild_day(sensor_id, WQI_SERIES, day, ts[ok], wqi[ok])
+                total += int(ok.sum())
+            self.rollups.restore_open(sensor_id, WQI_SERIES)
+            end = now_ms()
+            self.history.replace(sensor_id, WQI_SERIES, *self.archive.query(sensor_id, WQI_SERIES, end - DAY_MS, end + 1))
+            self.archive.flush()
+        return total
+
+    def _warm_history(self):
+        """Reload the last day of readings and open rollups from disk after a restart
+
+        Sensors archived before the WQI series existed get it derived.
+        """
+        end = now_ms()
+        series = self.archive.series()
+        for sensor_id, param in series:
+            if is_rollup_series(param):
+                continue
+            self.rollups.restore_open(sensor_id, param)
+            ts, values = self.archive.query(sensor_id, param, end - 24 * 3600 * 1000, end + 1)
+            if len(ts):
+                self.history.series(sensor_id, param).extend(ts, values)
+        for sensor_id in sorted({sensor_id for sensor_id, _ in series}):
+            if self.archive.is_empty(sensor_id, WQI_SERIES):
+                self.derive_wqi(sensor_id)
+
+    def start(self):
+        if self._thread is None:
+            if not self.poller.devices and self.archive.is_empty('S001', 'TDS'):
+                ts, columns = simulated_history(24, self.interval)
+                columns[WQI_SERIES] = WQI.compute_columns(columns)
+                for param, values in columns.items():
+                    self.archive.append('S001', param, ts, values)
+                    self.rollups.add_batch('S001', param, ts, values)
+                self.archive.flush()
+            self._warm_history()
+            self.pipeline.start()
+            self._thread = threading.Thread(target=self._run, name='sensor-ingest', daemon=True)
+            self._thread.start()
+        return self
+
+    def refresh(self, timeout=None):
+        """Wake the loop early and wait for the next snapshot"""
+        version = self.snapshot.version
+        self._wake.set()
+        with self._published:
+            self._published.wait_for(lambda: self.snapshot.version > version, timeout=timeout)
+        return self.snapshot
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.pipeline.stop()
+        self.archive.flush()
+        self.poller.close()
+
+
+@st.cache_resource
+def get_ingestion_worker():
+    """The single ingestion worker for this server process
+
+    Also serves the push endpoint when BLUEALERT_INGEST_PORT is set, and
+    subscribes to the MQTT broker named by BLUEALERT_MQTT ("host[:port]").
+    """
+    worker = IngestionWorker(SensorPoller(load_devices()), alert_store=get_alert_store()).start()
+    if os.environ.get('BLUEALERT_INGEST_PORT'):
+        worker.push_server = PushServer(worker, port=int(os.environ['BLUEALERT_INGEST_PORT'])).start()
+    if os.environ.get('BLUEALERT_MQTT'):
+        worker.mqtt_gateway = MQTTGateway(worker, connect_broker()).start()
+    return worker
@@ -0,0 +1,149 @@
+"""Latest value and status of every parameter of every sensor
+
+`LatestTable` keeps one row per sensor in preallocated NumPy matrices, so a
+reading overwrites its sensor's row in place: O(1) per reading however
+large the fleet is, with no per-update copy. Statuses are classified
+through the shared threshold registry when the reading arrives, and the
+WQI grade is stored next to them. Fleet views sort and filter the whole
+table with a handful of array operations instead of walking reading dicts.
+"""
+import threading
+
+import numpy as np
+
+from sensors.thresholds import GOOD, MODERATE, POOR, REGISTRY, STATUS_LABELS, UNKNOWN
+from sensors.timeseries import now_ms
+from sensors.wqi import GRADES, WQI_SERIES
+
+# Sensors that have not reported for this long are shown as stale
+STALE_MS = 10 * 60 * 1000
+
+# WQI grades folded onto the threshold status scale
+_GRADE_BOUNDS = np.array([bound for bound, _ in GRADES[:-1]])
+_GRADE_STATUS = np.array([GOOD, GOOD, MODERATE, MODERATE, POOR], dtype=np.int8)
+
+
+class LatestTable:
+    """(sensors x params) matrices of the newest value, status and timestamp
+
+    `params` are the registry parameters plus WQI. A reading that lacks a
+    parameter keeps that parameter's previous value. `worst` is each
+    sensor's worst status over its parameters, the one the fleet view
+    filters on.
+    """
+
+    def __init__(self, registry=REGISTRY, capacity=1024):
+        self.registry = registry
+        self.params = registry.params + [WQI_SERIES]
+        self.columns = {param: i for i, param in enumerate(self.params)}
+        self._ids = []
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        grown = {
+            'values': np.full((capacity, len(self.params)), np.nan),
+            'status': np.full((capacity, len(self.params)), UNKNOWN, dtype=np.int8),
+            'ts': np.zeros(capacity, dtype=np.int64)
+        }
+        for name, array in grown.items():
+            if hasattr(self, name):
+                old = getattr(self, name)
+                array[:len(old)] = old
+            setattr(self, name, array)
+
+    def _slot(self, sensor_id):
+        slot = self._slots.get(sensor_id)
+        if slot is None:
+            slot = self._slots[sensor_id] = len(self._ids)
+            self._ids.append(sensor_id)
+            if slot == len(self.ts):
+                self._alloc(2 * len(self.ts))
+        return slot
+
+    def update(self, sensor_ids, ts, readings):
+        """Overwrite the rows of `sensor_ids` with their newest readings
+
+        `ts` is a scalar or one ms timestamp per sensor; readings older
+        than a sensor's current row are ignored.
+        """
+        ts = np.broadcast_to(np.asarray(ts, dtype=np.int64), (len(sensor_ids),))
+        rows = np.array([[float(r.get(p, np.nan)) for p in self.params] for r in readings], dtype=np.float64)
+        rows = rows.reshape(len(sensor_ids), len(self.params))
+        with self._lock:
+            slots = np.array([self._slot(s) for s in sensor_ids], dtype=np.int64)
+            fresh = ts >= self.ts[slots]
+            slots, rows, ts = slots[fresh], rows[fresh], ts[fresh]
+            values = np.where(np.isnan(rows), self.values[slots], rows)
+            status = np.empty(values.shape, dtype=np.int8)
+            status[:, :-1] = self.registry.classify(values[:, :-1])
+            wqi = values[:, -1]
+            grades = np.minimum(np.searchsorted(_GRADE_BOUNDS, wqi, side='left'), len(GRADES) - 1)
+            status[:, -1] = np.where(np.isnan(wqi), UNKNOWN, _GRADE_STATUS[grades])
+            self.values[slots] = values
+            self.status[slots] = status
+            self.ts[slots] = ts
+
+    def query(self, sort_by=None, descending=False, worst=None, search='', stale_ms=STALE_MS):
+        """Indexes of matching sensors in display order, plus the table they index
+
+        `worst` keeps sensors whose worst status label is in it ('stale'
+        selects sensors silent for `stale_ms`), `search` keeps sensor ids
+        containing it, and `sort_by` is a parameter name or 'sensor_id'.
+        Missing values sort last either way.
+        """
+        with self._lock:
+            n = len(self._ids)
+            ids = np.array(self._ids, dtype=object)
+            table = {
+                'sensor_id': ids,
+                'values': self.values[:n].copy(),
+                'status': self.status[:n].copy(),
+                'ts': self.ts[:n].copy()
+            }
+        table['worst'] = table['status'].max(axis=1) if n else np.zeros(0, dtype=np.int8)
+        keep = np.ones(n, dtype=bool)
+        if search:
+            keep &= np.char.find(ids.astype(str), search) >= 0
+        if worst:
+            labels = {code for code, label in STATUS_LABELS.items() if label in worst}
+            selected = np.isin(table['worst'], list(labels))
+            if 'stale' in worst:
+                selected |= table['ts'] < now_ms() - stale_ms
+            keep &= selected
+        index = np.flatnonzero(keep)
+        if sort_by == 'sensor_id':
+            order = np.argsort(ids[index].astype(str), kind='stable')
+            index = index[order[::-1] if descending else order]
+        elif sort_by is not None:
+            column = table['values'][index, self.columns[sort_by]]
+            # NaN sorts last in argsort; negating keeps it last when descending
+            order = np.argsort(-column if descending else column, kind='stable')
+            index = index[order]
+        return index, table
+
+    def counts(self):
+        """Number of sensors per worst status label"""
+        with self._lock:
+            worst = self.status[:len(self._ids)].max(axis=1)
+        counts = np.bincount(worst.astype(np.int64) - UNKNOWN, minlength=len(STATUS_LABELS))
+        return {STATUS_LABELS[code]: int(counts[code - UNKNOWN]) for code in STATUS_LABELS}
+
+    def row(self, sensor_id):
+        """{param: (value, status label)} of one sensor and its timestamp, or None"""
+        with self._lock:
+            slot = self._slots.get(sensor_id)
+            if slot is None:
+                return None
+            values, status, ts = self.values[slot].copy(), self.status[slot].copy(), int(self.ts[slot])
+        reading = {p: (float(values[i]), STATUS_LABELS[int(status[i])])
+                   for p, i in self.columns.items() if not np.isnan(values[i])}
+        return reading, ts
+
+    def sensors(self):
+        with self._lock:
+            return sorted(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
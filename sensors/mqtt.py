@@ -0,0 +1,300 @@
+"""MQTT ingestion gateway for nodes that can only publish
+
+Nodes publish to `bluealert/<state>/<district>/<sensor_id>`, one firmware
+JSON reading per message or a binary frame of several (see sensors.wire).
+The client's network thread only queues messages; a writer thread drains the
+bounded queue and submits each sensor's messages to the ingest pipeline as
+one batch. When the pipeline is full the writer blocks, and then the network
+thread blocks on the full queue, which stops it reading from the broker
+socket and pushes back on the broker instead of growing memory.
+
+The client is anything with paho-mqtt's callback API. `connect_broker()`
+builds a paho client (`pip install paho-mqtt`); `LocalBroker` is an
+in-process stand-in for development and benchmarks.
+"""
+import functools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import numpy as np
+
+from sensors.pipeline import Full
+from sensors.poller import normalize_payload
+from sensors.timeseries import now_ms
+from sensors.wire import MAGIC, decode_batch
+
+logger = logging.getLogger(__name__)
+
+TOPIC_PREFIX = 'bluealert'
+TOPIC_FILTER = f"{TOPIC_PREFIX}/+/+/+"
+DEFAULT_QUEUE_SIZE = 50_000
+DEFAULT_BATCH_SIZE = 10_000
+DEFAULT_FLUSH_INTERVAL = 1.0
+PAHO_REQUIREMENT = 'paho-mqtt>=1.6,<3'  # optional; both 1.x and 2.x client APIs are supported
+
+
+def parse_topic(topic):
+    """(state, district, sensor_id) of a reading topic, or None"""
+    parts = topic.split('/')
+    if len(parts) != 4 or parts[0] != TOPIC_PREFIX or not all(parts[1:]):
+        return None
+    return tuple(parts[1:])
+
+
+def parse_message(payload, received):
+    """(ts, reading) of a firmware JSON message
+
+    The firmware `timestamp` is used when present, either Unix ms or a
+    `millis()` uptime counter that the pipeline aligns to wall-clock time
+    (see sensors.alignment); otherwise the arrival time.
+    """
+    reading = normalize_payload(json.loads(payload))
+    ts = reading.pop('timestamp', None)
+    if not isinstance(ts, int) or isinstance(ts, bool) or ts < 0:
+        ts = received
+    reading = {param: value for param, value in reading.items() if isinstance(value, (int, float))}
+    if not reading:
+        raise ValueError("message has no known sensor fields")
+    return ts, reading
+
+
+def _append_rows(batch, ts, columns):
+    """Add rows to a (ts, columns) list batch, padding fields a side lacks with NaN"""
+    rows, batch_columns = batch
+    for param in columns:
+        if param not in batch_columns:
+            batch_columns[param] = [np.nan] * len(rows)
+    rows.extend(ts)
+    for param, values in batch_columns.items():
+        values.extend(columns[param] if param in columns else [np.nan] * len(ts))
+
+
+class MQTTGateway:
+    """Subscribes `client` to TOPIC_FILTER and batches readings into `worker`
+
+    `queue_size` bounds the messages held between the network thread and the
+    writer; while it is full the network thread waits. `stats` counts
+    messages received, and readings stored, cleaned out by validation,
+    duplicated, shed by the pipeline or invalid. The writer flushes every
+    `batch_size` messages or `flush_interval` seconds, whichever comes first.
+    """
+
+    def __init__(self, worker, client, queue_size=DEFAULT_QUEUE_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.worker = worker
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.locations = {}  # sensor id -> (state, district) from its topic
+        self.stats = {'received': 0, 'stored': 0, 'cleaned': 0, 'duplicates': 0, 'shed': 0, 'invalid': 0, 'batches': 0}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+        client.on_connect = self._on_connect
+        client.on_message = self._on_message
+
+    def _on_connect(self, client, userdata, flags, rc, *args):
+        # Subscribing here also restores the subscription after a reconnect
+        client.subscribe(TOPIC_FILTER, qos=1)
+
+    def _on_message(self, client, userdata, message):
+        self.stats['received'] += 1
+        # Waits while the queue is full, so the network thread stops reading from the broker
+        self._queue.put((message.topic, message.payload, now_ms()))
+
+    def _drain(self):
+        """Block for the first message, then take whatever arrives until the batch is full or due"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self, messages):
+        """Store a drained batch of messages, one time-sorted ingest call per sensor
+
+        A sensor's messages are merged whatever fields each one carries,
+        with NaN for the fields a message lacks, so no reading is submitted
+        after a newer one of its sensor and taken for a duplicate.
+        """
+        batches = defaultdict(lambda: ([], {}))  # sensor id -> (ts, columns) lists
+        arrivals = {}  # sensor id -> arrival of its newest message
+        for topic, payload, received in messages:
+            location = parse_topic(topic)
+            try:
+                if location is None:
+                    raise ValueError(f"unexpected topic {topic!r}")
+                sensor_id = location[2]
+                if payload[:2] == MAGIC:
+                    _, ts, columns = decode_batch(payload)
+                    ts, columns = ts.tolist(), {param: values.tolist() for param, values in columns.items()}
+                else:
+                    ts, reading = parse_message(payload, received)
+                    ts, columns = [ts], {param: [value] for param, value in reading.items()}
+            except ValueError:  # includes JSONDecodeError
+                self.stats['invalid'] += 1
+                continue
+            _append_rows(batches[sensor_id], ts, columns)
+            arrivals[sensor_id] = received
+            self.locations[sensor_id] = location[:2]
+
+        for sensor_id, (ts, columns) in batches.items():
+            ts = np.asarray(ts, dtype=np.int64)
+            order = np.argsort(ts, kind='stable')
+            ts = ts[order]
+            columns = {param: np.asarray(values, dtype=np.float64)[order] for param, values in columns.items()}
+            arrival = arrivals[sensor_id]
+            try:
+                # Blocks while the pipeline is full, which in turn fills our queue
+                future = self.worker.pipeline.submit(sensor_id, ts, columns, arrival=arrival)
+            except Full:
+                self.stats['shed'] += len(ts)
+                continue
+            future.add_done_callback(functools.partial(self._stored, len(ts)))
+        self.stats['batches'] += 1
+
+    def _stored(self, count, future):
+        error = future.exception()
+        if error is None:
+            stored, _, report = future.result()
+            self.stats['stored'] += stored
+            self.stats['cleaned'] += report['received'] - report['accepted']
+            self.stats['duplicates'] += report['accepted'] - stored
+        elif isinstance(error, Full):
+            self.stats['shed'] += count
+        else:
+            self.stats['invalid'] += count
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            messages = self._drain()
+            if messages:
+                try:
+                    self.flush(messages)
+                except Exception:  # keep the gateway alive
+                    logger.exception("MQTT ingestion error")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='mqtt-ingest', daemon=True)
+        self._thread.start()
+        self.client.loop_start()
+        return self
+
+    def stop(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def connect_broker(url=None):
+    """A paho-mqtt client connecting in the background to "host[:port]", defaulting to BLUEALERT_MQTT"""
+    try:
+        import paho.mqtt.client as paho
+    except ImportError:
+        raise ImportError(f"MQTT ingestion needs paho-mqtt: pip install \"{PAHO_REQUIREMENT}\"")
+    url = os.environ.get('BLUEALERT_MQTT', 'localhost') if url is None else url
+    host, _, port = url.partition(':')
+    options = {'client_id': f"bluealert-{os.getpid()}", 'clean_session': False}
+    if hasattr(paho, 'CallbackAPIVersion'):
+        # paho-mqtt 2.x asks which callback signatures to use; ours are 1.x style
+        client = paho.Client(paho.CallbackAPIVersion.VERSION1, **options)
+    else:
+        client = paho.Client(**options)
+    client.connect_async(host, int(port or 1883))
+    return client
+
+
+class LocalBroker:
+    """In-process stand-in for an MQTT broker
+
+    Supports `+` and `#` topic filters. Published messages are delivered to
+    subscribers on a broker thread, like a paho network loop, and `publish`
+    blocks while a subscriber's inbox is full, so gateway backpressure
+    reaches publishers.
+    """
+
+    def __init__(self, inbox_size=1000):
+        self.inbox_size = inbox_size
+        self._clients = []
+
+    def client(self):
+        client = LocalClient(self)
+        self._clients.append(client)
+        return client
+
+    def publish(self, topic, payload):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        for client in self._clients:
+            if client.subscribed(topic):
+                client.inbox.put(SimpleNamespace(topic=topic, payload=payload))
+
+
+def topic_matches(topic_filter, topic):
+    filter_parts = topic_filter.split('/')
+    parts = topic.split('/')
+    for i, part in enumerate(filter_parts):
+        if part == '#':
+            return True
+        if i >= len(parts) or (part != '+' and part != parts[i]):
+            return False
+    return len(parts) == len(filter_parts)
+
+
+class LocalClient:
+    """The subset of paho's client API that MQTTGateway uses, backed by a LocalBroker"""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.inbox = queue.Queue(maxsize=broker.inbox_size)
+        self.filters = []
+        self.on_connect = None
+        self.on_message = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def subscribe(self, topic, qos=0):
+        self.filters.append(topic)
+
+    def subscribed(self, topic):
+        return any(topic_matches(f, topic) for f in self.filters)
+
+    def publish(self, topic, payload, qos=0):
+        self.broker.publish(topic, payload)
+
+    def _loop(self):
+        if self.on_connect is not None:
+            self.on_connect(self, None, {}, 0)
+        while not self._stop.is_set():
+            try:
+                message = self.inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if self.on_message is not None:
+                self.on_message(self, None, message)
+
+    def loop_start(self):
+        self._thread = threading.Thread(target=self._loop, name='mqtt-local', daemon=True)
+        self._thread.start()
+
+    def loop_stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def disconnect(self):
+        pass
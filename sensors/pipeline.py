@@ -0,0 +1,370 @@
+"""Staged ingest pipeline with bounded queues between stages
+
+Pushed and MQTT batches flow through
+
+    submit -> [validate] -> validate stage -> [store] -> store stage
+                                          \\-> [alert] -> alert stage
+
+Each stage runs on its own thread and takes whole batches from a
+BoundedQueue. Queue capacity is counted in readings, not batches, so memory
+stays capped however large the uploads are. What happens when a queue is
+full is its policy:
+
+    'block'     the producer waits, pushing back on devices and brokers
+    'drop'      the new batch is shed and counted
+    'coalesce'  a batch for a key already queued replaces it (latest wins);
+                a new key blocks
+
+The validate stage first maps device uptime timestamps to wall-clock time
+(see sensors.alignment) and converts raw ADC columns with the worker's
+calibration table (see sensors.calibration), then checks the batch.
+Validated batches go to the store and alert queues side by side. The alert
+queue coalesces per sensor and only carries each batch's newest reading, so
+during a backlog flush fresh readings are still evaluated within one alert
+cycle instead of waiting behind hours of history.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from sensors.alignment import is_uptime
+from sensors.calibration import is_raw_series
+from sensors.timeseries import now_ms
+from sensors.validation import validate_batch
+from sensors.wqi import WQI, WQI_SERIES
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ('block', 'drop', 'coalesce')
+
+DEFAULT_QUEUES = {
+    'validate': {'capacity': 500_000, 'policy': 'block'},
+    'store': {'capacity': 1_000_000, 'policy': 'block'},
+    'alert': {'capacity': 100_000, 'policy': 'coalesce'}
+}
+DEFAULT_PUT_TIMEOUT = 10.0
+# Decimals kept in the reading the alert stage sees; float32 frames carry
+# about seven significant digits, so 7.1 arrives as 7.0999999...
+ALERT_DECIMALS = 3
+
+
+class Full(Exception):
+    """A blocking put timed out"""
+
+
+class BoundedQueue:
+    """FIFO of (key, weight, item) entries capped by total weight
+
+    `weight` is the number of readings in an item. An item heavier than the
+    whole capacity is still accepted into an empty queue, so oversized
+    batches make progress one at a time.
+    """
+
+    def __init__(self, name, capacity, policy='block'):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy!r}")
+        self.name = name
+        self.capacity = capacity
+        self.policy = policy
+        self._items = OrderedDict()  # key -> (weight, item)
+        self._seq = 0
+        self._weight = 0
+        self._taken = 0  # items handed out by get_batch and not yet task_done
+        self._cond = threading.Condition()
+        self.metrics = {
+            'queued': 0, 'shed_batches': 0, 'shed_readings': 0, 'coalesced': 0,
+            'blocked_s': 0.0, 'peak_depth': 0
+        }
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def pending(self):
+        """Items queued or still being processed"""
+        return len(self._items) + self._taken
+
+    @property
+    def depth(self):
+        """Readings currently queued"""
+        return self._weight
+
+    def _fits(self, weight):
+        return not self._items or self._weight + weight <= self.capacity
+
+    def put(self, item, weight=1, key=None, timeout=None):
+        """Queue an item; returns False if the drop policy shed it
+
+        Raises Full when a blocking put times out.
+        """
+        with self._cond:
+            if self.policy == 'coalesce' and key is not None and key in self._items:
+                old_weight, _ = self._items[key]
+                self._items[key] = (weight, item)
+                self._weight += weight - old_weight
+                self.metrics['coalesced'] += 1
+                return True
+            if not self._fits(weight):
+                if self.policy == 'drop':
+                    self.metrics['shed_batches'] += 1
+                    self.metrics['shed_readings'] += weight
+                    return False
+                started = time.monotonic()
+                fitted = self._cond.wait_for(lambda: self._fits(weight), timeout=timeout)
+                self.metrics['blocked_s'] += time.monotonic() - started
+                if not fitted:
+                    raise Full(f"{self.name} queue is full")
+            if key is None or self.policy != 'coalesce':
+                key = ('seq', self._seq)
+                self._seq += 1
+            self._items[key] = (weight, item)
+            self._weight += weight
+            self.metrics['queued'] += 1
+            self.metrics['peak_depth'] = max(self.metrics['peak_depth'], self._weight)
+            self._cond.notify_all()
+            return True
+
+    def get_batch(self, max_weight, timeout=None, hold=False):
+        """Wait for at least one item, then take items up to `max_weight` readings
+
+        With `hold`, the taken readings keep counting against the capacity
+        until `release()`, for a consumer that cannot pass them on yet.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout=timeout):
+                return []
+            items = []
+            taken = 0
+            while self._items:
+                key = next(iter(self._items))
+                weight, item = self._items[key]
+                if items and taken + weight > max_weight:
+                    break
+                del self._items[key]
+                taken += weight
+                items.append(item)
+            if not hold:
+                self._weight -= taken
+            self._taken += len(items)
+            self._cond.notify_all()
+            return items
+
+    def task_done(self, count):
+        with self._cond:
+            self._taken -= count
+
+    def release(self, weight):
+        with self._cond:
+            self._weight -= weight
+            self._cond.notify_all()
+
+
+class Stage:
+    """A thread applying `handle(items)` to batches taken from `inbox`"""
+
+    def __init__(self, name, inbox, handle, max_weight, hold=False, poll=None):
+        self.name = name
+        self.inbox = inbox
+        self.handle = handle
+        self.max_weight = max_weight
+        self.hold = hold
+        self.poll = poll  # called instead of `handle` when no items arrive
+        self.metrics = {'batches': 0, 'items': 0, 'busy_s': 0.0, 'errors': 0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            items = self.inbox.get_batch(self.max_weight, timeout=0.05 if self.poll else 0.5, hold=self.hold)
+            if not items:
+                if self.poll is not None:
+                    self.poll()
+                continue
+            started = time.monotonic()
+            try:
+                self.handle(items)
+            except Exception:  # keep the stage alive
+                self.metrics['errors'] += 1
+                logger.exception("Ingest %s stage error", self.name)
+            self.metrics['busy_s'] += time.monotonic() - started
+            self.metrics['batches'] += 1
+            self.metrics['items'] += len(items)
+            self.inbox.task_done(len(items))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"ingest-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class IngestPipeline:
+    """validate -> store / alert stages in front of an IngestionWorker
+
+    `queues` overrides DEFAULT_QUEUES per stage, e.g.
+    `{'store': {'capacity': 200_000, 'policy': 'drop'}}`.
+    """
+
+    def __init__(self, worker, queues=None, put_timeout=DEFAULT_PUT_TIMEOUT):
+        self.worker = worker
+        self.put_timeout = put_timeout
+        config = {name: {**spec, **(queues or {}).get(name, {})} for name, spec in DEFAULT_QUEUES.items()}
+        self.queues = {name: BoundedQueue(name, spec['capacity'], spec['policy']) for name, spec in config.items()}
+        self.stages = [
+            Stage('validate', self.queues['validate'], self._validate, max_weight=100_000, hold=True, poll=self._unpark),
+            Stage('store', self.queues['store'], self._store, max_weight=100_000),
+            Stage('alert', self.queues['alert'], self._alert, max_weight=100_000)
+        ]
+        self.counts = {
+            'submitted': 0, 'aligned': 0, 'invalid': 0, 'cleaned': 0, 'stored': 0, 'duplicates': 0,
+            'alert_lag_s': 0.0, 'alert_lag_max_s': 0.0
+        }
+        self._counts_lock = threading.Lock()  # counts are updated from producers and every stage
+        self._parked = deque()  # validated batches waiting for room in the store queue
+        self._started = False
+
+    def _count(self, **amounts):
+        with self._counts_lock:
+            for name, amount in amounts.items():
+                self.counts[name] += amount
+
+    def start(self):
+        if not self._started:
+            for stage in self.stages:
+                stage.start()
+            self._started = True
+        return self
+
+    def stop(self):
+        for stage in self.stages:
+            stage.stop()
+
+    def submit(self, sensor_id, ts, columns, timeout=None, arrival=None):
+        """Queue a batch; the returned Future resolves to (stored, high-water mark, report)
+
+        `arrival` is when the batch reached the server (default now), used
+        to align device uptime timestamps.
+
+        `report` is the validation report (see sensors.validation). The
+        Future fails with ValueError if validation rejects the whole batch,
+        with Full if the batch was shed, or with whatever else went wrong
+        while processing it. With the 'block' policy this call
+        waits up to `timeout` (default `put_timeout`) for room and raises
+        Full after that.
+        """
+        future = Future()
+        ts = np.asarray(ts, dtype=np.int64)
+        columns = {param: np.asarray(values) for param, values in columns.items()}
+        self._count(submitted=len(ts))
+        timeout = self.put_timeout if timeout is None else timeout
+        item = (sensor_id, ts, columns, future, time.monotonic(), now_ms() if arrival is None else arrival)
+        if not self.queues['validate'].put(item, len(ts), timeout=timeout):
+            future.set_exception(Full("validate queue is full, batch shed"))
+        return future
+
+    def _validate(self, items):
+        for sensor_id, ts, columns, future, submitted, arrival in items:
+            weight = len(ts)
+            parked = False
+            try:
+                self._count(aligned=int(is_uptime(ts).sum()))
+                ts = self.worker.clocks.align(sensor_id, ts, arrival)
+                columns = self.worker.calibration.calibrate_columns(sensor_id, columns)
+                ts, columns, report = validate_batch(sensor_id, ts, columns)
+                self._count(cleaned=report['received'] - report['accepted'])
+                for param, counts in report['rejected'].items():
+                    self.worker.rejected[param] += counts['sentinel'] + counts['out_of_range']
+                if len(ts):
+                    # Rows are sorted, so the last one is the newest; rejected values are NaN
+                    reading = {param: round(float(np.float64(values[-1])), ALERT_DECIMALS)
+                               for param, values in columns.items()
+                               if not np.isnan(values[-1]) and not is_raw_series(param)}
+                    # Only the newest index here; store_batch derives the series
+                    wqi = WQI.compute_readings([reading])[0]
+                    if not np.isnan(wqi):
+                        reading[WQI_SERIES] = round(float(wqi), 1)
+                    self.queues['alert'].put((sensor_id, int(ts[-1]), reading, submitted), 1, key=sensor_id)
+                self._parked.append((sensor_id, ts, columns, future, report, weight))
+                parked = True
+            except Exception as e:  # one bad batch must not strand the rest
+                if isinstance(e, ValueError):
+                    self._count(invalid=weight)
+                else:
+                    logger.exception("Ingest validate error for %s", sensor_id)
+                future.set_exception(e)
+            finally:
+                # Parked batches keep their weight until they reach the store queue
+                if not parked:
+                    self.queues['validate'].release(weight)
+        self._unpark()
+
+    def _unpark(self):
+        """Move parked batches to the store queue in order, without waiting
+
+        The validate stage never blocks on a full store queue, so fresh
+        readings keep reaching the alert queue during a backlog flush. Parked
+        batches still count against the validate queue's capacity, which is
+        where producers feel the backpressure.
+        """
+        while self._parked:
+            sensor_id, ts, columns, future, report, weight = self._parked[0]
+            try:
+                queued = self.queues['store'].put(self._parked[0][:5], len(ts), timeout=0)
+            except Full:
+                return
+            self._parked.popleft()
+            self.queues['validate'].release(weight)
+            if not queued:
+                future.set_exception(Full("store queue is full, batch shed"))
+
+    def _store(self, items):
+        for sensor_id, ts, columns, future, report in items:
+            try:
+                accepted, high_water = self.worker.store_batch(sensor_id, ts, columns)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            self._count(stored=accepted, duplicates=len(ts) - accepted)
+            future.set_result((accepted, high_water, report))
+
+    def _alert(self, items):
+        self.worker.evaluate_latest({sensor_id: (ts, reading) for sensor_id, ts, reading, _ in items})
+        # Time from submit until the rules saw the reading
+        lag = time.monotonic() - min(submitted for *_, submitted in items)
+        with self._counts_lock:
+            self.counts['alert_lag_s'] = lag
+            self.counts['alert_lag_max_s'] = max(self.counts['alert_lag_max_s'], lag)
+
+    def idle(self):
+        return not self._parked and not any(queue.pending for queue in self.queues.values())
+
+    def join(self, timeout=None):
+        """Wait until every queued batch has been processed; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.idle():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def metrics(self):
+        """One row per stage: queue depth, capacity, shed load and stage timings"""
+        rows = []
+        for stage in self.stages:
+            queue = stage.inbox
+            rows.append({
+                'stage': stage.name,
+                'policy': queue.policy,
+                'depth': queue.depth,
+                'capacity': queue.capacity,
+                **queue.metrics,
+                **stage.metrics
+            })
+        return rows
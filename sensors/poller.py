@@ -0,0 +1,162 @@
+"""Concurrent polling of ESP32 water quality nodes over HTTP"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Timeout
+
+# Firmware JSON keys -> dashboard parameter names
+FIELD_MAP = {
+    'tds': 'TDS',
+    'turbidity': 'Turbidity',
+    'temperature': 'Temperature',
+    'ph': 'pH',
+    'dissolved_oxygen': 'Dissolved_Oxygen',
+    'conductivity': 'Conductivity',
+    'chlorine': 'Chlorine',
+    'fluoride': 'Fluoride',
+    # Raw ADC counts, calibrated on the server (see sensors.calibration)
+    'tds_raw': 'TDS.raw',
+    'conductivity_raw': 'Conductivity.raw',
+    'ph_raw': 'pH.raw'
+}
+
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_MAX_WORKERS = 64
+TIMEOUT_GRACE = 0.1  # slack before a request still running past its timeout is given up on
+SENSOR_PATH = '/api/sensors'
+
+
+def load_devices(spec=None):
+    """Parse a device list like "S001=http://192.168.1.100,S002=http://192.168.1.101"
+
+    Defaults to the BLUEALERT_SENSORS environment variable. An optional
+    per-device timeout in seconds can be appended as "S001=http://host@1.5".
+    """
+    spec = os.environ.get('BLUEALERT_SENSORS', '') if spec is None else spec
+    devices = []
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        sensor_id, _, url = entry.partition('=')
+        timeout = DEFAULT_TIMEOUT
+        if '@' in url.rsplit('/', 1)[-1]:
+            url, _, timeout = url.rpartition('@')
+            timeout = float(timeout)
+        if not urlsplit(url).path.strip('/'):
+            url = url.rstrip('/') + SENSOR_PATH
+        devices.append({'id': sensor_id.strip(), 'url': url, 'timeout': timeout})
+    return devices
+
+
+def normalize_payload(payload):
+    """Map a firmware JSON payload onto dashboard parameter names"""
+    reading = {}
+    for key, value in payload.items():
+        name = FIELD_MAP.get(key.lower())
+        if name is not None and value is not None:
+            reading[name] = value
+    if 'timestamp' in payload:
+        reading['timestamp'] = payload['timestamp']
+    return reading
+
+
+class SensorPoller:
+    """Polls a fleet of sensor nodes concurrently on a bounded thread pool.
+
+    Each host gets a single keep-alive connection that is reused across
+    sweeps. Every request has one total timeout covering connect and read,
+    counted from when it actually starts, so devices queued behind a busy
+    pool are still polled before they can time out. Devices that miss their
+    timeout are reported as timed out without waiting for them.
+    """
+
+    def __init__(self, devices, max_workers=DEFAULT_MAX_WORKERS):
+        self.devices = list(devices)
+        hosts = {urlsplit(d['url']).netloc for d in self.devices}
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=max(len(hosts), 1),
+            pool_maxsize=1,
+            pool_block=True,
+            max_retries=0
+        )
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(self.devices))),
+            thread_name_prefix='sensor-poll'
+        )
+
+    def poll_device(self, device):
+        """Fetch one device, returning a result dict instead of raising"""
+        timeout = device.get('timeout', DEFAULT_TIMEOUT)
+        started = time.perf_counter()
+        result = {'id': device['id'], 'ok': False, 'data': None, 'error': None}
+        try:
+            response = self._session.get(device['url'], timeout=Timeout(total=timeout))
+            response.raise_for_status()
+            result['data'] = normalize_payload(response.json())
+            result['ok'] = True
+        except (requests.RequestException, ValueError) as e:
+            result['error'] = str(e) or e.__class__.__name__
+        result['elapsed'] = time.perf_counter() - started
+        return result
+
+    def _poll_started(self, device, starts, i):
+        starts[i] = time.monotonic()
+        return self.poll_device(device)
+
+    def sweep(self):
+        """Poll every device once and return results in device order
+
+        A device is given up on once its own timeout has passed since its
+        request started, so devices waiting for a pool thread are never
+        reported as timed out before they were polled.
+        """
+        if not self.devices:
+            return []
+        timeouts = [d.get('timeout', DEFAULT_TIMEOUT) for d in self.devices]
+        starts = [None] * len(self.devices)
+        futures = [self._executor.submit(self._poll_started, d, starts, i) for i, d in enumerate(self.devices)]
+
+        pending = set(range(len(futures)))
+        while pending:
+            now = time.monotonic()
+            expiries = {i: starts[i] + timeouts[i] + TIMEOUT_GRACE for i in pending if starts[i] is not None}
+            pending = {i for i in pending if not futures[i].done() and expiries.get(i, now + 1) > now}
+            if not pending:
+                break
+            # Wake for the next expiry, or shortly while requests are still queued
+            wake = min((expiries[i] for i in pending if i in expiries), default=now + TIMEOUT_GRACE) - now
+            wait([futures[i] for i in pending], timeout=max(wake, 0.01), return_when=FIRST_COMPLETED)
+
+        results = []
+        for device, timeout, future in zip(self.devices, timeouts, futures):
+            if future.done():
+                results.append(future.result())
+                continue
+            future.cancel()
+            results.append({
+                'id': device['id'],
+                'ok': False,
+                'data': None,
+                'error': f"no response within {timeout:.1f}s",
+                'elapsed': timeout
+            })
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
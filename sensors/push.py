@@ -0,0 +1,181 @@
+"""HTTP endpoint that ESP32 nodes POST buffered readings to
+
+Nodes on intermittent links buffer readings locally and upload them in one
+request when they get through. A batch is columnar JSON using the firmware
+keys, with millisecond Unix timestamps (or `millis()` uptime, see
+sensors.alignment):
+
+    POST /api/ingest
+    {"id": "S001", "ts": [1718000000000, 1718000030000], "tds": [452, 460], "ph": [7.1, 7.2]}
+
+The reply acknowledges the batch with the sensor's high-water mark and the
+validation report (see sensors.validation):
+
+    {"accepted": 2, "high_water_mark": 1718000030000, "report": {...}}
+
+Everything at or before that timestamp is stored or was deliberately
+cleaned out, so the node can drop it from its buffer. Resending a batch is
+harmless. Nodes can send the same batch as a binary frame (see
+sensors.wire) with the Content-Type `application/vnd.bluealert.batch`;
+JSON stays the default.
+"""
+import json
+import threading
+from concurrent.futures import TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from sensors.pipeline import Full
+from sensors.poller import FIELD_MAP
+from sensors.wire import CONTENT_TYPE, decode_batch
+
+INGEST_PATH = '/api/ingest'
+DEFAULT_PORT = 8602
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_BATCH = 200_000
+DEFAULT_ACK_TIMEOUT = 30.0
+RETRY_AFTER_S = 60
+
+
+def parse_batch(payload):
+    """Check the shape of a decoded JSON batch and return (sensor_id, ts, columns)
+
+    Raises ValueError describing the first problem found. Values are checked
+    by the pipeline's validate stage.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("batch must be a JSON object")
+    sensor_id = payload.get('id')
+    if not isinstance(sensor_id, str):
+        raise ValueError("'id' must be a string")
+
+    ts = payload.get('ts')
+    if not isinstance(ts, list) or not ts:
+        raise ValueError("'ts' must be a non-empty list")
+    if len(ts) > MAX_BATCH:
+        raise ValueError(f"batch has {len(ts)} readings, the limit is {MAX_BATCH}")
+    try:
+        ts = np.array(ts, dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("'ts' must hold integer millisecond timestamps")
+
+    columns = {}
+    for key, values in payload.items():
+        param = FIELD_MAP.get(key.lower())
+        if param is None:
+            continue
+        if not isinstance(values, list) or len(values) != len(ts):
+            raise ValueError(f"'{key}' must be a list with one value per timestamp")
+        try:
+            columns[param] = np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{key}' must hold numbers")
+    return sensor_id, ts, columns
+
+
+def parse_frame(frame):
+    """Decode a binary batch (see sensors.wire) into (sensor_id, ts, columns)"""
+    sensor_id, ts, columns = decode_batch(frame)
+    if not len(ts) or len(ts) > MAX_BATCH:
+        raise ValueError(f"batch must hold 1 to {MAX_BATCH} readings")
+    return sensor_id, ts, columns
+
+
+class _IngestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        if self.path != INGEST_PATH:
+            self._reply(404, {'error': "not found"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._reply(400, {'error': "invalid Content-Length"})
+            self.close_connection = True
+            return
+        if length > MAX_BODY_BYTES:
+            self._reply(413, {'error': f"body exceeds {MAX_BODY_BYTES} bytes"})
+            self.close_connection = True
+            return
+        body = self.rfile.read(length)
+        try:
+            if self.headers.get_content_type() == CONTENT_TYPE:
+                sensor_id, ts, columns = parse_frame(body)
+            else:
+                sensor_id, ts, columns = parse_batch(json.loads(body))
+        except ValueError as e:  # includes JSONDecodeError
+            self._reply(400, {'error': str(e)})
+            return
+        try:
+            future = self.server.worker.pipeline.submit(sensor_id, ts, columns)
+            accepted, high_water, report = future.result(timeout=self.server.ack_timeout)
+        except ValueError as e:
+            self._reply(400, {'error': str(e)})
+            return
+        except (Full, TimeoutError) as e:
+            # The device keeps its buffer and retries; resends are deduplicated
+            self._reply(503, {'error': str(e) or "ingest is busy"}, retry_after=RETRY_AFTER_S)
+            return
+        except Exception:  # logged by the pipeline; the device retries later
+            self._reply(500, {'error': "ingest failed"})
+            return
+        self.server.readings_accepted += accepted
+        self._reply(200, {'accepted': accepted, 'high_water_mark': high_water, 'report': report})
+
+    def _reply(self, status, body, retry_after=None):
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if retry_after is not None:
+            self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PushServer:
+    """Serves INGEST_PATH on a background thread, feeding `worker.pipeline`
+
+    A request is acknowledged once its batch is stored. If the pipeline is
+    full or the batch is not stored within `ack_timeout` seconds, the reply
+    is 503 with a Retry-After header.
+    """
+
+    def __init__(self, worker, host='0.0.0.0', port=DEFAULT_PORT, ack_timeout=DEFAULT_ACK_TIMEOUT):
+        self._server = ThreadingHTTPServer((host, port), _IngestHandler)
+        self._server.daemon_threads = True
+        self._server.worker = worker
+        self._server.ack_timeout = ack_timeout
+        self._server.readings_accepted = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{INGEST_PATH}"
+
+    @property
+    def readings_accepted(self):
+        return self._server.readings_accepted
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='sensor-push', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
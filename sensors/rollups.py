@@ -0,0 +1,173 @@
+"""Incrementally maintained min/max/mean/count rollups of sensor history
+
+Closed buckets are archived next to the raw data as extra series named
+`<param>.<resolution>.<stat>` (e.g. `TDS.1h.mean`), so long-range queries
+read a few thousand precomputed buckets instead of every raw sample.
+"""
+import threading
+
+import numpy as np
+
+# Finest to coarsest
+RESOLUTIONS = {'1m': 60_000, '1h': 3_600_000, '1d': 86_400_000}
+STATS = ('min', 'max', 'mean', 'count')
+BUCKET_FIELDS = ('ts', 'min', 'max', 'sum', 'count')
+
+DEFAULT_WIDTH = 1000
+DEFAULT_MAX_POINTS = 5000
+
+
+def rollup_series(param, resolution, stat):
+    return f"{param}.{resolution}.{stat}"
+
+
+def is_rollup_series(name):
+    return '.' in name
+
+
+def choose_resolution(span_ms, raw_count=None, width=DEFAULT_WIDTH, max_points=DEFAULT_MAX_POINTS):
+    """Pick raw samples, or the coarsest resolution that still fills `width` points
+
+    Raw samples are used whenever `raw_count` is known and within
+    `max_points`; callers pass it only when their raw source covers the
+    whole span. If the chosen rollup would exceed `max_points`, the next
+    coarser one is used instead.
+    """
+    if raw_count is not None and raw_count <= max_points:
+        return 'raw'
+    counts = {name: span_ms // size for name, size in RESOLUTIONS.items()}
+    filling = [name for name, count in counts.items() if count >= width]
+    if not filling:
+        return next(iter(RESOLUTIONS))
+    names = list(RESOLUTIONS)
+    choice = filling[-1]
+    if counts[choice] > max_points and names.index(choice) + 1 < len(names):
+        choice = names[names.index(choice) + 1]
+    return choice
+
+
+def _buckets(ts, values, size):
+    """Per-bucket ts/min/max/sum/count arrays of sorted samples"""
+    starts = ts - ts % size
+    bounds = np.flatnonzero(np.diff(starts)) + 1
+    first = np.concatenate([[0], bounds])
+    return {
+        'ts': starts[first],
+        'min': np.minimum.reduceat(values, first),
+        'max': np.maximum.reduceat(values, first),
+        'sum': np.add.reduceat(values, first),
+        'count': np.diff(np.append(first, len(values)))
+    }
+
+
+class RollupStore:
+    """Open buckets in memory, closed buckets appended to a SegmentStore"""
+
+    def __init__(self, archive):
+        self.archive = archive
+        # (sensor, param, resolution) -> [bucket_start, min, max, sum, count]
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def add(self, sensor_id, param, ts, value):
+        self.add_batch(sensor_id, param, [ts], [value])
+
+    def add_reading(self, sensor_id, reading, ts):
+        """Fold every numeric parameter of one reading dict into the rollups"""
+        for param, value in reading.items():
+            if param != 'timestamp' and isinstance(value, (int, float)):
+                self.add(sensor_id, param, ts, value)
+
+    def add_batch(self, sensor_id, param, ts, values):
+        """Fold a batch of samples (non-decreasing ms timestamps) into every resolution"""
+        ts = np.asarray(ts, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if not len(ts):
+            return
+        with self._lock:
+            for name, size in RESOLUTIONS.items():
+                bucket = _buckets(ts, values, size)
+                key = (sensor_id, param, name)
+                current = self._open.get(key)
+                if current is not None and current[0] == bucket['ts'][0]:
+                    bucket['min'][0] = min(bucket['min'][0], current[1])
+                    bucket['max'][0] = max(bucket['max'][0], current[2])
+                    bucket['sum'][0] += current[3]
+                    bucket['count'][0] += current[4]
+                elif current is not None:
+                    self._write(sensor_id, param, name, [current])
+
+                # Every bucket except the newest is now complete
+                closed = list(zip(*(bucket[k][:-1] for k in BUCKET_FIELDS)))
+                if closed:
+                    self._write(sensor_id, param, name, closed)
+                self._open[key] = [bucket[k][-1] for k in BUCKET_FIELDS]
+
+    def _write(self, sensor_id, param, name, buckets):
+        ts, mins, maxs, sums, counts = (np.asarray(col) for col in zip(*buckets))
+        columns = {'min': mins, 'max': maxs, 'mean': sums / counts, 'count': counts}
+        for stat in STATS:
+            self.archive.append(sensor_id, rollup_series(param, name, stat), ts, columns[stat])
+
+    def rebuild_day(self, sensor_id, param, day, ts, values):
+        """Replace the archived buckets of one UTC day with ones computed from `ts`/`values`
+
+        Used after raw history is re-derived. Buckets still open in memory
+        are left out; rebuild them with `restore_open`.
+        """
+        ts = np.asarray(ts, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        with self._lock:
+            for name, size in RESOLUTIONS.items():
+                bucket = _buckets(ts, values, size) if len(ts) else dict.fromkeys(BUCKET_FIELDS, np.empty(0))
+                current = self._open.get((sensor_id, param, name))
+                if current is not None:
+                    bucket = {k: v[bucket['ts'] < current[0]] for k, v in bucket.items()}
+                columns = {
+                    'min': bucket['min'],
+                    'max': bucket['max'],
+                    'mean': bucket['sum'] / np.maximum(bucket['count'], 1),
+                    'count': bucket['count']
+                }
+                for stat in STATS:
+                    self.archive.replace_day(sensor_id, rollup_series(param, name, stat), day, bucket['ts'], columns[stat])
+
+    def restore_open(self, sensor_id, param):
+        """Rebuild open buckets from archived raw samples after a restart
+
+        Only samples inside each resolution's newest bucket are used, since
+        older buckets were already archived when they closed.
+        """
+        bounds = self.archive.bounds(sensor_id, param)
+        if bounds is None:
+            return
+        last = bounds[1]
+        ts, values = self.archive.query(sensor_id, param, last - last % max(RESOLUTIONS.values()), last + 1)
+        values = values.astype(np.float64)
+        with self._lock:
+            for name, size in RESOLUTIONS.items():
+                start = ts[-1] - ts[-1] % size
+                mask = ts >= start
+                self._open[(sensor_id, param, name)] = [
+                    start, values[mask].min(), values[mask].max(), values[mask].sum(), int(mask.sum())
+                ]
+
+    def query(self, sensor_id, param, resolution, start_ms, end_ms):
+        """Buckets starting in [start_ms, end_ms) as a dict of arrays
+
+        Includes the still-open newest bucket, so charts reach the present.
+        """
+        result = {}
+        with self._lock:
+            for stat in STATS:
+                ts, values = self.archive.query(sensor_id, rollup_series(param, resolution, stat), start_ms, end_ms)
+                result['ts'] = ts
+                result[stat] = values
+            current = self._open.get((sensor_id, param, resolution))
+        if current is not None and start_ms <= current[0] < end_ms:
+            result['ts'] = np.append(result['ts'], current[0])
+            result['min'] = np.append(result['min'], current[1])
+            result['max'] = np.append(result['max'], current[2])
+            result['mean'] = np.append(result['mean'], current[3] / current[4])
+            result['count'] = np.append(result['count'], current[4])
+        return result
@@ -0,0 +1,90 @@
+"""Water quality thresholds and vectorized status classification
+
+Every page classifies readings through the same registry, so a reading gets
+the same status everywhere. Each parameter has an inclusive `good` range and
+a wider inclusive `moderate` range; anything outside both is `poor`. The
+`kind` records which direction is safe:
+
+    range   safe between two limits (pH, temperature, chlorine, fluoride)
+    lower   lower is better (TDS, turbidity, conductivity)
+    higher  higher is better (dissolved oxygen)
+"""
+import numpy as np
+
+INF = float('inf')
+
+THRESHOLDS = {
+    'TDS': {'kind': 'lower', 'good': (0, 300), 'moderate': (0, 600)},
+    'Turbidity': {'kind': 'lower', 'good': (0, 1), 'moderate': (0, 5)},
+    'pH': {'kind': 'range', 'good': (6.5, 8.5), 'moderate': (6.0, 9.0)},
+    'Temperature': {'kind': 'range', 'good': (20, 30), 'moderate': (15, 35)},
+    'Dissolved_Oxygen': {'kind': 'higher', 'good': (6, INF), 'moderate': (4, INF)},
+    'Conductivity': {'kind': 'lower', 'good': (0, 400), 'moderate': (0, 800)},
+    'Chlorine': {'kind': 'range', 'good': (0.2, 1.0), 'moderate': (0.1, 2.0)},
+    'Fluoride': {'kind': 'range', 'good': (0.7, 1.2), 'moderate': (0.5, 1.5)}
+}
+
+UNKNOWN, GOOD, MODERATE, POOR = -1, 0, 1, 2
+STATUS_LABELS = {UNKNOWN: 'unknown', GOOD: 'good', MODERATE: 'moderate', POOR: 'poor'}
+STATUS_COLORS = {'unknown': '#95a5a6', 'good': '#27ae60', 'moderate': '#f39c12', 'poor': '#e74c3c'}
+STATUS_CLASSES = {'unknown': 'status-moderate', 'good': 'status-good', 'moderate': 'status-moderate', 'poor': 'status-high'}
+
+
+class ThresholdRegistry:
+    """Thresholds compiled into per-parameter bound arrays
+
+    `classify` takes values shaped (..., len(params)) in `params` order and
+    returns int8 status codes of the same shape in a handful of NumPy
+    comparisons, regardless of how many sensors are passed in. NaN readings
+    are classified as UNKNOWN.
+    """
+
+    def __init__(self, thresholds=THRESHOLDS):
+        self.thresholds = dict(thresholds)
+        self.params = list(self.thresholds)
+        self.columns = {param: i for i, param in enumerate(self.params)}
+        bounds = np.array([
+            (*t['good'], *t['moderate']) for t in self.thresholds.values()
+        ], dtype=np.float64)
+        self._good_lo, self._good_hi, self._mod_lo, self._mod_hi = bounds.T
+
+    def classify(self, values, params=None):
+        """Status codes for an array of readings"""
+        values = np.asarray(values, dtype=np.float64)
+        if params is None:
+            good_lo, good_hi, mod_lo, mod_hi = self._good_lo, self._good_hi, self._mod_lo, self._mod_hi
+        else:
+            cols = [self.columns[p] for p in params]
+            good_lo, good_hi = self._good_lo[cols], self._good_hi[cols]
+            mod_lo, mod_hi = self._mod_lo[cols], self._mod_hi[cols]
+
+        status = np.full(values.shape, POOR, dtype=np.int8)
+        status[(values >= mod_lo) & (values <= mod_hi)] = MODERATE
+        status[(values >= good_lo) & (values <= good_hi)] = GOOD
+        status[np.isnan(values)] = UNKNOWN
+        return status
+
+    def classify_param(self, param, values):
+        """Status codes for an array of readings of a single parameter"""
+        return self.classify(np.asarray(values, dtype=np.float64)[..., None], [param])[..., 0]
+
+    def status(self, param, value):
+        """Status label for one reading; parameters without thresholds are 'good'"""
+        if param not in self.columns:
+            return 'good'
+        return STATUS_LABELS[int(self.classify_param(param, value))]
+
+    def classify_reading(self, reading):
+        """Status label for every known parameter in a reading dict"""
+        params = [p for p in reading if p in self.columns]
+        codes = self.classify([float(reading[p]) for p in params], params)
+        return {p: STATUS_LABELS[int(c)] for p, c in zip(params, codes)}
+
+
+REGISTRY = ThresholdRegistry()
+
+
+def get_status_info(param, value):
+    """(status label, colour) for one reading"""
+    status = REGISTRY.status(param, value)
+    return status, STATUS_COLORS[status]
@@ -0,0 +1,137 @@
+"""Fixed-capacity in-memory time series for recent sensor readings"""
+import threading
+import time
+
+import numpy as np
+
+# 24 hours at the default 30 second polling interval
+DEFAULT_CAPACITY = 2880
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+class RingBuffer:
+    """Preallocated float32 values with int64 millisecond timestamps
+
+    Every sample is written twice, at `i` and `i + capacity`, so the most
+    recent `n <= capacity` samples are always one contiguous slice. Appends
+    are O(1) and window queries return NumPy views with no copying.
+    Timestamps are expected to be non-decreasing.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._ts = np.zeros(2 * capacity, dtype=np.int64)
+        self._values = np.zeros(2 * capacity, dtype=np.float32)
+        self._count = 0  # total samples ever appended
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def append(self, ts, value):
+        i = self._count % self.capacity
+        self._ts[i] = self._ts[i + self.capacity] = ts
+        self._values[i] = self._values[i + self.capacity] = value
+        self._count += 1
+
+    def extend(self, ts, values):
+        """Append arrays of samples in at most two slice assignments per copy"""
+        ts = np.asarray(ts, dtype=np.int64)[-self.capacity:]
+        values = np.asarray(values, dtype=np.float32)[-self.capacity:]
+        n = len(ts)
+        start = self._count % self.capacity
+        first = min(n, self.capacity - start)
+        for offset in (0, self.capacity):
+            self._ts[start + offset:start + offset + first] = ts[:first]
+            self._values[start + offset:start + offset + first] = values[:first]
+            self._ts[offset:offset + n - first] = ts[first:]
+            self._values[offset:offset + n - first] = values[first:]
+        self._count += n
+
+    def last(self, n=None):
+        """Views of the newest `n` samples (all retained samples by default)"""
+        n = len(self) if n is None else min(n, len(self))
+        end = self._count % self.capacity + self.capacity
+        return self._ts[end - n:end], self._values[end - n:end]
+
+    def window(self, start_ms, end_ms=None):
+        """Views of the samples with start_ms <= ts < end_ms"""
+        ts, values = self.last()
+        lo = np.searchsorted(ts, start_ms, side='left')
+        hi = len(ts) if end_ms is None else np.searchsorted(ts, end_ms, side='left')
+        return ts[lo:hi], values[lo:hi]
+
+
+class TimeSeriesStore:
+    """One RingBuffer per (sensor, parameter), created on first write"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._series = {}
+        self._lock = threading.Lock()  # guards series creation only
+
+    def series(self, sensor_id, param):
+        key = (sensor_id, param)
+        buffer = self._series.get(key)
+        if buffer is None:
+            with self._lock:
+                buffer = self._series.setdefault(key, RingBuffer(self.capacity))
+        return buffer
+
+    def replace(self, sensor_id, param, ts, values):
+        """Swap in a new buffer holding `ts`/`values`, e.g. after recalibration"""
+        buffer = RingBuffer(self.capacity)
+        buffer.extend(ts, values)
+        with self._lock:
+            self._series[(sensor_id, param)] = buffer
+
+    def append_reading(self, sensor_id, reading, ts=None):
+        """Record every numeric parameter of one reading dict"""
+        ts = now_ms() if ts is None else ts
+        for param, value in reading.items():
+            if param != 'timestamp' and isinstance(value, (int, float)):
+                self.series(sensor_id, param).append(ts, value)
+
+    def window(self, sensor_id, param, hours=24, end_ms=None):
+        """Views of the last `hours` of one series, empty if never written"""
+        end_ms = now_ms() if end_ms is None else end_ms
+        buffer = self._series.get((sensor_id, param))
+        if buffer is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return buffer.window(end_ms - int(hours * 3600 * 1000), end_ms + 1)
+
+    def grid(self, sensor_ids, param, start_ms, end_ms, step_ms):
+        """Readings of many sensors bucketed onto one shared time grid
+
+        The grid starts at `start_ms` rounded down to a multiple of
+        `step_ms`, so every query with the same step lines up. Returns the
+        bucket start times and a (len(sensor_ids), buckets) float64 matrix
+        holding each bucket's mean, NaN where a sensor has no reading.
+        """
+        start_ms -= start_ms % step_ms
+        n = max(-(-(end_ms - start_ms) // step_ms), 0)
+        grid_ts = start_ms + np.arange(n, dtype=np.int64) * step_ms
+        cells, weights = [], []
+        for row, sensor_id in enumerate(sensor_ids):
+            buffer = self._series.get((sensor_id, param))
+            if buffer is None:
+                continue
+            ts, values = buffer.window(start_ms, end_ms)
+            cells.append(row * n + (ts - start_ms) // step_ms)
+            weights.append(values)
+        size = len(sensor_ids) * n
+        if not cells:
+            return grid_ts, np.full((len(sensor_ids), n), np.nan)
+        cells = np.concatenate(cells)
+        weights = np.concatenate(weights).astype(np.float64)
+        # One bincount for the whole fleet
+        sums = np.bincount(cells, weights=weights, minlength=size)
+        counts = np.bincount(cells, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, sums / counts, np.nan)
+        return grid_ts, means.reshape(len(sensor_ids), n)
+
+    def sensors(self):
+        return sorted({sensor_id for sensor_id, _ in self._series})
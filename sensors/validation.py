@@ -0,0 +1,127 @@
+"""Vectorized validation and cleaning of incoming sensor batches
+
+A batch is cleaned rather than rejected: readings are put in time order,
+repeated timestamps and readings with implausible timestamps are dropped,
+and individual values that are missing, firmware error sentinels or outside
+the physically possible range are masked out with NaN. Downstream stores
+skip NaN values and the rule engine treats them as unknown, so a single bad
+pH=0 frame neither reaches the history nor raises an alert.
+
+Every check is a NumPy operation over the whole batch; the cost is a few
+array passes per parameter, whatever the batch size.
+"""
+import time
+
+import numpy as np
+
+from sensors.history import _check_name
+
+MAX_CLOCK_SKEW_MS = 5 * 60 * 1000
+MIN_TS = 1_577_836_800_000  # 2020-01-01, anything older is an unset device clock
+
+# What a working probe can physically report; tighter quality limits live
+# in sensors.thresholds. pH 0 and exactly 0 ppm are what the ADC gives with a
+# disconnected probe, so the lower bounds exclude them.
+VALID_RANGES = {
+    'TDS': (0.5, 5000),
+    'Turbidity': (0, 4000),
+    'Temperature': (-5, 60),
+    'pH': (0.5, 14),
+    'Dissolved_Oxygen': (0, 25),
+    'Conductivity': (1, 10000),
+    'Chlorine': (0, 20),
+    'Fluoride': (0, 20),
+    # 12-bit ADC counts; the top code means the input is saturated
+    'TDS.raw': (0, 4094),
+    'Conductivity.raw': (0, 4094),
+    'pH.raw': (0, 4094)
+}
+
+# Error codes firmware libraries report in place of a reading
+SENTINELS = {
+    'Temperature': (-127, 85),  # DS18B20 disconnected / power-on reset value
+}
+COMMON_SENTINELS = (-999, -9999, 65535)
+
+
+def clean_values(param, values):
+    """NaN-masked float64 copy of `values` and per-reason rejection counts"""
+    values = np.array(values, dtype=np.float64)
+    missing = np.isnan(values)
+    sentinel = np.isin(values, SENTINELS.get(param, ()) + COMMON_SENTINELS)
+    lo, hi = VALID_RANGES.get(param, (-np.inf, np.inf))
+    with np.errstate(invalid='ignore'):
+        out_of_range = ~missing & ~sentinel & ~((values >= lo) & (values <= hi))
+    values[missing | sentinel | out_of_range] = np.nan
+    return values, {
+        'missing': int(missing.sum()),
+        'sentinel': int(sentinel.sum()),
+        'out_of_range': int(out_of_range.sum())
+    }
+
+
+def validate_batch(sensor_id, ts, columns, now=None):
+    """Clean a batch and return (ts, columns, report)
+
+    The returned timestamps are strictly increasing; every column is a
+    float64 array aligned with them, with NaN for rejected values. Rows
+    with no usable value left are dropped. Raises ValueError only for
+    problems with the batch as a whole (bad sensor id, no known fields).
+    """
+    _check_name(sensor_id)
+    if not columns:
+        raise ValueError("batch has no known sensor fields")
+    ts = np.asarray(ts, dtype=np.int64)
+    now = int(time.time() * 1000) if now is None else now
+
+    report = {'received': len(ts), 'out_of_order': int((np.diff(ts) < 0).sum())}
+    order = np.argsort(ts, kind='stable')
+    ts = ts[order]
+    keep = (ts >= MIN_TS) & (ts <= now + MAX_CLOCK_SKEW_MS)
+    report['bad_timestamp'] = int((~keep).sum())
+    duplicate = np.zeros(len(ts), dtype=bool)
+    duplicate[1:] = ts[1:] == ts[:-1]  # the first reading for a timestamp wins
+    report['duplicate'] = int((duplicate & keep).sum())
+    keep &= ~duplicate
+
+    ts = ts[keep]
+    cleaned = {}
+    rejected = {}
+    usable = np.zeros(len(ts), dtype=bool)
+    for param, values in columns.items():
+        values, counts = clean_values(param, np.asarray(values)[order][keep])
+        cleaned[param] = values
+        if any(counts.values()):
+            rejected[param] = counts
+        usable |= ~np.isnan(values)
+
+    report['rejected'] = rejected
+    report['empty'] = int((~usable).sum())
+    report['accepted'] = int(usable.sum())
+    if not usable.all():
+        ts = ts[usable]
+        cleaned = {param: values[usable] for param, values in cleaned.items()}
+    return ts, cleaned, report
+
+
+def clean_readings(readings):
+    """Polled readings (sensor id -> reading dict) with rejected values removed
+
+    Values are checked one parameter at a time across all sensors. Returns
+    the cleaned readings and per-parameter counts of rejected values.
+    """
+    params = {param for reading in readings.values() for param, value in reading.items()
+              if param != 'timestamp' and isinstance(value, (int, float))}
+    cleaned = {sensor_id: dict(reading) for sensor_id, reading in readings.items()}
+    rejected = {}
+    for param in params:
+        values = [reading.get(param) for reading in readings.values()]
+        values, counts = clean_values(param, [v if isinstance(v, (int, float)) else np.nan for v in values])
+        bad = np.isnan(values)
+        bad_count = counts['sentinel'] + counts['out_of_range']
+        if bad_count:
+            rejected[param] = bad_count
+            for sensor_id, is_bad in zip(readings, bad):
+                if is_bad:
+                    cleaned[sensor_id].pop(param, None)
+    return cleaned, rejected
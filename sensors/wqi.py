@@ -0,0 +1,119 @@
+"""Weighted arithmetic Water Quality Index
+
+For each parameter with a drinking water standard, a quality rating
+
+    q = 100 * |value - ideal| / |standard - ideal|
+
+uses the standard on the side of the ideal the value is on (pH has one on
+each side). Ratings are weighted by w = 1 / standard, so strict limits
+count more, and
+
+    WQI = sum(q * w) / sum(w)
+
+over the parameters that were measured. Lower is better: up to 25 is
+excellent, 100 means the water is at the limit of the standards.
+Temperature and chlorine have no standard of this form and are left out.
+
+The index is stored as its own series, `WQI`, next to the measured
+parameters, so history and rollups maintain it like any other parameter.
+"""
+import numpy as np
+
+from sensors.thresholds import INF
+
+WQI_SERIES = 'WQI'
+
+# BIS 10500 / WHO drinking water standards: (lower, upper) standard and ideal
+STANDARDS = {
+    'TDS': {'standard': (-INF, 500), 'ideal': 0},
+    'Turbidity': {'standard': (-INF, 5), 'ideal': 0},
+    'pH': {'standard': (6.5, 8.5), 'ideal': 7},
+    'Dissolved_Oxygen': {'standard': (5, INF), 'ideal': 14.6},
+    'Conductivity': {'standard': (-INF, 300), 'ideal': 0},
+    'Fluoride': {'standard': (-INF, 1.0), 'ideal': 0}
+}
+
+GRADES = [(25, 'Excellent'), (50, 'Good'), (75, 'Poor'), (100, 'Very Poor'), (INF, 'Unsuitable')]
+GRADE_COLORS = {
+    'Excellent': '#27ae60', 'Good': '#2ecc71', 'Poor': '#f39c12',
+    'Very Poor': '#e67e22', 'Unsuitable': '#e74c3c', 'Unknown': '#95a5a6'
+}
+
+
+class WaterQualityIndex:
+    """STANDARDS compiled into per-parameter arrays
+
+    `compute` takes values shaped (..., len(params)) and returns the index
+    of every row at once, so a reading from every sensor or every bucket of
+    a history is scored in a handful of NumPy operations. Missing (NaN)
+    parameters are left out of both sums; rows with none measured are NaN.
+    """
+
+    def __init__(self, standards=STANDARDS):
+        self.standards = dict(standards)
+        self.params = list(self.standards)
+        self.columns = {param: i for i, param in enumerate(self.params)}
+        self._lower, self._upper = np.array([s['standard'] for s in self.standards.values()], dtype=np.float64).T
+        self._ideal = np.array([s['ideal'] for s in self.standards.values()], dtype=np.float64)
+        limits = np.where(np.isfinite(self._upper), self._upper, self._lower)
+        self._weights = 1 / limits
+        self._grade_bounds = np.array([bound for bound, _ in GRADES[:-1]])
+
+    def compute(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        above = values >= self._ideal
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rating = 100 * np.where(
+                above,
+                (values - self._ideal) / (self._upper - self._ideal),
+                (self._ideal - values) / (self._ideal - self._lower)
+            )
+        known = ~np.isnan(values)
+        weights = np.where(known, self._weights, 0)
+        total = weights.sum(axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(total > 0, np.where(known, rating * weights, 0).sum(axis=-1) / total, np.nan)
+
+    def compute_columns(self, columns):
+        """Index per row of a batch (param -> aligned arrays), or None without any rated parameter"""
+        present = [param for param in self.params if param in columns]
+        if not present:
+            return None
+        # Column by column, so a long backlog never builds the full matrix
+        weighted = weights = 0
+        for param in present:
+            i = self.columns[param]
+            values = np.asarray(columns[param], dtype=np.float64)
+            deviation = values - self._ideal[i]
+            span = np.where(deviation >= 0, self._upper[i] - self._ideal[i], self._ideal[i] - self._lower[i])
+            known = ~np.isnan(values)
+            weighted = weighted + np.where(known, 100 * np.abs(deviation) / span, 0) * self._weights[i]
+            weights = weights + known * self._weights[i]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(weights > 0, weighted / weights, np.nan)
+
+    def compute_readings(self, readings):
+        """Index of many reading dicts at once, in the order given"""
+        values = [[float(r[p]) if isinstance(r.get(p), (int, float)) else np.nan for p in self.params] for r in readings]
+        return self.compute(np.array(values, dtype=np.float64).reshape(len(values), len(self.params)))
+
+    def grades(self, wqi):
+        """Grade labels for an array of index values; NaN is 'Unknown'"""
+        wqi = np.asarray(wqi, dtype=np.float64)
+        labels = np.array([label for _, label in GRADES] + ['Unknown'])
+        codes = np.where(np.isnan(wqi), len(GRADES), np.searchsorted(self._grade_bounds, wqi, side='left'))
+        return labels[codes]
+
+    def grade(self, wqi):
+        return str(self.grades([np.nan if wqi is None else wqi])[0])
+
+
+WQI = WaterQualityIndex()
+
+
+def rank(readings, worst_first=True):
+    """(sensor_id, wqi) pairs of readings that carry a WQI, sorted in one argsort"""
+    ids = [s for s, r in readings.items() if isinstance(r.get(WQI_SERIES), (int, float))]
+    scores = np.array([readings[s][WQI_SERIES] for s in ids], dtype=np.float64)
+    order = np.argsort(-scores if worst_first else scores, kind='stable')
+    return [(ids[i], float(scores[i])) for i in order]
@@ -0,0 +1,23 @@
+"""Raw ADC values are validated before they are calibrated"""
+import numpy as np
+
+from sensors.calibration import CalibrationTable
+from sensors.validation import VALID_RANGES
+
+
+def test_saturated_raw_column_calibrates_to_nan():
+    saturated = VALID_RANGES['TDS.raw'][1] + 1
+    columns = {'TDS.raw': np.array([1200.0, saturated]), 'Temperature': np.array([25.0, 25.0])}
+    tds = CalibrationTable(path=None).calibrate_columns('S001', columns)['TDS']
+    assert not np.isnan(tds[0])
+    assert np.isnan(tds[1])
+
+
+def test_saturated_raw_reading_drops_calibrated_value():
+    saturated = VALID_RANGES['TDS.raw'][1] + 1
+    readings = CalibrationTable(path=None).calibrate_readings({
+        'S001': {'TDS.raw': saturated, 'TDS': 300.0},
+        'S002': {'TDS.raw': 1200}
+    })
+    assert 'TDS' not in readings['S001']
+    assert readings['S002']['TDS'] > 0
@@ -0,0 +1,22 @@
+"""Cluster pyramid views"""
+import numpy as np
+
+from geo.clusters import ClusterPyramid
+
+BOUNDS = (26.1, 91.7, 26.2, 91.8)
+
+
+def test_view_switches_to_points_when_few_are_in_view():
+    rng = np.random.default_rng(0)
+    pyramid = ClusterPyramid(26.15 + rng.uniform(-0.01, 0.01, 50), 91.75 + rng.uniform(-0.01, 0.01, 50))
+    kind, shown = pyramid.view(10, BOUNDS)
+    assert kind == 'points'
+    assert len(shown) == 50
+
+
+def test_view_past_max_zoom_keeps_every_point():
+    rng = np.random.default_rng(0)
+    pyramid = ClusterPyramid(26.14 + rng.normal(0, 1e-4, 1000), 91.74 + rng.normal(0, 1e-4, 1000), max_zoom=16)
+    kind, shown = pyramid.view(18, BOUNDS, max_points=300)
+    assert kind == 'clusters'
+    assert shown['count'].sum() == 1000
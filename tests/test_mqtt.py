@@ -0,0 +1,133 @@
+"""MQTTGateway against the in-process LocalBroker"""
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from sensors.history import SegmentStore
+from sensors.ingest import IngestionWorker
+from sensors.mqtt import LocalBroker, MQTTGateway, parse_message, parse_topic
+from sensors.pipeline import IngestPipeline
+from sensors.poller import SensorPoller
+from sensors.timeseries import now_ms
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def worker(tmp_path):
+    poller = SensorPoller([])
+    worker = IngestionWorker(poller, archive=SegmentStore(str(tmp_path)))
+    yield worker
+    worker.pipeline.stop()
+    poller.close()
+
+
+def test_parse_topic():
+    assert parse_topic('bluealert/Assam/Kamrup/S001') == ('Assam', 'Kamrup', 'S001')
+    for topic in ('bluealert/Assam/S001', 'bluealert/Assam/Kamrup/S001/extra',
+                  'other/Assam/Kamrup/S001', 'bluealert//Kamrup/S001', 'bluealert/Assam/Kamrup/'):
+        assert parse_topic(topic) is None
+
+
+def test_parse_message():
+    ts = now_ms()
+    assert parse_message(json.dumps({'ph': 7.1, 'timestamp': ts}), 0) == (ts, {'pH': 7.1})
+    # Without a usable timestamp the arrival time is used
+    assert parse_message(json.dumps({'ph': 7.1, 'timestamp': 'soon'}), 42) == (42, {'pH': 7.1})
+    with pytest.raises(ValueError):
+        parse_message(b'{not json', 0)
+    with pytest.raises(ValueError):
+        parse_message(json.dumps({'battery': 3.7}), 0)
+
+
+def test_flush_counts_invalid_messages(worker):
+    gateway = MQTTGateway(worker, LocalBroker().client())
+    received = now_ms()
+    gateway.flush([
+        ('bluealert/Assam/S001', json.dumps({'ph': 7.1}).encode(), received),
+        ('bluealert/Assam/Kamrup/S001', b'{not json', received),
+        ('bluealert/Assam/Kamrup/S001', json.dumps({'battery': 3.7}).encode(), received)
+    ])
+    assert gateway.stats['invalid'] == 3
+    assert worker.pipeline.counts['submitted'] == 0
+
+
+def test_flush_merges_each_sensor_into_one_sorted_batch(worker, monkeypatch):
+    submitted = []
+    submit = worker.pipeline.submit
+
+    def record(sensor_id, ts, columns, **kwargs):
+        submitted.append((sensor_id, ts, columns))
+        return submit(sensor_id, ts, columns, **kwargs)
+
+    monkeypatch.setattr(worker.pipeline, 'submit', record)
+    worker.pipeline.start()
+    gateway = MQTTGateway(worker, LocalBroker().client())
+    start = now_ms() - 10_000
+    received = now_ms()
+    gateway.flush([
+        ('bluealert/Assam/Kamrup/S001', json.dumps({'ph': 7.4, 'timestamp': start + 2000}).encode(), received),
+        ('bluealert/Assam/Kamrup/S002', json.dumps({'ph': 6.9, 'timestamp': start}).encode(), received),
+        ('bluealert/Assam/Kamrup/S001', json.dumps({'ph': 7.2, 'temperature': 25.5,
+                                                     'timestamp': start}).encode(), received),
+        ('bluealert/Assam/Kamrup/S001', json.dumps({'temperature': 26.0, 'timestamp': start + 1000}).encode(), received)
+    ])
+
+    assert [sensor_id for sensor_id, _, _ in submitted] == ['S001', 'S002']
+    _, ts, columns = submitted[0]
+    assert ts.tolist() == [start, start + 1000, start + 2000]
+    np.testing.assert_array_equal(columns['pH'], [7.2, np.nan, 7.4])
+    np.testing.assert_array_equal(columns['Temperature'], [25.5, 26.0, np.nan])
+    assert gateway.locations['S001'] == ('Assam', 'Kamrup')
+
+    assert worker.pipeline.join(timeout=5)
+    assert wait_for(lambda: gateway.stats['stored'] == 4)
+    assert gateway.stats['shed'] == gateway.stats['invalid'] == gateway.stats['duplicates'] == 0
+
+
+def test_full_pipeline_blocks_the_network_thread(worker):
+    # A validate queue with room for one reading, not yet draining
+    worker.pipeline = IngestPipeline(worker, queues={'validate': {'capacity': 1}}, put_timeout=30)
+    broker = LocalBroker(inbox_size=1)
+    gateway = MQTTGateway(worker, broker.client(), queue_size=2, batch_size=1, flush_interval=0.05).start()
+    assert wait_for(lambda: gateway.client.filters)
+
+    count = 10
+    start = now_ms() - count * 1000
+    published = []
+
+    def publish():
+        for i in range(count):
+            broker.publish('bluealert/Assam/Kamrup/S001', json.dumps({'ph': 7.0, 'timestamp': start + i * 1000}))
+            published.append(i)
+
+    publisher = threading.Thread(target=publish, daemon=True)
+    publisher.start()
+    try:
+        # One batch in the pipeline, one in the writer, two queued, one in the
+        # network thread and one in the broker inbox: the publisher has to wait
+        assert wait_for(lambda: len(published) >= 4)
+        time.sleep(0.3)
+        assert publisher.is_alive()
+        assert len(published) < count
+        assert gateway._queue.qsize() <= 2
+        assert gateway.stats['shed'] == gateway.stats['invalid'] == 0
+
+        worker.pipeline.start()
+        publisher.join(timeout=5)
+        assert not publisher.is_alive()
+        assert wait_for(lambda: gateway.stats['stored'] == count)
+        assert gateway.stats['received'] == count
+        assert gateway.stats['shed'] == gateway.stats['invalid'] == gateway.stats['duplicates'] == 0
+    finally:
+        gateway.stop()